@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Bytes on the wire and latency of large list responses, with and without
+compression, against the local stub.
+
+    python benchmarks/compression_bench.py [subscribers] [repeat]
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from pyspreedly.api import Client
+from pyspreedly.stub import StubServer
+
+
+def measure(server, client, repeat):
+    sent = server.bytes_sent
+    start = time.time()
+    for i in range(repeat):
+        count = sum(1 for s in client.iter_subscribers())
+        client.get_plans()
+    elapsed = (time.time() - start) / repeat
+    return count, (server.bytes_sent - sent) / repeat, elapsed
+
+
+def measure_requests(server, client, repeat):
+    received = server.bytes_received
+    for i in range(repeat):
+        client.set_info(1, **dict(('field_{0}'.format(n), 'value ' * 10)
+            for n in range(50)))
+    return (server.bytes_received - received) / repeat
+
+
+if __name__ == '__main__':
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with StubServer() as server:
+        server.add_subscribers(subscribers)
+        session = requests.Session()
+        for compress in (False, True):
+            client = Client('token', 'site', session=session,
+                    base_host=server.url, compress=compress,
+                    compress_requests=compress)
+            count, size, elapsed = measure(server, client, repeat)
+            request_size = measure_requests(server, client, repeat)
+            print ('compress={0!s:5} {1} subscribers: {2:10.0f} bytes/list '
+                    '{3:6.3f}s/list  set_info body {4} bytes').format(
+                    compress, count, size, elapsed, request_size)
+        session.close()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Entitlement table build time, file size and lookup latency.
+
+    python benchmarks/entitlements_bench.py [subscribers]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytz
+from pyspreedly.entitlements import build_entitlements, EntitlementTable
+
+
+def subscribers(count):
+    now = datetime.now(pytz.utc)
+    for i in xrange(count):
+        yield {'customer_id': i * 7, 'active': i % 3 != 0,
+                'feature_level': ('basic', 'pro', 'team')[i % 3],
+                'active_until': now + timedelta(days=i % 60)}
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path = os.path.join(tempfile.mkdtemp(), 'entitlements')
+    start = time.time()
+    build_entitlements(subscribers(count), path)
+    print 'build {0} subscribers: {1:.2f}s, {2:.1f} MB'.format(count,
+            time.time() - start, os.path.getsize(path) / 1e6)
+    table = EntitlementTable(path)
+    ids = [random.randrange(count * 7) for i in xrange(200000)]
+    start = time.time()
+    for id in ids:
+        table.is_active(id)
+    print 'is_active: {0:.2f} us/lookup'.format(
+            (time.time() - start) / len(ids) * 1e6)
+    start = time.time()
+    for id in ids:
+        table.get(id)
+    print 'get:       {0:.2f} us/lookup'.format(
+            (time.time() - start) / len(ids) * 1e6)
+    os.unlink(path)
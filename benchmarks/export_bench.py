@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Export throughput on a synthetic subscriber list.
+
+    python benchmarks/export_bench.py [records] [outdir]
+
+Streams a generated `<subscribers>` document of `records` subscribers
+(default 1,000,000) through :py:func:`pyspreedly.objectify.iterparse_spreedly`
+into each writer and prints records/s, MB/s written and peak RSS.
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyspreedly.objectify import iterparse_spreedly
+from pyspreedly.export import export, JSONLWriter, CSVWriter, ColumnarWriter
+
+
+SUBSCRIBER = """<subscriber>
+<active type="boolean">true</active>
+<active-until type="datetime">2013-01-{day:02d}T03:06:30Z</active-until>
+<billing-first-name nil="true"></billing-first-name>
+<created-at type="datetime">2012-09-26T03:06:30Z</created-at>
+<customer-id>{id}</customer-id>
+<email>user{id}@example.com</email>
+<feature-level>{level}</feature-level>
+<on-trial type="boolean">false</on-trial>
+<screen-name>user-{id}</screen-name>
+<store-credit type="decimal">{credit}.50</store-credit>
+<store-credit-currency-code>USD</store-credit-currency-code>
+<subscription-plan-name>{level} monthly</subscription-plan-name>
+<token>{id:040x}</token>
+<invoices type="array">
+<invoice><amount type="decimal">24.0</amount><closed type="boolean">true</closed></invoice>
+</invoices>
+</subscriber>
+"""
+
+
+class SyntheticSubscribers(object):
+    """File-like object generating the document lazily"""
+
+    def __init__(self, records):
+        self.records = records
+        self._next = 0
+        self._buffer = '<subscribers type="array">\n'
+
+    def read(self, size=-1):
+        while (size < 0 or len(self._buffer) < size) and \
+                self._next <= self.records:
+            if self._next == self.records:
+                self._buffer += '</subscribers>\n'
+            else:
+                i = self._next
+                self._buffer += SUBSCRIBER.format(id=i, day=i % 28 + 1,
+                        level=('basic', 'pro', 'team')[i % 3], credit=i % 100)
+            self._next += 1
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def run(name, writer_class, records, outdir):
+    path = os.path.join(outdir, name + '-{chunk:04d}')
+    start = time.time()
+    with writer_class(path) as writer:
+        count = export(iterparse_spreedly(SyntheticSubscribers(records)),
+                writer)
+    elapsed = time.time() - start
+    size = sum(os.path.getsize(p) for p in writer.paths)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print '{0:10} {1:>9} records {2:8.0f} rec/s {3:7.2f} MB/s  peak rss {4:.0f} MB'.format(
+            name, count, count / elapsed, size / elapsed / 1e6, peak)
+
+
+if __name__ == '__main__':
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    outdir = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    for name, writer_class in (('jsonl', JSONLWriter), ('csv', CSVWriter),
+            ('columnar', ColumnarWriter)):
+        run(name, writer_class, records, outdir)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+get_info tail latency with and without hedging, against the stub with
+latency spikes: most responses take about 2ms, 2% take 250ms.
+
+    python benchmarks/hedge_bench.py [calls] [concurrency]
+
+Each hedged call hands the request to another thread, which costs a little
+cpu; with enough concurrency to keep the client's cpu busy that shows in
+the median too.
+"""
+import os
+import sys
+import time
+import random
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from requests.adapters import HTTPAdapter
+from pyspreedly.api import Client
+from pyspreedly.bulk import bulk_map
+from pyspreedly.hedging import HedgePolicy
+from pyspreedly.replay import latency_report
+from pyspreedly.stub import StubServer
+
+SUBSCRIBERS = 1000
+
+
+def spiky():
+    if random.random() < 0.02:
+        return 0.25
+    return random.expovariate(500)
+
+
+def serve(connection):
+    # in its own process, so the stub's threads don't compete with the
+    # client's for the GIL
+    with StubServer(latency=spiky) as server:
+        server.add_subscribers(SUBSCRIBERS)
+        connection.send(server.url)
+        while connection.recv():
+            connection.send(server.requests)
+
+
+def run(url, calls, concurrency, policy):
+    session = requests.Session()
+    session.mount(url, HTTPAdapter(pool_connections=1,
+        pool_maxsize=2 * concurrency))
+    client = Client('token', 'site', session=session, base_host=url,
+            hedge=policy)
+
+    def call(i):
+        started = time.time()
+        client.get_info(random.randint(1, SUBSCRIBERS))
+        return time.time() - started
+
+    started = time.time()
+    latencies = [result for i, result, error in bulk_map(call, xrange(calls),
+        concurrency) if error is None]
+    report = latency_report(latencies, time.time() - started,
+            calls - len(latencies))
+    session.close()
+    return report
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    connection, child = multiprocessing.Pipe()
+    stub = multiprocessing.Process(target=serve, args=(child,))
+    stub.start()
+    url = connection.recv()
+    for name, policy in (('plain', None),
+            ('hedged', HedgePolicy(percentile=95))):
+        connection.send(True)
+        sent = connection.recv()
+        report = run(url, calls, concurrency, policy)
+        connection.send(True)
+        print '{0:7} p50 {1:7.2f}ms p95 {2:7.2f}ms p99 {3:7.2f}ms max {4:7.2f}ms  {5:6.0f}/s  requests sent {6}'.format(
+                name, report['p50_ms'], report['p95_ms'],
+                report['p99_ms'], report['max_ms'], report['throughput'],
+                connection.recv() - sent)
+        if policy is not None:
+            print '        {0}'.format(policy.stats())
+    connection.send(False)
+    stub.join()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Memory held by a parsed subscriber list with and without a ValueInterner.
+
+    python benchmarks/intern_bench.py [subscribers]
+
+Each run parses the list (default 100,000 subscribers) in a fresh process,
+keeping every record, and prints the growth of the resident set and the
+parse time per backend.
+"""
+import os
+import sys
+import time
+import resource
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyspreedly.objectify import (iterparse_spreedly, available_backends,
+        ValueInterner)
+from export_bench import SyntheticSubscribers
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def measure(subscribers, backend, intern_values, results):
+    interner = ValueInterner() if intern_values else None
+    before = rss_mb()
+    start = time.time()
+    records = list(iterparse_spreedly(SyntheticSubscribers(subscribers),
+        backend, interner))
+    elapsed = time.time() - start
+    results.put((rss_mb() - before, elapsed, len(records)))
+
+
+if __name__ == '__main__':
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for backend in available_backends():
+        for intern_values in (False, True):
+            results = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=measure,
+                    args=(subscribers, backend, intern_values, results))
+            worker.start()
+            grown, elapsed, count = results.get()
+            worker.join()
+            print '{0:6} interned={1!s:5} {2} records: {3:7.1f} MB held, {4:6.0f} bytes/record, {5:6.2f}s'.format(
+                    backend, intern_values, count, grown, grown * 1e6 / count,
+                    elapsed)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Plan migration throughput at different concurrency levels, against the stub
+in a child process answering in 20ms on average.
+
+    python benchmarks/migration_bench.py [subscribers] [concurrency ...]
+
+Prints changes plus verification reads per second and how long 50,000
+subscribers would take at that rate.
+"""
+import os
+import sys
+import random
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from requests.adapters import HTTPAdapter
+from pyspreedly.api import Client
+from pyspreedly.migration import PlanMigration
+from pyspreedly.stub import StubServer
+
+
+def serve(connection, subscribers):
+    with StubServer(latency=lambda: random.expovariate(50)) as server:
+        server.add_subscribers(subscribers, active=True)
+        connection.send(server.url)
+        connection.recv()
+
+
+if __name__ == '__main__':
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    levels = [int(c) for c in sys.argv[2:]] or [1, 8, 32]
+    connection, child = multiprocessing.Pipe()
+    stub = multiprocessing.Process(target=serve,
+            args=(child, subscribers))
+    stub.start()
+    url = connection.recv()
+    for plan_id, concurrency in zip([1, 2] * len(levels), levels):
+        session = requests.Session()
+        session.mount(url, HTTPAdapter(pool_connections=1,
+            pool_maxsize=concurrency))
+        client = Client('token', 'site', session=session, base_host=url)
+        migration = PlanMigration(client, plan_id, concurrency=concurrency)
+        for result in migration.run(xrange(1, subscribers + 1)):
+            pass
+        session.close()
+        stats = migration.stats
+        print 'concurrency {0:3}: {1} changed in {2:6.2f}s, {3:6.2f}s with verification, {4:6.1f} subscribers/s, 50k in {5:5.1f} min'.format(
+                concurrency, stats['verified'] + stats['failed'],
+                stats['change_seconds'], stats['seconds'],
+                stats['per_second'], 50000 / stats['per_second'] / 60)
+    connection.send('stop')
+    stub.join()
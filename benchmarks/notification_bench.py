@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Notification ingestion against the local stub, with bursty input.
+
+    python benchmarks/notification_bench.py [bursts] [notifications_per_burst]
+
+Each burst posts notifications of 1-5 ids drawn from a small hot set of
+subscribers, like a batch job touching the same accounts repeatedly.
+Compares fetching every id synchronously with the ingester.
+"""
+import os
+import sys
+import time
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from pyspreedly.api import Client
+from pyspreedly.stub import StubServer
+from pyspreedly.notifications import NotificationIngester, parse_notification
+
+
+def bursts(count, size, hot=500):
+    rand = random.Random(1)
+    for burst in range(count):
+        yield ['subscriber_ids=' + ','.join(str(rand.randint(1, hot))
+            for i in range(rand.randint(1, 5))) for n in range(size)]
+
+
+def naive(client, payloads):
+    fetched = 0
+    for burst in payloads:
+        for payload in burst:
+            for id in parse_notification(payload):
+                client.get_info(id)
+                fetched += 1
+    return fetched
+
+
+def ingested(client, payloads):
+    ingester = NotificationIngester(client, window=60, concurrency=8)
+    records = []
+    ingester.subscribe(lambda id, data: records.append(id))
+    ingester.start()
+    for burst in payloads:
+        for payload in burst:
+            ingester.ingest(payload)
+        time.sleep(0.05)
+    ingester.stop()
+    return len(records)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with StubServer(latency=lambda: 0.005) as server:
+        server.add_subscribers(500)
+        session = requests.Session()
+        client = Client('token', 'site', session=session,
+                base_host=server.url)
+        ids = sum(len(parse_notification(p))
+                for burst in bursts(count, size) for p in burst)
+        for name, run in (('naive', naive), ('ingester', ingested)):
+            start = time.time()
+            fetched = run(client, list(bursts(count, size)))
+            elapsed = time.time() - start
+            print '{0:9} {1} ids notified, {2} fetches, {3:.2f}s, {4:.0f} ids/s'.format(
+                    name, ids, fetched, elapsed, ids / elapsed)
+        session.close()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Latency of small parses while another thread parses a large subscriber
+list, inline and with the large list offloaded to a ParseExecutor.
+
+    python benchmarks/parse_offload_bench.py [subscribers] [seconds]
+"""
+import os
+import sys
+import time
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyspreedly.objectify import objectify_spreedly
+from pyspreedly.executor import ParseExecutor
+from pyspreedly.replay import latency_report
+from export_bench import SyntheticSubscribers
+
+
+def run(parse_large, large, small, seconds, threads=4):
+    stop = time.time() + seconds
+    latencies = []
+    large_parses = [0]
+
+    def big():
+        while time.time() < stop:
+            parse_large(large)
+            large_parses[0] += 1
+
+    def little():
+        mine = []
+        while time.time() < stop:
+            start = time.time()
+            objectify_spreedly(small)
+            mine.append(time.time() - start)
+            time.sleep(0.002)
+        latencies.extend(mine)
+
+    workers = [threading.Thread(target=big)] + \
+            [threading.Thread(target=little) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    report = latency_report(latencies, seconds)
+    report['large_parses'] = large_parses[0]
+    return report
+
+
+if __name__ == '__main__':
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    large = SyntheticSubscribers(subscribers).read()
+    small = SyntheticSubscribers(1).read()
+    executor = ParseExecutor(threshold=len(small) + 1)
+    executor.parse(large)  # start the pool
+    print 'large list: {0:.1f} MB'.format(len(large) / 1e6)
+    for name, parse in (('inline', objectify_spreedly),
+            ('executor', executor.parse)):
+        report = run(parse, large, small, seconds)
+        print '{0:9} small parses p50 {1:7.3f}ms p99 {2:7.3f}ms max {3:7.3f}ms, large parses {4}'.format(
+                name, report['p50_ms'], report['p99_ms'], report['max_ms'],
+                report['large_parses'])
+    executor.close()
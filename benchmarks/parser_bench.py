@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Parse speed of each xml backend, for a single subscriber, a subscriber
+list parsed whole and the same list streamed.
+
+    python benchmarks/parser_bench.py [subscribers] [repeat]
+
+Ends with the backend :py:func:`pyspreedly.objectify.fastest_backend`
+picks for the list, the one to pass to
+:py:func:`pyspreedly.objectify.set_backend`.
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyspreedly.objectify import (available_backends, get_backend,
+        fastest_backend)
+from export_bench import SyntheticSubscribers
+
+
+def best(func, repeat):
+    timings = []
+    for i in xrange(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    single = SyntheticSubscribers(1).read()
+    single = single[single.index('<subscriber>'):single.rindex('</subscribers>')]
+    large = SyntheticSubscribers(subscribers).read()
+    print 'list of {0} subscribers, {1:.1f} MB'.format(subscribers,
+            len(large) / 1e6)
+    for name in available_backends():
+        backend = get_backend(name)
+        one = best(lambda: [backend.parse(single) for i in xrange(1000)],
+                repeat) / 1000
+        whole = best(lambda: backend.parse(large), repeat)
+        stream = best(lambda: sum(1 for s in backend.iterparse(large)), repeat)
+        print '{0:6} single {1:7.1f}us  list {2:7.3f}s ({3:8.0f}/s)  streamed {4:7.3f}s ({5:8.0f}/s)'.format(
+                name, one * 1e6, whole, subscribers / whole,
+                stream, subscribers / stream)
+    print 'fastest: {0}'.format(fastest_backend(large, repeat)[0][1])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Seeding test subscribers one at a time with create_subscriber against
+Seeder, against the stub in a child process answering in 20ms on average.
+
+    python benchmarks/seed_bench.py [subscribers] [concurrency]
+
+Prints subscribers per second for serial creation, seeding with the default
+mix (up to three requests per subscriber) and the teardown, and how long
+50,000 subscribers would take at that rate.
+"""
+import os
+import sys
+import time
+import random
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from requests.adapters import HTTPAdapter
+from pyspreedly.api import Client
+from pyspreedly.seeding import Seeder
+from pyspreedly.stub import StubServer
+
+
+def serve(connection):
+    with StubServer(latency=lambda: random.expovariate(50)) as server:
+        connection.send(server.url)
+        connection.recv()
+
+
+def show(name, count, seconds):
+    print '{0:22} {1:6} in {2:6.2f}s, {3:7.1f}/s, 50k in {4:5.1f} min'.format(
+            name, count, seconds, count / seconds, 50000 * seconds / count / 60)
+
+
+if __name__ == '__main__':
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    connection, child = multiprocessing.Pipe()
+    stub = multiprocessing.Process(target=serve, args=(child,))
+    stub.start()
+    url = connection.recv()
+    session = requests.Session()
+    session.mount(url, HTTPAdapter(pool_connections=1,
+        pool_maxsize=concurrency))
+    client = Client('token', 'site', session=session, base_host=url)
+
+    serial = Seeder(client, concurrency=concurrency)
+    started = time.time()
+    for customer_id in serial.reserve(subscribers):
+        client.create_subscriber(customer_id, 'serial')
+    show('serial create', subscribers, time.time() - started)
+    serial.teardown()
+
+    seeder = Seeder(client, concurrency=concurrency)
+    for result in seeder.seed(subscribers):
+        pass
+    show('seed, default mix', subscribers, seeder.stats['seconds'])
+    report = seeder.teardown()
+    show('teardown', report['deleted'], report['seconds'])
+    session.close()
+    connection.send('stop')
+    stub.join()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Signup url generation: the original per call function, the current
+get_signup_url and the batch get_signup_urls.
+
+    python benchmarks/signup_url_bench.py [rows]
+
+The original joined the segments without quoting them, so it only gave
+valid urls for screen names without spaces, reserved or non-ascii
+characters.
+"""
+import os
+import sys
+import time
+from urlparse import urljoin
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyspreedly.api import Client
+
+
+def baseline_signup_url(self, subscriber_id, plan_id, screen_name,
+        token=None):
+    # Client.get_signup_url before the url templates, unchanged
+    subscriber_id = str(subscriber_id)
+    plan_id = str(plan_id)
+    if token:
+        url = '/'.join((self.site_name, 'subscribers',subscriber_id,token,
+            'subscribe', plan_id))
+    else:
+        url = '/'.join((self.site_name, 'subscribers',subscriber_id,'subscribe',
+            plan_id,screen_name))
+    url = urljoin(self.base_host, url)
+    return url
+
+
+def rows(count):
+    for i in xrange(count):
+        yield (i, 100 + i % 5, u'user name {0}'.format(i))
+
+
+def show(name, count, seconds):
+    print '{0:22} {1:>9} urls {2:6.2f}s {3:9.0f} urls/s'.format(
+            name, count, seconds, count / seconds)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    client = Client('token', 'site')
+
+    start = time.time()
+    for subscriber_id, plan_id, screen_name in rows(count):
+        baseline_signup_url(client, subscriber_id, plan_id, screen_name)
+    show('original get_signup_url', count, time.time() - start)
+
+    start = time.time()
+    for subscriber_id, plan_id, screen_name in rows(count):
+        client.get_signup_url(subscriber_id, plan_id, screen_name)
+    show('get_signup_url', count, time.time() - start)
+
+    start = time.time()
+    for url in client.get_signup_urls(rows(count)):
+        pass
+    show('get_signup_urls', count, time.time() - start)
@@ -1,20 +1,73 @@
 import time, calendar
+import threading
+import zlib
 from urlparse import urljoin
+from urllib import quote
+from itertools import izip, repeat
 import requests
 from datetime import datetime
 from xml.etree import ElementTree as ET
-from objectify import objectify_spreedly
+from objectify import objectify_spreedly, iterparse_spreedly
+from catalog import PlanCatalog
+from bulk import bulk_map
+from replay import RecordingSession
+from deadline import as_deadline, DeadlineExceeded
+from dispatch import lane, current_lane
 import re
 
 
 __all__ = [
-        'API_VERSION', 'Client', ]
+        'API_VERSION', 'BASE_HOST', 'Client', ]
 
 API_VERSION = 'v4'
+BASE_HOST = 'https://spreedly.com'
+PLAN_CACHE_SECONDS = 300
+COMPRESS_MIN_BYTES = 1024
+REQUEST_TIMEOUT = 60
 
 _user_exists_re = re.compile(ur"A subscriber with a customer-id of \d+ already exists.", re.UNICODE)
 
 
+def _gzip(data):
+    ''' gzip compresses `data`'''
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _url_part(value):
+    ''' Quotes a value for use as one path segment of a url'''
+    if isinstance(value, (int, long)):
+        return str(value)
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    # '~' is unreserved (RFC 3986) but python 2's quote escapes it
+    return quote(str(value), safe='~')
+
+
+class _Prefetch(object):
+    ''' Calls `func(*args)` in a background thread, in the caller's lane'''
+
+    def __init__(self, func, *args):
+        self._result = self._error = None
+        self._thread = threading.Thread(target=self._run,
+                args=(func, args, current_lane()))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args, lane_name):
+        try:
+            with lane(lane_name):
+                self._result = func(*args)
+        except Exception as e:
+            self._error = e
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
 def utc_to_local(dt):
     ''' Converts utc datetime to local'''
     secs = calendar.timegm(dt.timetuple())
@@ -32,21 +85,64 @@ def str_to_datetime(s):
 
 class Client(object):
     """
-    .. py:class:: Client(token, site_name)
+    .. py:class:: Client(token, site_name[, session=None, dispatcher=None, base_host=BASE_HOST, compress=True, compress_requests=False, parse_executor=None, timeout=REQUEST_TIMEOUT, interner=None, hedge=None])
     Create an object to manage queries for a Client on a given site.
 
     :param token: API access token for authorization.
     :param site_name: the site_name registered with spreedly.
+    :param session: :py:class:`requests.Session` to send requests through,
+        so several clients can share one connection pool.  Default `None`
+        uses a fresh connection per request.
+    :param dispatcher: :py:class:`pyspreedly.dispatch.Dispatcher` applying
+        rate limits and scheduling to requests, or `None`.
+    :param base_host: where to send requests, eg - a local stand-in server
+        (see :py:mod:`pyspreedly.stub`).  Default spreedly.com
+    :param compress: ask for gzip/deflate compressed responses.  List
+        responses are decompressed as they stream into the parser.
+        Default `True`
+    :param compress_requests: gzip request bodies of `COMPRESS_MIN_BYTES`
+        or more.  Only for servers accepting `Content-Encoding: gzip`.
+        Default `False`
+    :param parse_executor: :py:class:`pyspreedly.executor.ParseExecutor`
+        parsing large responses in worker processes, or `None` to parse
+        everything in the calling thread.
+    :param timeout: seconds any one request may wait to connect or for
+        data, `None` for ever.  Calls with a deadline get the smaller of
+        this and what is left of the deadline.  Default `REQUEST_TIMEOUT`
+    :param interner: :py:class:`pyspreedly.objectify.ValueInterner` shared
+        by every response this client parses, so repeated values like
+        currency codes, plan names and prices are one object across all the
+        records kept around.  Default `None`
+    :param hedge: :py:class:`pyspreedly.hedging.HedgePolicy` to send
+        :py:meth:`get_info` and :py:meth:`get_plans` a second time when
+        they are slow, or `None`.  Policies can be shared between clients.
     """
 
-    def __init__(self, token, site_name):
+    def __init__(self, token, site_name, session=None, dispatcher=None,
+            base_host=BASE_HOST, compress=True, compress_requests=False,
+            parse_executor=None, timeout=REQUEST_TIMEOUT, interner=None,
+            hedge=None):
         self.auth = token
         self.site_name = site_name
-        self.base_host = 'https://spreedly.com'
+        self.base_host = base_host
         self.base_path = '/api/{api_version}/{site_name}/'.format(
                 api_version=API_VERSION, site_name=site_name)
         self.base_url = urljoin(self.base_host,self.base_path)
         self.url = None
+        self.session = session
+        self.dispatcher = dispatcher
+        self.compress = compress
+        self.compress_requests = compress_requests
+        self.parse_executor = parse_executor
+        self.timeout = timeout
+        self.interner = interner
+        self.hedge = hedge
+        self._plan_catalog = None
+        site_url = urljoin(self.base_host, _url_part(site_name))
+        self._signup_url = (site_url +
+                '/subscribers/{0}/subscribe/{1}/{2}').format
+        self._signup_token_url = (site_url +
+                '/subscribers/{0}/{1}/subscribe/{2}').format
 
     def _ft(self, tree):
         def ft(x):
@@ -56,8 +152,9 @@ class Client(object):
                 None
         return ft
 
-    def query(self, url, data=None, action='get'):
-        """ .. py:method:: query(url[, data=None, put='get'])
+    def query(self, url, data=None, action='get', stream=False,
+            deadline=None):
+        """ .. py:method:: query(url[, data=None, put='get', stream=False, deadline=None])
 
         which has the problem that it doesn't check if there is data for
         PUT, and is hard to read.
@@ -71,8 +168,18 @@ class Client(object):
         :param data: the data to send in the request. Default to `None`
         :type data: UTF-8 encoded XML or None
         :param action: one of 'get', 'post', 'put' and 'delete'.  Case insensitive, Default 'get'
+        :param stream: don't read the body up front, so it can be parsed
+            from `response.raw` as it arrives.  Default `False`
+        :param deadline: seconds or :py:class:`pyspreedly.deadline.Deadline`
+            the whole call has to finish in, including waiting for the
+            dispatcher.  The request's timeout is what is left of it.
+            Every other method takes a `deadline` too and shares it between
+            all the requests it makes.  Default `None` uses the deadline set
+            with :py:func:`pyspreedly.deadline.deadline`, if any.
         :return: response object
         :rtype: :py:mod:`requests` response object
+        :raises: :py:exc:`pyspreedly.deadline.DeadlineExceeded` once the
+            deadline has passed, without sending the request
         """
         action = action.lower()
         if action not in ('get', 'put', 'post','delete'):
@@ -80,59 +187,185 @@ class Client(object):
         url = urljoin(self.base_url, url)
         headers = {
                 'User-Agent': 'python-spreedly 1.1',
+                'Accept-Encoding': 'gzip, deflate' if self.compress
+                    else 'identity',
                 }
         if action in ('put','post'):
             headers['Content-Type'] = 'application/xml'
+            if data:
+                # bodies are sent as given, the templates below are
+                # written without whitespace between the tags
+                if isinstance(data, unicode):
+                    data = data.encode('utf-8')
+                if self.compress_requests and \
+                        len(data) >= COMPRESS_MIN_BYTES:
+                    data = _gzip(data)
+                    headers['Content-Encoding'] = 'gzip'
         auth = (self.auth,'X')
-        response = getattr(requests, action)(url, auth=auth, headers=headers,
-                                             data=data)
-        return response
+        deadline = as_deadline(deadline)
 
-    def get_plans(self):
-        """ .. py:method::get_plans()
-        get subscription plans for the configured site
-        :returns: data as dict
-        :raises: :py:exc:`HTTPError` if response is not 200
+        def send():
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = deadline.timeout(timeout)
+            try:
+                return getattr(self.session or requests, action)(url,
+                        auth=auth, headers=headers, data=data, stream=stream,
+                        timeout=timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded(
+                            "Deadline exceeded waiting for {0}: {1}".format(
+                                url, e))
+                raise
+        if self.dispatcher is not None:
+            return self.dispatcher.dispatch(self.site_name, send,
+                    deadline=deadline)
+        return send()
+
+    def _read(self, url, stream=False, deadline=None):
+        ''' GET `url`, hedged when the client has a hedge policy.  Only for
+        requests that are safe to send twice.'''
+        if self.hedge is None:
+            return self.query(url, action='get', stream=stream,
+                    deadline=deadline)
+        deadline = as_deadline(deadline)
+        return self.hedge.run(lambda: self.query(url, action='get',
+            stream=stream, deadline=deadline), lambda r: r.close())
+
+    def start_recording(self, path):
+        """ .. py:method:: start_recording(path)
+        Record every request and response from now on to `path`, for
+        playing back with :py:mod:`pyspreedly.replay`.  The api token is
+        redacted from the recording.
         """
-        response = self.query('subscription_plans.xml', action='get')
+        self.session = RecordingSession(self.session or requests, self, path)
 
+    def stop_recording(self):
+        """ .. py:method:: stop_recording()
+        Stop recording and close the recording file.
+        """
+        if isinstance(self.session, RecordingSession):
+            self.session.close()
+            session = self.session.session
+            self.session = None if session is requests else session
+
+    def _objectify(self, response):
+        ''' Parse the body of a response'''
+        if self.parse_executor is not None:
+            return self.parse_executor.parse(response.content,
+                    self.interner)
+        return objectify_spreedly(response.text, interner=self.interner)
+
+    def _stream(self, response):
+        ''' The body of a `stream=True` response as a file object,
+        decompressed as it is read'''
         if response.status_code != 200:
+            response.close()
             e = requests.HTTPError()
             e.code = response.status_code
             raise e
+        response.raw.decode_content = True
+        return response.raw
+
+    def get_plans(self, deadline=None):
+        """ .. py:method::get_plans([deadline=None])
+        get subscription plans for the configured site
+        :param deadline: see :py:meth:`query`
+        :returns: data as dict
+        :raises: :py:exc:`HTTPError` if response is not 200
+        """
+        response = self._read('subscription_plans.xml', stream=True,
+                deadline=deadline)
 
         # Parse
-        result = objectify_spreedly(response.text)
+        try:
+            raw = self._stream(response)
+            if self.parse_executor is not None:
+                return self.parse_executor.parse(raw.read(), self.interner)
+            result = objectify_spreedly(raw, interner=self.interner)
+        finally:
+            response.close()
         return result
 
+    def get_plan_catalog(self, max_age=PLAN_CACHE_SECONDS, deadline=None):
+        """ .. py:method::get_plan_catalog([max_age=PLAN_CACHE_SECONDS, deadline=None])
+        get the cached :py:class:`pyspreedly.catalog.PlanCatalog`, fetching
+        the plans again if the cached catalog is older than `max_age` seconds
+        :param deadline: see :py:meth:`query`
+        :returns: :py:class:`pyspreedly.catalog.PlanCatalog`
+        :raises: :py:exc:`HTTPError` if the plans have to be fetched and the
+            response is not 200
+        """
+        catalog = self._plan_catalog
+        if catalog is None or time.time() - catalog.built_at > max_age:
+            catalog = self.refresh_plan_catalog(deadline)
+        return catalog
+
+    def refresh_plan_catalog(self, deadline=None):
+        """ .. py:method::refresh_plan_catalog([deadline=None])
+        fetch the plans and replace the cached catalog.  The new catalog is
+        built completely before it is swapped in, so concurrent readers get
+        either the old or the new one.
+        :param deadline: see :py:meth:`query`
+        :returns: :py:class:`pyspreedly.catalog.PlanCatalog`
+        """
+        catalog = PlanCatalog(self.get_plans(deadline))
+        self._plan_catalog = catalog
+        return catalog
+
     ## Subscriber manipulation
-    def create_subscriber(self, customer_id, screen_name):
-        ''' .. py:method::create_subscriber(customer_id, screen_name)
+    def iter_subscribers(self, deadline=None):
+        """ .. py:method:: iter_subscribers([deadline=None])
+        Stream every subscriber on the site, parsing the response as it
+        arrives instead of building the whole list in memory.
+
+        :param deadline: see :py:meth:`query`.  Covers reading the whole
+            list, not just the request.
+        :returns: iterator of subscriber dictionaries
+        :raises: :py:exc:`HTTPError` if response is not 200
+        """
+        deadline = as_deadline(deadline)
+        response = self.query('subscribers.xml', action='get', stream=True,
+                deadline=deadline)
+        raw = self._stream(response)
+        try:
+            for subscriber in iterparse_spreedly(raw,
+                    interner=self.interner):
+                if deadline is not None:
+                    deadline.check()
+                yield subscriber
+        finally:
+            response.close()
+
+    def create_subscriber(self, customer_id, screen_name, deadline=None):
+        ''' .. py:method::create_subscriber(customer_id, screen_name[, deadline=None])
         Creates a subscription
         :param customer_id: Customer ID
         :param screen_name: Customer's screen name
+        :param deadline: see :py:meth:`query`.  Shared with the
+            :py:meth:`get_info` made when the subscriber already exists.
         :returns: Data for created customer
         :raises: HTTPError if response code isn't 201
         '''
-        data = '''
-        <subscriber>
-            <customer-id>{id}</customer-id>
-            <screen-name>{name}</screen-name>
-        </subscriber>
-        '''.format(id=customer_id, name=screen_name)
+        data = ('<subscriber><customer-id>{id}</customer-id>'
+                '<screen-name>{name}</screen-name></subscriber>').format(
+                        id=customer_id, name=screen_name)
 
-        response = self.query(url='subscribers.xml',data=data, action='post')
+        deadline = as_deadline(deadline)
+        response = self.query(url='subscribers.xml',data=data, action='post',
+                deadline=deadline)
 
         # Parse
         if not response.status_code == 201:
             if response.status_code == 403 and _user_exists_re.search(response.text):
-                return self.get_info(customer_id)
+                return self.get_info(customer_id, deadline=deadline)
             e = requests.HTTPError(
                     "status code: {0}, text: {1}".format(
                         response.status_code, response.text))
             e.response = response
             raise e
-        return objectify_spreedly(response.text)
+        return self._objectify(response)
 
     def get_signup_url(self, subscriber_id, plan_id, screen_name, token=None):
         ''' .. py:method:: get_signup_url(subscriber_id, plan_id, screen_name, token=None)
@@ -146,60 +379,85 @@ class Client(object):
             of the url
         :returns: url for subscription
         '''
-        subscriber_id = str(subscriber_id)
-        plan_id = str(plan_id)
         if token:
-            url = '/'.join((self.site_name, 'subscribers',subscriber_id,token,
-                'subscribe', plan_id))
-        else:
-            url = '/'.join((self.site_name, 'subscribers',subscriber_id,'subscribe',
-                plan_id,screen_name))
-        url = urljoin(self.base_host, url)
-        return url
-
-    def subscribe(self, subscriber_id, plan_id=None):
-        ''' .. py:method:: subscribe(subscriber_id, plan_id)
+            return self._signup_token_url(_url_part(subscriber_id),
+                    _url_part(token), _url_part(plan_id))
+        return self._signup_url(_url_part(subscriber_id), _url_part(plan_id),
+                _url_part(screen_name))
+
+    def get_signup_urls(self, rows):
+        ''' .. py:method:: get_signup_urls(rows)
+        :py:meth:`get_signup_url` for many subscribers at once.  URLs are
+        generated lazily, one per row, so this can be fed straight from a
+        cursor and into a file.
+
+        :param rows: iterable of `(subscriber_id, plan_id, screen_name)` or
+            `(subscriber_id, plan_id, screen_name, token)` tuples, or a dict
+            of columns with the keys `subscriber_id`, `plan_id`,
+            `screen_name` and optionally `token`.
+        :returns: iterator of urls, in the order of `rows`
+        '''
+        if isinstance(rows, dict):
+            rows = izip(rows['subscriber_id'], rows['plan_id'],
+                    rows['screen_name'], rows.get('token') or repeat(None))
+        signup_url = self._signup_url
+        token_url = self._signup_token_url
+        part = _url_part
+        plan_parts = {}
+        for row in rows:
+            subscriber_id, plan_id, screen_name = row[:3]
+            token = row[3] if len(row) > 3 else None
+            try:
+                plan_part = plan_parts[plan_id]
+            except KeyError:
+                plan_part = plan_parts[plan_id] = part(plan_id)
+            if token:
+                yield token_url(part(subscriber_id), part(token), plan_part)
+            else:
+                yield signup_url(part(subscriber_id), plan_part,
+                        part(screen_name))
+
+    def subscribe(self, subscriber_id, plan_id=None, deadline=None):
+        ''' .. py:method:: subscribe(subscriber_id, plan_id[, deadline=None])
         Subscribe a user to the site plan on a free trial
 
         subscribe a user to a free trial plan.
         :param subscriber_id: ID of the subscriber
         :parma plan_id: subscription plan ID
+        :param deadline: see :py:meth:`query`
         :returns: dictionary with xml data if all is good
         :raises: HTTPError if response status not 200
         '''
         #TODO - This lacks subscription for a site to a plan_id.
-        data = '''
-        <subscription_plan>
-            <id>{plan_id}</id>
-        </subscription_plan>'''.format(plan_id=plan_id)
+        data = ('<subscription_plan><id>{plan_id}</id>'
+                '</subscription_plan>').format(plan_id=plan_id)
 
         url = 'subscribers/{id}/subscribe_to_free_trial.xml'.format(id=subscriber_id)
-        response = self.query(url, data, action='post')
+        response = self.query(url, data, action='post', deadline=deadline)
 
         if response.status_code != 200:
             raise requests.HTTPError("status code: {0}, text: {1}".format(response.status_code, response.text))
 
         # Parse
-        return objectify_spreedly(response.text)
+        return self._objectify(response)
 
-    def change_plan(self, subscriber_id, plan_id):
-        ''' .. py:method:: change_plan(subscriber_id, plan_id)
+    def change_plan(self, subscriber_id, plan_id, deadline=None):
+        ''' .. py:method:: change_plan(subscriber_id, plan_id[, deadline=None])
         Change a subscription to a new plan, needs the user to be activated
 
         subscribe a user to a free trial plan.
         :param subscriber_id: ID of the subscriber
         :parma plan_id: subscription plan ID to change to
+        :param deadline: see :py:meth:`query`
         :returns: status code
         :raises: HTTPError if response status not 200
         '''
         #TODO - This lacks subscription for a site to a plan_id.
-        data = '''
-        <subscription_plan>
-            <id>{plan_id}</id>
-        </subscription_plan>'''.format(plan_id=plan_id)
+        data = ('<subscription_plan><id>{plan_id}</id>'
+                '</subscription_plan>').format(plan_id=plan_id)
 
         url = 'subscribers/{id}/change_subscription_plan.xml'.format(id=subscriber_id)
-        response = self.query(url, data, action='put')
+        response = self.query(url, data, action='put', deadline=deadline)
 
         if response.status_code != 200:
             raise requests.HTTPError("status code: {0}, text: {1}".format(response.status_code, response.text))
@@ -207,66 +465,89 @@ class Client(object):
         # Parse
         return response.status_code
 
-    def get_info(self, subscriber_id):
-        """ .. py:method:: get_info(subscriber_id)
+    def get_info(self, subscriber_id, deadline=None):
+        """ .. py:method:: get_info(subscriber_id[, deadline=None])
 
         :param subscriber_id: Id of subscriber to fetch
+        :param deadline: see :py:meth:`query`
         :returns: Data as dictionary
         :raises: HTTPError if not 200
         """
         url = 'subscribers/{id}.xml'.format(id=subscriber_id)
-        response = self.query(url, action='get')
+        response = self._read(url, deadline=deadline)
         if response.status_code != 200:
             e = requests.HTTPError()
             e.code = response.status_code
             raise e
 
         # Parse
-        return objectify_spreedly(response.text)
+        return self._objectify(response)
+
+    def get_infos(self, subscriber_ids, concurrency=8, deadline=None):
+        """ .. py:method:: get_infos(subscriber_ids[, concurrency=8, deadline=None])
+        :py:meth:`get_info` for many subscribers, with up to `concurrency`
+        requests in flight.  Share a connection pool (`session`) for this to
+        pay off.
+
+        :param subscriber_ids: iterable of subscriber ids
+        :param concurrency: requests in flight at once
+        :param deadline: see :py:meth:`query`.  One deadline for all the
+            ids; the ones not fetched in time fail with
+            :py:exc:`pyspreedly.deadline.DeadlineExceeded`.
+        :returns: iterator of `(subscriber_id, data, error)` in the order
+            the responses arrive, `error` being the :py:exc:`HTTPError` (or
+            other exception) for failed ids and `None` otherwise
+        """
+        deadline = as_deadline(deadline)
+        if deadline is None:
+            return bulk_map(self.get_info, subscriber_ids, concurrency)
+        return bulk_map(lambda id: self.get_info(id, deadline=deadline),
+                subscriber_ids, concurrency)
 
-    def allow_free_trial(self, subscriber_id):
-        """ .. py:method:: allow_free_trial(subscriber_id)
+    def allow_free_trial(self, subscriber_id, deadline=None):
+        """ .. py:method:: allow_free_trial(subscriber_id[, deadline=None])
 
         programatically allow for a new free trial
         :param subscriber_id: the id of the subscriber
+        :param deadline: see :py:meth:`query`
         :returns: subscriber data as dictionary if all good,
         :raises: HTTPError if not so good (non-200)
         """
         url = 'subscribers/{id}/allow_free_trial.xml'.format(id=subscriber_id)
-        response = self.query(url,'', action='post')
+        response = self.query(url,'', action='post', deadline=deadline)
         if response.status_code is not 200:
             raise requests.HTTPError('status; {0}, text {1}'.format(
                 response.status_code, response.text))
         else:
-            return objectify_spreedly(response.text)
+            return self._objectify(response)
 
 
-    def add_fee(self, subscriber_id, name, description, group, amount):
-        """ .. py:method:: add_fee(subscriber_id, name, description, group, amount)
+    def add_fee(self, subscriber_id, name, description, group, amount,
+            deadline=None):
+        """ .. py:method:: add_fee(subscriber_id, name, description, group, amount[, deadline=None])
         Add a fee to a user with subscriber_id
         :param subscriber_id: the id of the subscriber
         :param name: the name of the fee (eg - Excess Bandwidth Charge)
         :param description: a description of the charge
         :param group: a group to add this charge too
         :param amount: the amount the charge is for
+        :param deadline: see :py:meth:`query`
         :returns: the response object
         """
-        data = """
-        <fee>
-          <name>{name}</name>
-          <description>{description}</description>
-          <group>{group}</group>
-          <amount>{amount}</amount>
-        </fee>
-        """.format(name=name, description=description, group=group, amount=amount)
+        data = ('<fee><name>{name}</name>'
+                '<description>{description}</description>'
+                '<group>{group}</group><amount>{amount}</amount>'
+                '</fee>').format(name=name, description=description,
+                        group=group, amount=amount)
         url = 'subscribers/{id}/fees.xml'.format(id=subscriber_id)
-        response = self.query(url,data, action='post')
+        response = self.query(url,data, action='post', deadline=deadline)
         return response
 
-    def set_info(self, subscriber_id, **kw):
-        """ .. py:method: set_info(subscriber_id[, **kw])
+    def set_info(self, subscriber_id, deadline=None, **kw):
+        """ .. py:method: set_info(subscriber_id[, deadline=None, **kw])
         this corrisponds to the update-subscriber action. passed kw args are
         placed into the xml data (not sure how the -/_ are dealt with though)
+        `deadline` is the one of :py:meth:`query`, not a field.
 
         There is a design flaw atm where sclient.set_info(sclient.get_info(123))
         will not work at all as the keys are all different
@@ -278,12 +559,13 @@ class Client(object):
             e.text = value
 
         url = 'subscribers/{id}.xml'.format(id=subscriber_id)
-        self.query(url, data=ET.tostring(root), action='put')
+        self.query(url, data=ET.tostring(root), action='put',
+                deadline=deadline)
 
     def create_complimentary_subscription(self, subscriber_id,
             duration, duration_units, feature_level,
-            start_time=None, amount=None):
-        """ .. py:method:: create_complimentary_subscription(subscriber_id, duration, duration_units, feature_level[, start_time=None, amount=None])
+            start_time=None, amount=None, deadline=None):
+        """ .. py:method:: create_complimentary_subscription(subscriber_id, duration, duration_units, feature_level[, start_time=None, amount=None, deadline=None])
 
         corrisponds to adding corrisponding subscription to a subscriber
         :param subscriber_id: Subscriber ID
@@ -294,82 +576,205 @@ class Client(object):
         :type start_time: datetime.datetime or None
         :param amount: How much this comp is worth
         :type amount: float or None
+        :param deadline: see :py:meth:`query`
         """
         if start_time and amount:
-            comp_value = """<start-time>{start_time}</start_time>
-            <amount>{amount}</amount>""".format(
+            comp_value = '<start-time>{start_time}</start_time>' \
+                    '<amount>{amount}</amount>'.format(
                     start_time=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
                     amount=amount)
         else:
             comp_value = ''
-        data = """<complimentary_subscription>
-            <duration_quantity>{duration}</duration_quantity>
-            <duration_units>{duration_units}</duration_units>
-            <feature_level>{level}</feature_level>
-            {comp_value}
-            </complimentary_subscription>""".format(
+        data = ('<complimentary_subscription>'
+                '<duration_quantity>{duration}</duration_quantity>'
+                '<duration_units>{duration_units}</duration_units>'
+                '<feature_level>{level}</feature_level>{comp_value}'
+                '</complimentary_subscription>').format(
                     duration=duration, duration_units=duration_units, 
                     level=feature_level,comp_value=comp_value)
 
         url = 'subscribers/{subscriber_id}/complimentary_subscriptions.xml'.format(subscriber_id=subscriber_id)
-        self.query(url, data, action='post')
+        self.query(url, data, action='post', deadline=deadline)
 
-    def complimentary_time_extensions(self, subscriber_id, duration, duration_units):
-        """ .. py:method:: complimentary_time_extension(subscriber_id, duration, duration_units)
+    def complimentary_time_extensions(self, subscriber_id, duration,
+            duration_units, deadline=None):
+        """ .. py:method:: complimentary_time_extension(subscriber_id, duration, duration_units[, deadline=None])
 
         corrisponds to adding complimentary time extension to a subscriber
+        :param deadline: see :py:meth:`query`
         """
-        data = """<complimentary_time_extension>
-            <duration_quantity>{duration}</duration_quantity>
-            <duration_units>{duration_units}</duration_units>
-            </complimentary_time_extension>""".format(
+        data = ('<complimentary_time_extension>'
+                '<duration_quantity>{duration}</duration_quantity>'
+                '<duration_units>{duration_units}</duration_units>'
+                '</complimentary_time_extension>').format(
                     duration=duration, duration_units=duration_units)
 
         url ='subscribers/{id}/complimentary_time_extensions.xml'.format(
                 id=subscriber_id)
-        self.query(url, data, action='post')
+        self.query(url, data, action='post', deadline=deadline)
 
-    def get_or_create_subscriber(self, subscriber_id, screen_name):
-        """ .. py:method:: get_or_create_subscriber(subscriber_id, screen_name)
+    def get_or_create_subscriber(self, subscriber_id, screen_name,
+            deadline=None):
+        """ .. py:method:: get_or_create_subscriber(subscriber_id, screen_name[, deadline=None])
         Tries to get info for a subscriber, else creates a new subscriber
+
+        :param deadline: see :py:meth:`query`.  One deadline for the lookup
+            and the requests of :py:meth:`create_subscriber`.
         """
+        deadline = as_deadline(deadline)
         try:
-            return self.get_info(subscriber_id)
+            return self.get_info(subscriber_id, deadline=deadline)
         except requests.HTTPError, e:
             if e.code == 404:
-                return self.create_subscriber(subscriber_id, screen_name)
+                return self.create_subscriber(subscriber_id, screen_name,
+                        deadline=deadline)
 
     ## Payment Gateway Configuration
     #TODO
 
     ## Invoicing
-    #TODO
+    def create_invoice(self, subscriber_id, plan_id, screen_name=None,
+            email=None, deadline=None):
+        """ .. py:method:: create_invoice(subscriber_id, plan_id[, screen_name=None, email=None, deadline=None])
+        Create an invoice for subscribing `subscriber_id` to a plan.  The
+        subscriber is created by spreedly if it doesn't exist yet.
+
+        :param subscriber_id: ID of the subscriber
+        :param plan_id: subscription plan ID
+        :param screen_name: subscriber's screen name
+        :param email: subscriber's email
+        :param deadline: see :py:meth:`query`
+        :returns: invoice as dictionary, including the `token` to pay it with
+        :raises: HTTPError if response code isn't 201
+        """
+        root = ET.Element('invoice')
+        ET.SubElement(root, 'subscription-plan-id').text = str(plan_id)
+        subscriber = ET.SubElement(root, 'subscriber')
+        ET.SubElement(subscriber, 'customer-id').text = str(subscriber_id)
+        if screen_name is not None:
+            ET.SubElement(subscriber, 'screen-name').text = screen_name
+        if email is not None:
+            ET.SubElement(subscriber, 'email').text = email
+
+        response = self.query('invoices.xml', data=ET.tostring(root),
+                action='post', deadline=deadline)
+        if response.status_code != 201:
+            e = requests.HTTPError(
+                    "status code: {0}, text: {1}".format(
+                        response.status_code, response.text))
+            e.code = response.status_code
+            e.response = response
+            raise e
+        return self._objectify(response)
 
     ## Payments
-    #TODO
+    def pay_invoice(self, invoice_token, credit_card=None, deadline=None):
+        """ .. py:method:: pay_invoice(invoice_token[, credit_card=None, deadline=None])
+        Pay an invoice created with :py:meth:`create_invoice`.
+
+        :param invoice_token: the `token` of the invoice
+        :param credit_card: dict of credit card fields (number, card_type,
+            verification_value, month, year, first_name, last_name).
+            Strings are unicode or utf-8.  Default `None` pays with the
+            payment method on file.
+        :param deadline: see :py:meth:`query`
+        :returns: the paid invoice as dictionary
+        :raises: HTTPError if response code isn't 200
+        """
+        root = ET.Element('payment')
+        if credit_card:
+            ET.SubElement(root, 'account-type').text = 'credit-card'
+            card = ET.SubElement(root, 'credit-card')
+            for key, value in credit_card.items():
+                if isinstance(value, str):
+                    value = value.decode('utf-8')
+                elif not isinstance(value, unicode):
+                    value = unicode(value)
+                ET.SubElement(card, key.replace('_', '-')).text = value
+        else:
+            ET.SubElement(root, 'account-type').text = 'on-file'
+
+        url = 'invoices/{token}/pay.xml'.format(token=invoice_token)
+        response = self.query(url, data=ET.tostring(root), action='put',
+                deadline=deadline)
+        if response.status_code != 200:
+            e = requests.HTTPError(
+                    "status code: {0}, text: {1}".format(
+                        response.status_code, response.text))
+            e.code = response.status_code
+            e.response = response
+            raise e
+        return self._objectify(response)
 
     ## Reporting
-    #TODO
+    def iter_transactions(self, since_id=None, cursor=None, prefetch=True,
+            deadline=None):
+        """ .. py:method:: iter_transactions([since_id=None, cursor=None, prefetch=True, deadline=None])
+        Stream every transaction after `since_id`, a page at a time.  Each
+        page is parsed as it arrives, and the next page is fetched in the
+        background while the current one is consumed.
+
+        :param since_id: only transactions with a higher id, default all
+        :param cursor: object with a `since_id` attribute and a
+            `save(since_id)` method, like
+            :py:class:`pyspreedly.reporting.TransactionCursor`.  Used for
+            `since_id` when it isn't passed, and saved after every page has
+            been consumed, so the next run carries on from there.
+        :param prefetch: fetch the next page while the current one is being
+            consumed.  Default `True`
+        :param deadline: see :py:meth:`query`.  One deadline for every page.
+        :returns: iterator of transaction dictionaries, oldest first
+        :raises: :py:exc:`HTTPError` if a response is not 200
+        """
+        if since_id is None and cursor is not None:
+            since_id = cursor.since_id
+        deadline = as_deadline(deadline)
+        page = self._transactions_page(since_id, deadline)
+        while page:
+            since_id = page[-1]['id']
+            next_page = _Prefetch(self._transactions_page, since_id,
+                    deadline) if prefetch else None
+            for transaction in page:
+                yield transaction
+            if cursor is not None:
+                cursor.save(since_id)
+            page = next_page.result() if next_page else \
+                    self._transactions_page(since_id, deadline)
+
+    def _transactions_page(self, since_id=None, deadline=None):
+        url = 'transactions.xml'
+        if since_id is not None:
+            url += '?since_id={0}'.format(since_id)
+        response = self.query(url, action='get', stream=True,
+                deadline=deadline)
+        raw = self._stream(response)
+        try:
+            return list(iterparse_spreedly(raw, interner=self.interner))
+        finally:
+            response.close()
 
     ## Emails
     #TODO
 
     ## Testing
-    def delete_subscriber(self, id):
-        """ .. py:method:: delete_subscriber(id)
+    def delete_subscriber(self, id, deadline=None):
+        """ .. py:method:: delete_subscriber(id[, deadline=None])
         delete a test subscriber
         :param id: user id
+        :param deadline: see :py:meth:`query`
         :returns: status code
         """
         url = "subscribers/{id}.xml".format(id=id)
-        response = self.query(url,action='delete')
+        response = self.query(url,action='delete', deadline=deadline)
         return response.status_code
 
-    def cleanup(self):
-        """ .. py:method:: cleanup()
+    def cleanup(self, deadline=None):
+        """ .. py:method:: cleanup([deadline=None])
         Removes ALL subscribers. NEVER USE IN PRODUCTION! (should only Remove
         test users...)
+        :param deadline: see :py:meth:`query`
         :returns: status code
         """
-        response = self.query('subscribers.xml', action='delete')
+        response = self.query('subscribers.xml', action='delete',
+                deadline=deadline)
         return response.status_code
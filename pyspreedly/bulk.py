@@ -0,0 +1,70 @@
+import threading
+from Queue import Queue
+from dispatch import lane, current_lane
+from deadline import deadline, current_deadline
+
+
+__all__ = [
+        'bulk_map', ]
+
+_done = object()
+
+
+def bulk_map(func, items, concurrency=8):
+    """
+    Call `func(item)` for every item with at most `concurrency` calls in
+    flight.  Items are read from `items` only as workers free up, so a
+    generator of any size can be passed in.  The calls run in the
+    dispatch lane and under the deadline of the calling thread.
+
+    :param func: function of one argument
+    :param items: iterable of arguments
+    :param concurrency: worker threads
+    :returns: iterator of `(item, result, error)` in the order calls
+        complete.  `error` is the exception raised by `func`, or `None`.
+    """
+    # taken now, not when the caller starts iterating
+    return _bulk_map(func, items, concurrency, current_lane(),
+            current_deadline())
+
+
+def _bulk_map(func, items, concurrency, lane_name, call_deadline):
+    tasks = Queue(concurrency * 2)
+    results = Queue(concurrency * 2)
+    errors = []
+
+    def work():
+        with lane(lane_name), deadline(call_deadline):
+            while True:
+                item = tasks.get()
+                if item is _done:
+                    results.put(_done)
+                    return
+                try:
+                    results.put((item, func(item), None))
+                except Exception as e:
+                    results.put((item, None, e))
+
+    def feed():
+        try:
+            for item in items:
+                tasks.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for i in range(concurrency):
+                tasks.put(_done)
+
+    for target in [feed] + [work] * concurrency:
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+    running = concurrency
+    while running:
+        result = results.get()
+        if result is _done:
+            running -= 1
+        else:
+            yield result
+    if errors:
+        raise errors[0]
@@ -0,0 +1,99 @@
+import time
+
+
+__all__ = [
+        'PlanCatalog', ]
+
+_empty = ()
+
+
+class PlanCatalog(object):
+    """
+    .. py:class:: PlanCatalog(plans)
+    Read-only snapshot of a site's subscription plans, indexed up front so
+    finding the plan for a feature level or id is a dictionary lookup
+    instead of a scan over :py:meth:`pyspreedly.api.Client.get_plans`.
+
+    Catalogs are never changed once built.  When the plans change a new
+    catalog is built and swapped in whole (see
+    :py:meth:`pyspreedly.api.Client.get_plan_catalog`), so a reader never
+    sees a half updated catalog.
+
+    :param plans: result of :py:meth:`pyspreedly.api.Client.get_plans`,
+        either `{'subscription_plan': {...}}` dicts or the plan dicts
+        themselves.
+    """
+
+    __slots__ = ('plans', 'by_price', 'built_at', '_by_id',
+            '_by_feature_level', '_by_plan_type', '_by_enabled')
+
+    def __init__(self, plans):
+        plans = tuple(p.get('subscription_plan', p) for p in plans)
+        self.plans = plans
+        self.built_at = time.time()
+        self._by_id = dict((p['id'], p) for p in plans)
+        self._by_feature_level = _group(plans, 'feature_level')
+        self._by_plan_type = _group(plans, 'plan_type')
+        self._by_enabled = _group(plans, 'enabled')
+        self.by_price = tuple(sorted(plans, key=_price_key))
+
+    def __len__(self):
+        return len(self.plans)
+
+    def __iter__(self):
+        return iter(self.plans)
+
+    def __contains__(self, plan_id):
+        return plan_id in self._by_id
+
+    def get(self, plan_id, default=None):
+        """ .. py:method:: get(plan_id[, default=None])
+        :returns: the plan with id `plan_id`, or `default`
+        """
+        return self._by_id.get(plan_id, default)
+
+    def __getitem__(self, plan_id):
+        return self._by_id[plan_id]
+
+    def for_feature_level(self, feature_level):
+        """ .. py:method:: for_feature_level(feature_level)
+        :returns: tuple of the plans with `feature_level`, cheapest first
+        """
+        return self._by_feature_level.get(feature_level, _empty)
+
+    def for_plan_type(self, plan_type):
+        """ .. py:method:: for_plan_type(plan_type)
+        :returns: tuple of the plans of `plan_type` (eg - 'regular',
+            'free_trial'), cheapest first
+        """
+        return self._by_plan_type.get(plan_type, _empty)
+
+    def enabled(self, enabled=True):
+        """ .. py:method:: enabled([enabled=True])
+        :returns: tuple of the enabled (or disabled) plans, cheapest first
+        """
+        return self._by_enabled.get(enabled, _empty)
+
+    def cheapest(self, feature_level=None):
+        """ .. py:method:: cheapest([feature_level=None])
+        :returns: the cheapest enabled plan, optionally for `feature_level`,
+            or `None`
+        """
+        plans = self.for_feature_level(feature_level) \
+                if feature_level is not None else self.by_price
+        for plan in plans:
+            if plan.get('enabled'):
+                return plan
+        return None
+
+
+def _price_key(plan):
+    price = plan.get('price')
+    return (price is None, price)
+
+
+def _group(plans, key):
+    groups = {}
+    for plan in sorted(plans, key=_price_key):
+        groups.setdefault(plan.get(key), []).append(plan)
+    return dict((k, tuple(v)) for k, v in groups.iteritems())
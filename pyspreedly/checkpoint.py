@@ -0,0 +1,93 @@
+import os
+import json
+import threading
+
+
+__all__ = [
+        'Checkpoint', ]
+
+
+class Checkpoint(object):
+    """
+    .. py:class:: Checkpoint(path[, sync=False])
+    Records the progress of a batch job in an append-only file of json
+    lines, one `{"key": ..., "state": ...}` entry per step, so a killed run
+    can pick up where it stopped.  The last entry for a key wins.
+
+    :param path: file to keep the progress in.  Progress already in the
+        file is loaded.  `None` keeps progress in memory only.
+    :param sync: fsync after every entry, so progress also survives the
+        machine going down and not just the process.
+    """
+
+    def __init__(self, path, sync=False):
+        self.path = path
+        self.sync = sync
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path is None:
+            return
+        torn = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn write when the run was killed
+                    self._entries[entry['key']] = entry
+        self._file = open(path, 'a')
+        if torn:
+            self._file.write('\n')
+
+    def get(self, key):
+        """ .. py:method:: get(key)
+        :returns: the last entry recorded for `key`, or `None`
+        """
+        return self._entries.get(unicode(key))
+
+    def state(self, key):
+        """ .. py:method:: state(key)
+        :returns: the last state recorded for `key`, or `None`
+        """
+        entry = self.get(key)
+        return entry['state'] if entry else None
+
+    def record(self, key, state, **data):
+        """ .. py:method:: record(key, state[, **data])
+        Record that `key` reached `state`.  Extra keyword arguments are
+        stored with the entry and must be json serializable.  The entry is
+        flushed before this returns.
+        """
+        entry = dict(data, key=unicode(key), state=state)
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._entries[entry['key']] = entry
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+                if self.sync:
+                    os.fsync(self._file.fileno())
+
+    def counts(self):
+        """ .. py:method:: counts()
+        :returns: dict of state to the number of keys in that state
+        """
+        counts = {}
+        with self._lock:
+            for entry in self._entries.itervalues():
+                counts[entry['state']] = counts.get(entry['state'], 0) + 1
+        return counts
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
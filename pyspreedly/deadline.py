@@ -0,0 +1,130 @@
+"""
+Overall time budgets for api calls.  A deadline covers everything a call
+does - waiting for the dispatcher, every request it makes and the fallback
+requests of eg - :py:meth:`pyspreedly.api.Client.get_or_create_subscriber`
+- and each request only gets what is left of it::
+
+    client.get_or_create_subscriber(id, name, deadline=0.5)
+
+or for every call a thread makes inside a block::
+
+    with deadline(0.5):
+        data = client.get_info(id)
+        client.add_fee(id, ...)
+
+Calls fail with :py:exc:`DeadlineExceeded` once the budget is spent,
+without sending anything.
+"""
+import time
+import threading
+from contextlib import contextmanager
+import requests
+
+
+__all__ = [
+        'DeadlineExceeded', 'Deadline', 'deadline', 'current_deadline',
+        'as_deadline', ]
+
+_local = threading.local()
+
+
+class DeadlineExceeded(requests.Timeout):
+    """
+    The deadline of a call passed.  A :py:exc:`requests.Timeout`, so code
+    already handling timeouts handles it too.
+    """
+
+
+class Deadline(object):
+    """
+    .. py:class:: Deadline(seconds)
+    A point in time `seconds` from now.
+    """
+
+    def __init__(self, seconds):
+        self.expires = time.time() + seconds
+
+    def __repr__(self):
+        return '<Deadline in {0:.3f}s>'.format(self.remaining())
+
+    def remaining(self):
+        """ .. py:method:: remaining()
+        :returns: seconds left, negative once expired
+        """
+        return self.expires - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """ .. py:method:: check()
+        :returns: seconds left
+        :raises: :py:exc:`DeadlineExceeded` if there are none
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(
+                    "Deadline exceeded {0:.3f}s ago".format(-remaining))
+        return remaining
+
+    def timeout(self, cap=None):
+        """ .. py:method:: timeout([cap=None])
+        :returns: the timeout for the next request: the seconds left, at
+            most `cap`
+        :raises: :py:exc:`DeadlineExceeded` if there are none
+        """
+        remaining = self.check()
+        if cap is not None and cap < remaining:
+            return cap
+        return remaining
+
+
+def _earliest(a, b):
+    if a is None:
+        return b
+    if b is None or a.expires <= b.expires:
+        return a
+    return b
+
+
+@contextmanager
+def deadline(seconds):
+    """ .. py:function:: deadline(seconds)
+    Context manager giving every call made by this thread inside the block
+    a deadline `seconds` from now.  Nested blocks can only shorten it.
+    Threads started inside the block don't inherit it; pass it to them
+    explicitly, eg - `with deadline(current_deadline()):` in the thread,
+    as :py:func:`pyspreedly.bulk.bulk_map` does.
+
+    :param seconds: seconds from now, a :py:class:`Deadline`, or `None` to
+        keep the current deadline
+    """
+    previous = current_deadline()
+    if seconds is not None and not isinstance(seconds, Deadline):
+        seconds = Deadline(seconds)
+    _local.deadline = _earliest(previous, seconds)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+def current_deadline():
+    """ .. py:function:: current_deadline()
+    :returns: the :py:class:`Deadline` set by :py:func:`deadline` for this
+        thread, or `None`
+    """
+    return getattr(_local, 'deadline', None)
+
+
+def as_deadline(value):
+    """ .. py:function:: as_deadline(value)
+    The deadline of a call: the earlier of `value` and
+    :py:func:`current_deadline`.
+
+    :param value: seconds from now, a :py:class:`Deadline` or `None`
+    :returns: :py:class:`Deadline` or `None` for no deadline
+    """
+    if value is not None and not isinstance(value, Deadline):
+        value = Deadline(value)
+    return _earliest(value, current_deadline())
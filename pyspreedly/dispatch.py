@@ -0,0 +1,352 @@
+import time
+import heapq
+import threading
+from itertools import count
+from collections import deque
+from contextlib import contextmanager
+from deadline import DeadlineExceeded
+
+
+__all__ = [
+        'INTERACTIVE', 'BATCH', 'lane', 'current_lane', 'TokenBucket',
+        'SiteBudget', 'LaneStats', 'FairScheduler', 'Dispatcher', ]
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+_local = threading.local()
+
+
+@contextmanager
+def lane(name):
+    """ .. py:function:: lane(name)
+    Context manager sending every request made by this thread inside the
+    block through the priority lane `name`::
+
+        with lane(BATCH):
+            for id in ids:
+                client.get_info(id)
+    """
+    previous = current_lane()
+    _local.lane = name
+    try:
+        yield
+    finally:
+        _local.lane = previous
+
+
+def current_lane():
+    """ .. py:function:: current_lane()
+    :returns: the lane set by :py:func:`lane` for this thread, or `None`
+    """
+    return getattr(_local, 'lane', None)
+
+
+class TokenBucket(object):
+    """
+    .. py:class:: TokenBucket(rate[, burst=None])
+    A thread safe token bucket rate limiter.  Waiters are served by
+    priority, then in the order they arrived, so a waiting high priority
+    caller gets the next token however many others are queued.
+
+    :param rate: tokens added per second.  `None` means unlimited.
+    :param burst: size of the bucket, defaults to `rate` (one second worth).
+        At least one token, so rates below one per second still get one.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = max(1.0, burst or rate or 0)
+        self._tokens = self.burst
+        self._stamp = time.time()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._arrivals = count()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst,
+                self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self, deadline=None, priority=0):
+        """ .. py:method:: acquire([deadline=None, priority=0])
+        Take a token, sleeping until one is available.
+
+        :param deadline: :py:class:`pyspreedly.deadline.Deadline` to give
+            up at.  Fails straight away when the token won't be there in
+            time, instead of sleeping until the deadline.
+        :param priority: lower is served first
+        :returns: seconds spent waiting
+        :raises: :py:exc:`pyspreedly.deadline.DeadlineExceeded`
+        """
+        if not self.rate:
+            return 0.0
+        start = time.time()
+        with self._cond:
+            waiter = (priority, next(self._arrivals))
+            heapq.heappush(self._waiters, waiter)
+            waited = False
+            try:
+                while True:
+                    now = time.time()
+                    self._refill(now)
+                    first = self._waiters[0] == waiter
+                    if first and self._tokens >= 1:
+                        self._tokens -= 1
+                        return now - start if waited else 0.0
+                    # the soonest a token could be ours
+                    delay = (1 - self._tokens) / float(self.rate)
+                    if deadline is not None and deadline.remaining() < delay:
+                        raise DeadlineExceeded("Rate limited for {0:.3f}s, "
+                                "past the deadline".format(delay))
+                    waited = True
+                    if first:
+                        self._cond.wait(delay)
+                    elif deadline is not None:
+                        self._cond.wait(deadline.remaining())
+                    else:
+                        # woken when the waiter ahead takes its token
+                        self._cond.wait()
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+
+class SiteBudget(object):
+    """
+    .. py:class:: SiteBudget([rate=None, concurrency=None])
+    The rate limit and concurrency budget for a single site.
+
+    :param rate: requests per second the site may make, `None` for no limit
+    :param concurrency: requests the site may have in flight at once, `None`
+        for no limit
+    """
+
+    def __init__(self, rate=None, concurrency=None):
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+
+
+class LaneStats(object):
+    """
+    .. py:class:: LaneStats([samples=1000])
+    Queue wait times for one priority lane.  Keeps totals plus the most
+    recent `samples` waits for percentiles.
+    """
+
+    def __init__(self, samples=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def record(self, wait):
+        with self._lock:
+            self.count += 1
+            self.total += wait
+            self.max = max(self.max, wait)
+            self._recent.append(wait)
+
+    def report(self):
+        """ .. py:method:: report()
+        :returns: dict of count, mean, max, p50, p95 and p99 wait in seconds
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+            report = {
+                    'count': self.count,
+                    'mean': self.total / self.count if self.count else 0.0,
+                    'max': self.max,
+                    }
+        for name, pct in (('p50', 50), ('p95', 95), ('p99', 99)):
+            report[name] = recent[min(len(recent) - 1,
+                len(recent) * pct // 100)] if recent else 0.0
+        return report
+
+
+class FairScheduler(object):
+    """
+    .. py:class:: FairScheduler(slots[, lanes=None])
+    Hands out a fixed number of shared connection slots.  Waiters are queued
+    per lane and per site.  Freed slots always go to the highest priority
+    lane with waiters, as long as the lane is within its share, and within a
+    lane the sites take turns round-robin, so a site with thousands of
+    queued calls only gets its turn like everyone else.
+
+    :param slots: total number of requests allowed in flight
+    :param lanes: list of `(name, share)` in priority order, where `share`
+        is the number of slots the lane may use at once.  Defaults to a
+        single lane using every slot.
+    """
+
+    def __init__(self, slots, lanes=None):
+        self.slots = slots
+        self.lanes = list(lanes or [(INTERACTIVE, slots)])
+        self._free = slots
+        self._cond = threading.Condition()
+        self._running = dict((name, 0) for name, share in self.lanes)
+        self._queues = dict((name, {}) for name, share in self.lanes)
+        self._order = dict((name, deque()) for name, share in self.lanes)
+        self._site_running = {}
+        self._limits = {}
+
+    def acquire(self, key, lane=None, limit=None, deadline=None):
+        """ .. py:method:: acquire(key[, lane=None, limit=None, deadline=None])
+        Block until a slot is granted.
+
+        :param key: the site the slot is for
+        :param lane: priority lane, default the first (highest) lane
+        :param limit: most slots `key` may hold at once, `None` for no limit
+        :param deadline: :py:class:`pyspreedly.deadline.Deadline` to stop
+            waiting at
+        :raises: :py:exc:`pyspreedly.deadline.DeadlineExceeded`
+        """
+        lane = lane or self.lanes[0][0]
+        if lane not in self._queues:
+            raise ValueError("Unknown lane {0}".format(lane))
+        with self._cond:
+            self._limits[key] = limit
+            ticket = [False]
+            queue = self._queues[lane].get(key)
+            if queue is None:
+                queue = self._queues[lane][key] = deque()
+                self._order[lane].append(key)
+            queue.append(ticket)
+            self._grant()
+            while not ticket[0]:
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    self._withdraw(lane, key, ticket)
+                    raise DeadlineExceeded("No slot free before the deadline")
+                self._cond.wait(remaining)
+
+    def _withdraw(self, lane, key, ticket):
+        queue = self._queues[lane][key]
+        for i, waiting in enumerate(queue):
+            if waiting is ticket:
+                del queue[i]
+                break
+        if not queue:
+            del self._queues[lane][key]
+            self._order[lane].remove(key)
+
+    def release(self, key, lane=None):
+        lane = lane or self.lanes[0][0]
+        with self._cond:
+            self._free += 1
+            self._running[lane] -= 1
+            self._site_running[key] -= 1
+            self._grant()
+
+    def _grant(self):
+        granted = False
+        for lane, share in self.lanes:
+            order = self._order[lane]
+            queues = self._queues[lane]
+            skipped = 0
+            while (self._free and self._running[lane] < share
+                    and skipped < len(order)):
+                key = order.popleft()
+                limit = self._limits.get(key)
+                if limit and self._site_running.get(key, 0) >= limit:
+                    order.append(key)
+                    skipped += 1
+                    continue
+                queue = queues[key]
+                queue.popleft()[0] = True
+                if queue:
+                    order.append(key)
+                else:
+                    del queues[key]
+                self._free -= 1
+                self._running[lane] += 1
+                self._site_running[key] = self._site_running.get(key, 0) + 1
+                skipped = 0
+                granted = True
+        if granted:
+            self._cond.notify_all()
+
+
+class Dispatcher(object):
+    """
+    .. py:class:: Dispatcher([slots=10, rate=None, concurrency=None, lanes=None])
+    Applies per-site budgets, priority lanes and fair scheduling to requests
+    sent by :py:class:`pyspreedly.api.Client`.
+
+    Requests go through the lane set with :py:func:`lane`, or the first lane
+    when none is set.  By default that is :py:data:`INTERACTIVE`, which may
+    use every slot, followed by :py:data:`BATCH`, which may use half of them
+    and only gets a slot when no interactive request is waiting.
+
+    :param slots: total requests in flight across all sites.  Should not be
+        larger than the connection pool.
+    :param rate: default per-site requests per second
+    :param concurrency: default per-site requests in flight
+    :param lanes: list of `(name, share)` in priority order
+    """
+
+    def __init__(self, slots=10, rate=None, concurrency=None, lanes=None):
+        if lanes is None:
+            lanes = [(INTERACTIVE, slots), (BATCH, max(1, slots // 2))]
+        self.scheduler = FairScheduler(slots, lanes)
+        self.rate = rate
+        self.concurrency = concurrency
+        self.lane_stats = dict((name, LaneStats()) for name, share in lanes)
+        self._priority = dict((name, i)
+                for i, (name, share) in enumerate(lanes))
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def set_budget(self, site_name, rate=None, concurrency=None):
+        """ .. py:method:: set_budget(site_name[, rate=None, concurrency=None])
+        Override the default budget for `site_name`.
+        """
+        with self._lock:
+            self._budgets[site_name] = SiteBudget(rate, concurrency)
+
+    def budget(self, site_name):
+        with self._lock:
+            try:
+                return self._budgets[site_name]
+            except KeyError:
+                budget = self._budgets[site_name] = SiteBudget(
+                        self.rate, self.concurrency)
+                return budget
+
+    def dispatch(self, site_name, send, lane=None, deadline=None):
+        """ .. py:method:: dispatch(site_name, send[, lane=None, deadline=None])
+        Call `send` once the site is within budget and a shared slot is free.
+
+        :param site_name: the site the request is for
+        :param send: callable with no arguments doing the actual request
+        :param lane: priority lane, defaults to :py:func:`current_lane`
+        :param deadline: :py:class:`pyspreedly.deadline.Deadline` to stop
+            waiting for the budget and a slot at
+        :returns: whatever `send` returns
+        :raises: :py:exc:`pyspreedly.deadline.DeadlineExceeded`
+        """
+        lane = lane or current_lane() or self.scheduler.lanes[0][0]
+        if lane not in self._priority:
+            raise ValueError("Unknown lane {0}".format(lane))
+        budget = self.budget(site_name)
+        start = time.time()
+        # higher lanes take the site's next token ahead of lower ones
+        budget.bucket.acquire(deadline, self._priority[lane])
+        self.scheduler.acquire(site_name, lane, budget.concurrency, deadline)
+        self.lane_stats[lane].record(time.time() - start)
+        try:
+            return send()
+        finally:
+            self.scheduler.release(site_name, lane)
+
+    def stats(self):
+        """ .. py:method:: stats()
+        :returns: dict of lane name to :py:meth:`LaneStats.report`
+        """
+        return dict((name, stats.report())
+                for name, stats in self.lane_stats.items())
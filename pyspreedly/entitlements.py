@@ -0,0 +1,228 @@
+"""
+A compact, read-only table of what each subscriber is entitled to, for
+access checks on every page view without a spreedly call or a full
+subscriber dictionary per worker process::
+
+    build_entitlements(client.iter_subscribers(), '/var/run/app/entitlements')
+
+    table = EntitlementTable('/var/run/app/entitlements')
+    if table.is_active(customer_id):
+        level = table.feature_level(customer_id)
+
+The file is memory-mapped, so every worker process on the machine shares
+one copy in the page cache.  Rebuilding writes a new file and renames it
+over the old one; tables notice the swap in :py:meth:`EntitlementTable.reload`.
+"""
+import os
+import mmap
+import time
+import struct
+import calendar
+import tempfile
+import threading
+
+
+__all__ = [
+        'build_entitlements', 'EntitlementTable', ]
+
+MAGIC = 'SPENT1'
+
+# magic, level count, record count, levels blob length, built at
+_header = struct.Struct('<6sHQQQ')
+_id = struct.Struct('<q')
+_until = struct.Struct('<q')
+_level = struct.Struct('<H')
+_CHUNK = 4096
+
+
+def _epoch(value):
+    if value is None:
+        return 0
+    return calendar.timegm(value.utctimetuple())
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def build_entitlements(subscribers, path):
+    """
+    Write the entitlements of `subscribers` to `path`.  Each subscriber
+    takes 19 bytes: the customer id and `active_until` (as epoch seconds)
+    as 64 bit integers, `feature_level` as an index into a table of the
+    distinct levels, and `active` as a byte.  The file is written next to
+    `path` and renamed over it, so readers see either the old or the new
+    table, never half of one.
+
+    :param subscribers: iterable of subscriber dictionaries, eg -
+        :py:meth:`pyspreedly.api.Client.iter_subscribers`.  Customer ids
+        have to be integers.
+    :param path: file to write
+    :returns: number of subscribers written
+    """
+    levels = {}
+    rows = []
+    for subscriber in subscribers:
+        level = subscriber.get('feature_level') or ''
+        index = levels.get(level)
+        if index is None:
+            index = levels[level] = len(levels)
+        rows.append((int(subscriber['customer_id']),
+            _epoch(subscriber.get('active_until')), index,
+            1 if subscriber.get('active') else 0))
+    rows.sort()
+    names = sorted(levels, key=levels.get)
+    blob = '\0'.join(n.encode('utf-8') if isinstance(n, unicode) else n
+            for n in names)
+    count = len(rows)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.entitlements', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_header.pack(MAGIC, len(names), count, len(blob),
+                int(time.time())))
+            f.write(blob)
+            f.write('\0' * (_align(_header.size + len(blob)) -
+                _header.size - len(blob)))
+            for column, fmt in ((0, 'q'), (1, 'q'), (2, 'H'), (3, 'B')):
+                for start in xrange(0, count, _CHUNK):
+                    chunk = [row[column] for row in rows[start:start + _CHUNK]]
+                    f.write(struct.pack('<{0}{1}'.format(len(chunk), fmt),
+                        *chunk))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0644)
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
+    return count
+
+
+class _Snapshot(object):
+    """One mapped version of the file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, level_count, count, blob_len, built_at = \
+                _header.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("{0} is not an entitlement table".format(path))
+        self.count = count
+        self.built_at = built_at
+        blob = self.map[_header.size:_header.size + blob_len]
+        self.levels = tuple(intern(n) for n in blob.split('\0')) \
+                if level_count else ()
+        self.ids_at = _align(_header.size + blob_len)
+        self.until_at = self.ids_at + 8 * count
+        self.level_at = self.until_at + 8 * count
+        self.active_at = self.level_at + 2 * count
+
+    def find(self, customer_id):
+        buf = self.map
+        unpack = _id.unpack_from
+        base = self.ids_at
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if unpack(buf, base + 8 * mid)[0] < customer_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and unpack(buf, base + 8 * lo)[0] == customer_id:
+            return lo
+        return -1
+
+
+class EntitlementTable(object):
+    """
+    .. py:class:: EntitlementTable(path[, check_interval=5])
+    Read-only lookups into a file written by :py:func:`build_entitlements`.
+    Lookups binary search the mapped file, without building a dictionary
+    or record per subscriber.
+
+    :param path: the file
+    :param check_interval: seconds between checks for a rebuilt file,
+        `None` to only reload when :py:meth:`reload` is called
+    """
+
+    def __init__(self, path, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = _Snapshot(path)
+        self._checked = time.time()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._snapshot.count
+
+    @property
+    def built_at(self):
+        """epoch seconds the table was built at"""
+        return self._snapshot.built_at
+
+    def reload(self):
+        """ .. py:method:: reload()
+        Map the file again if it has been replaced.
+
+        :returns: `True` if a new table was loaded
+        """
+        with self._lock:
+            self._checked = time.time()
+            try:
+                inode = os.stat(self.path).st_ino
+            except OSError:
+                return False
+            if inode == self._snapshot.inode:
+                return False
+            self._snapshot = _Snapshot(self.path)
+            return True
+
+    def _current(self):
+        if self.check_interval is not None and \
+                time.time() - self._checked > self.check_interval:
+            self.reload()
+        return self._snapshot
+
+    def get(self, customer_id):
+        """ .. py:method:: get(customer_id)
+        :returns: `(active, feature_level, active_until)` with
+            `active_until` in epoch seconds (0 for none), or `None` for an
+            unknown customer
+        """
+        snapshot = self._current()
+        i = snapshot.find(customer_id)
+        if i < 0:
+            return None
+        buf = snapshot.map
+        return (buf[snapshot.active_at + i] == '\1',
+                snapshot.levels[_level.unpack_from(buf,
+                    snapshot.level_at + 2 * i)[0]],
+                _until.unpack_from(buf, snapshot.until_at + 8 * i)[0])
+
+    def is_active(self, customer_id, now=None):
+        """ .. py:method:: is_active(customer_id[, now=None])
+        :returns: whether the customer is active, and (when the table has an
+            `active_until` for them) still within it at `now`
+        """
+        snapshot = self._current()
+        i = snapshot.find(customer_id)
+        if i < 0 or snapshot.map[snapshot.active_at + i] != '\1':
+            return False
+        until = _until.unpack_from(snapshot.map, snapshot.until_at + 8 * i)[0]
+        return not until or until > (now or time.time())
+
+    def feature_level(self, customer_id):
+        """ .. py:method:: feature_level(customer_id)
+        :returns: the customer's feature level, or `None` for an unknown
+            customer
+        """
+        snapshot = self._current()
+        i = snapshot.find(customer_id)
+        if i < 0:
+            return None
+        return snapshot.levels[_level.unpack_from(snapshot.map,
+            snapshot.level_at + 2 * i)[0]]
@@ -0,0 +1,87 @@
+import cPickle
+import threading
+import multiprocessing
+from objectify import objectify_spreedly, ValueInterner, ET
+
+
+__all__ = [
+        'ParseExecutor', ]
+
+PARSE_THRESHOLD = 256 * 1024
+
+# each worker shares values between the responses it parses, and pickling
+# writes a shared value once per response
+_worker_interner = ValueInterner()
+
+
+def _parse_pickled(xml, intern_values=False):
+    # cElementTree's ParseError can't be pickled, send the message instead
+    try:
+        result = (None, objectify_spreedly(xml,
+            interner=_worker_interner if intern_values else None))
+    except ET.ParseError as e:
+        result = (str(e), None)
+    return cPickle.dumps(result, cPickle.HIGHEST_PROTOCOL)
+
+
+class ParseExecutor(object):
+    """
+    .. py:class:: ParseExecutor([processes=None, threshold=PARSE_THRESHOLD])
+    Parses large responses in a pool of worker processes, so a thread
+    parsing a multi-megabyte subscriber list doesn't hold the GIL and
+    stall every other thread.  Responses smaller than `threshold` bytes
+    are parsed inline, where the round trip to a worker would cost more
+    than it saves.  Workers send results back already pickled with the
+    binary protocol, so the only work left in the calling process is one
+    :py:func:`cPickle.loads`, several times cheaper than the parse.
+
+    Pass it to :py:class:`pyspreedly.api.Client` as `parse_executor`.  The
+    pool is started on first use.
+
+    :param processes: worker processes, default one per cpu
+    :param threshold: smallest response, in bytes, sent to a worker
+    """
+
+    def __init__(self, processes=None, threshold=PARSE_THRESHOLD):
+        self.processes = processes
+        self.threshold = threshold
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.processes)
+            return self._pool
+
+    def parse(self, xml, interner=None):
+        """ .. py:method:: parse(xml[, interner=None])
+        :py:func:`pyspreedly.objectify.objectify_spreedly` `xml`, in a
+        worker process if it is large.
+
+        :param xml: response body, as text or utf-8 bytes
+        :param interner: :py:class:`pyspreedly.objectify.ValueInterner` for
+            responses parsed inline.  Workers can't use it, but share
+            values through one of their own when it is set.
+        :returns: data as dictionary
+        """
+        if len(xml) < self.threshold:
+            return objectify_spreedly(xml, interner=interner)
+        if isinstance(xml, unicode):
+            xml = xml.encode('utf-8')
+        error, data = cPickle.loads(self.pool.apply(_parse_pickled,
+            (xml, interner is not None)))
+        if error is not None:
+            raise ET.ParseError(error)
+        return data
+
+    def close(self):
+        """ .. py:method:: close()
+        Stop the worker processes.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
@@ -0,0 +1,241 @@
+"""
+Streams parsed spreedly records (as returned by
+:py:func:`pyspreedly.objectify.iterparse_spreedly`) into files.  Writers
+only ever hold one chunk of records, so exporting the whole subscriber base
+takes the same memory as exporting ten subscribers::
+
+    with JSONLWriter('export/subscribers-{chunk:04d}.jsonl') as writer:
+        export(client.iter_subscribers(), writer)
+"""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+import pytz
+
+
+__all__ = [
+        'export', 'flatten', 'export_value', 'JSONLWriter', 'CSVWriter',
+        'ColumnarWriter', ]
+
+
+def export_value(value):
+    """
+    Turn a parsed value into something json and csv can write.
+    :py:class:`Decimal` becomes a string so no precision is lost, datetimes
+    become ISO 8601 strings in UTC (the format spreedly sends them in).
+    Lists are exported element by element.
+
+    :param value: value from a parsed record
+    """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(pytz.utc).replace(tzinfo=None)
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    if isinstance(value, dict):
+        return dict((k, export_value(v)) for k, v in value.iteritems())
+    if isinstance(value, list):
+        return [export_value(v) for v in value]
+    return value
+
+
+def flatten(record, prefix='', sep='_'):
+    """
+    Flatten nested elements into the top level, so
+    `{'detail': {'payment_method': 'visa'}}` becomes
+    `{'detail_payment_method': 'visa'}`.  Arrays (like `invoices`) are kept
+    as a single json encoded value.  Values are passed through
+    :py:func:`export_value`.
+
+    :param record: parsed record
+    :returns: new flat dictionary
+    """
+    flat = {}
+    for key, value in record.iteritems():
+        key = prefix + key
+        if isinstance(value, dict):
+            flat.update(flatten(value, key + sep, sep))
+        elif isinstance(value, list):
+            flat[key] = json.dumps(export_value(value))
+        else:
+            flat[key] = export_value(value)
+    return flat
+
+
+def export(records, writer):
+    """
+    Write every record in `records` with `writer`.
+
+    :param records: iterable of parsed records
+    :param writer: one of the writers in this module
+    :returns: number of records written
+    """
+    count = 0
+    write = writer.write
+    for record in records:
+        write(record)
+        count += 1
+    return count
+
+
+class ChunkedWriter(object):
+    """
+    Base for the writers, starting a new file every `chunk_size` records.
+
+    :param path: file name template, formatted with `chunk`, the number of
+        the chunk starting at 0.  A path without `{chunk}` is never split.
+    :param chunk_size: records per file
+    """
+
+    def __init__(self, path, chunk_size=100000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunk = -1
+        self.paths = []
+        self._count = 0
+        self._file = None
+
+    def write(self, record):
+        if self._file is None or (self._count >= self.chunk_size
+                and '{chunk' in self.path):
+            self._next_chunk()
+        self._write(record)
+        self._count += 1
+
+    def _next_chunk(self):
+        self._close_chunk()
+        self.chunk += 1
+        self._count = 0
+        path = self.path.format(chunk=self.chunk)
+        self.paths.append(path)
+        self._file = open(path, 'wb')
+        self._open_chunk()
+
+    def _open_chunk(self):
+        pass
+
+    def _close_chunk(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        raise NotImplementedError()
+
+    def close(self):
+        self._close_chunk()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JSONLWriter(ChunkedWriter):
+    """
+    .. py:class:: JSONLWriter(path[, chunk_size=100000, flat=False])
+    Writes one json object per line.
+
+    :param flat: write :py:func:`flatten` ed records instead of nested ones
+    """
+
+    def __init__(self, path, chunk_size=100000, flat=False):
+        super(JSONLWriter, self).__init__(path, chunk_size)
+        self.flat = flat
+        self._encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def _write(self, record):
+        record = flatten(record) if self.flat else export_value(record)
+        self._file.write(self._encode(record))
+        self._file.write('\n')
+
+
+class CSVWriter(ChunkedWriter):
+    """
+    .. py:class:: CSVWriter(path[, chunk_size=100000, fields=None, extrasaction='raise'])
+    Writes :py:func:`flatten` ed records as csv with a header row in every
+    chunk.
+
+    :param fields: column names.  Default `None` takes the columns of the
+        first record, so pass them when later records may have more (eg -
+        transactions with different `detail`).
+    :param extrasaction: for a record with columns not in `fields`,
+        `'raise'` a :py:exc:`ValueError` or `'ignore'` the extra columns,
+        as for :py:class:`csv.DictWriter`
+    """
+
+    def __init__(self, path, chunk_size=100000, fields=None,
+            extrasaction='raise'):
+        if extrasaction not in ('raise', 'ignore'):
+            raise ValueError("extrasaction must be 'raise' or 'ignore', not "
+                    "{0!r}".format(extrasaction))
+        super(CSVWriter, self).__init__(path, chunk_size)
+        self.fields = fields
+        self.extrasaction = extrasaction
+        self._writer = None
+
+    def _open_chunk(self):
+        self._writer = None
+
+    def _write(self, record):
+        record = flatten(record)
+        if self.fields is None:
+            self.fields = sorted(record)
+        if self.extrasaction == 'raise':
+            extra = set(record).difference(self.fields)
+            if extra:
+                raise ValueError("Record has columns not in the header: {0}"
+                        "; pass all the fields to CSVWriter".format(
+                            ', '.join(sorted(extra))))
+        if self._writer is None:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.fields)
+        self._writer.writerow([_csv_value(record.get(f))
+            for f in self.fields])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+class ColumnarWriter(ChunkedWriter):
+    """
+    .. py:class:: ColumnarWriter(path[, chunk_size=100000])
+    Writes every chunk as a single json object mapping each column of the
+    :py:func:`flatten` ed records to the list of its values, which loads
+    straight into a dataframe and compresses far better than rows.  Only
+    one chunk is buffered in memory.
+    """
+
+    def __init__(self, path, chunk_size=100000):
+        super(ColumnarWriter, self).__init__(path, chunk_size)
+        self._columns = {}
+
+    def _open_chunk(self):
+        self._columns = {}
+
+    def _write(self, record):
+        columns = self._columns
+        count = self._count
+        for key, value in flatten(record).iteritems():
+            try:
+                columns[key].append(value)
+            except KeyError:
+                columns[key] = [None] * count + [value]
+        for column in columns.itervalues():
+            if len(column) == count:
+                column.append(None)
+
+    def _close_chunk(self):
+        if self._file is not None:
+            json.dump({'count': self._count, 'columns': self._columns},
+                    self._file, separators=(',', ':'))
+            self._columns = {}
+        super(ColumnarWriter, self)._close_chunk()
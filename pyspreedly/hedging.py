@@ -0,0 +1,220 @@
+"""
+Hedged reads: when a GET hasn't been answered within the usual time, send
+it again and take whichever answer comes first.  A slow spreedly response
+then costs about the hedge delay instead of its full latency::
+
+    client = Client(token, site, session=session, hedge=HedgePolicy())
+    client.get_info(id)
+    print client.hedge.stats()
+
+Only :py:meth:`pyspreedly.api.Client.get_info` and
+:py:meth:`pyspreedly.api.Client.get_plans` are hedged, being safe to send
+twice.  Use a session with room in its pool for the extra requests.
+"""
+import time
+import threading
+from collections import deque
+from dispatch import lane, current_lane
+
+
+__all__ = [
+        'HedgePolicy', ]
+
+
+class _Race(object):
+    """The state shared by the attempts of one hedged call"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.winner = None
+        self.errors = []
+        # attempts that may still answer, counting the hedge until it is
+        # sent or called off
+        self.pending = 2
+        self.hedging = False
+        self.called_off = False
+
+    def call_off(self):
+        if not self.hedging and not self.called_off:
+            self.called_off = True
+            self.pending -= 1
+
+
+class HedgePolicy(object):
+    """
+    .. py:class:: HedgePolicy([percentile=95, delay=None, min_delay=0.001, budget=0.05, burst=10, samples=1000, warmup=50])
+    When and how often to hedge.
+
+    The hedge is sent once the first request has been waiting longer than
+    `percentile` of recent responses took, so about `100 - percentile`
+    percent of calls would be hedged.  `budget` caps that: each call earns
+    `budget` of a hedge, up to `burst` saved up, and a hedge spends one.
+    With the defaults at most 5% extra requests are sent, even when the
+    api slows down for everyone and every call is past the delay.
+
+    The losing response is closed when it arrives, so a streamed body
+    isn't downloaded.  A request in flight can't be stopped, though, so
+    the loser still costs spreedly its work.
+
+    :param percentile: percentile of recent latencies to wait before
+        hedging
+    :param delay: fixed seconds to wait instead, `None` to use `percentile`
+    :param min_delay: shortest wait, so fast sites aren't hedged on noise
+    :param budget: hedges allowed per call, on average
+    :param burst: most hedges that can be saved up
+    :param samples: number of recent latencies to keep
+    :param warmup: latencies to collect before hedging on `percentile`
+    """
+
+    def __init__(self, percentile=95, delay=None, min_delay=0.001,
+            budget=0.05, burst=10, samples=1000, warmup=50):
+        self.percentile = percentile
+        self.fixed_delay = delay
+        self.min_delay = min_delay
+        self.budget = budget
+        self.burst = burst
+        self.warmup = warmup
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.hedges_denied = 0
+        self._tokens = float(burst) if budget else 0.0
+        self._recent = deque(maxlen=samples)
+        self._recorded = 0
+        self._delay = None
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        """ .. py:method:: record(latency)
+        Add the latency of a first request to the ones the delay is
+        worked out from.
+        """
+        with self._lock:
+            self._recent.append(latency)
+            self._recorded += 1
+            # sorting on every call would cost more than the request
+            if self._recorded % 20 == 0 or self._delay is None:
+                self._delay = self._percentile()
+
+    def _percentile(self):
+        if len(self._recent) < self.warmup:
+            return None
+        recent = sorted(self._recent)
+        return max(self.min_delay, recent[min(len(recent) - 1,
+            len(recent) * self.percentile // 100)])
+
+    def delay(self):
+        """ .. py:method:: delay()
+        :returns: seconds to wait before hedging, `None` while there are
+            too few latencies to tell
+        """
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        return self._delay
+
+    def _start(self):
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def _allow(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.hedges_sent += 1
+                return True
+            self.hedges_denied += 1
+            return False
+
+    def stats(self):
+        """ .. py:method:: stats()
+        :returns: dict of calls, hedges sent, won (the hedge answered
+            first) and denied by the budget, and the current delay
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'hedges_sent': self.hedges_sent,
+                'hedges_won': self.hedges_won,
+                'hedges_denied': self.hedges_denied,
+                'delay': self.delay(),
+                }
+
+    def _attempt(self, race, send, close, lane_name, primary):
+        started = time.time()
+        try:
+            if lane_name is None:
+                result = send()
+            else:
+                with lane(lane_name):
+                    result = send()
+        except Exception as e:
+            with race.cond:
+                race.errors.append(e)
+                race.pending -= 1
+                race.call_off()
+                race.cond.notify_all()
+            return
+        if primary:
+            self.record(time.time() - started)
+        with race.cond:
+            race.pending -= 1
+            race.call_off()
+            if race.winner is None:
+                race.winner = (primary, result)
+                race.cond.notify_all()
+                return
+        if close is not None:
+            close(result)
+
+    def _hedge(self, race, delay, send, close, lane_name):
+        with race.cond:
+            # woken early once the first request answers, so with a long
+            # delay finished calls don't leave threads sleeping
+            if not race.called_off:
+                race.cond.wait(delay)
+            if race.called_off:
+                return
+            if not self._allow():
+                race.call_off()
+                race.cond.notify_all()
+                return
+            race.hedging = True
+        self._attempt(race, send, close, lane_name, False)
+
+    def run(self, send, close=None):
+        """ .. py:method:: run(send[, close=None])
+        Call `send`, and call it again in parallel if it is slow.
+
+        :param send: callable with no arguments doing the request
+        :param close: called with the losing result, eg - to close a
+            response
+        :returns: the first result
+        :raises: the error of the first attempt, if no attempt succeeded
+        """
+        self._start()
+        delay = self.delay()
+        if delay is None:
+            started = time.time()
+            result = send()
+            self.record(time.time() - started)
+            return result
+        race = _Race()
+        lane_name = current_lane()
+        for target, args in ((self._attempt, (race, send, close, lane_name,
+                True)), (self._hedge, (race, delay, send, close, lane_name))):
+            thread = threading.Thread(target=target, args=args)
+            thread.daemon = True
+            thread.start()
+        # no timeout: a timed wait polls, and would add up to 50ms
+        with race.cond:
+            while race.winner is None and race.pending:
+                race.cond.wait()
+            winner = race.winner
+        if winner is None:
+            raise race.errors[0]
+        primary, result = winner
+        if not primary:
+            with self._lock:
+                self.hedges_won += 1
+        return result
@@ -0,0 +1,191 @@
+import time
+import logging
+import threading
+from Queue import Queue
+from collections import namedtuple
+from checkpoint import Checkpoint
+from deadline import deadline, current_deadline
+from dispatch import lane, current_lane
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+        'InvoiceResult', 'InvoicePipeline', ]
+
+PAID = 'paid'
+INVOICED = 'invoiced'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+_done = object()
+
+
+class InvoiceResult(namedtuple('InvoiceResult', 'order state invoice error')):
+    """
+    Outcome of one order of an :py:class:`InvoicePipeline` run.
+
+    `order` is the order as passed in, `state` one of `'paid'`, `'failed'`
+    or `'skipped'` (already paid in an earlier run), `invoice` the paid
+    invoice dictionary and `error` the exception for failed orders.
+    """
+    __slots__ = ()
+
+
+class InvoicePipeline(object):
+    """
+    .. py:class:: InvoicePipeline(client[, checkpoint=None, concurrency=8, pay_concurrency=None])
+    Invoices and pays many subscribers at once.  Orders go through two
+    stages, :py:meth:`pyspreedly.api.Client.create_invoice` and
+    :py:meth:`pyspreedly.api.Client.pay_invoice`, each with its own worker
+    threads, so paying one subscriber's invoice overlaps with creating the
+    next subscribers' invoices.
+
+    Every step is written to the checkpoint.  Running the same orders
+    again after a crash or partial failure skips the orders already paid,
+    pays the invoices already created and retries the rest::
+
+        pipeline = InvoicePipeline(client, 'renewals-2012-12.log')
+        for result in pipeline.run(orders):
+            if result.error:
+                log.error('%s failed: %s', result.order, result.error)
+
+    :param client: :py:class:`pyspreedly.api.Client`
+    :param checkpoint: path of the checkpoint file, or a
+        :py:class:`pyspreedly.checkpoint.Checkpoint`.  `None` keeps no record.
+    :param concurrency: invoices being created at once
+    :param pay_concurrency: invoices being paid at once, defaults to
+        `concurrency`
+    """
+
+    def __init__(self, client, checkpoint=None, concurrency=8,
+            pay_concurrency=None):
+        self.client = client
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.pay_concurrency = pay_concurrency or concurrency
+        self.stats = {}
+
+    def key(self, order):
+        """ .. py:method:: key(order)
+        The checkpoint key of an order.  Override for orders that aren't
+        one per subscriber.
+        """
+        return order['subscriber_id']
+
+    def run(self, orders):
+        """ .. py:method:: run(orders)
+        Invoice and pay every order, in the dispatch lane and under the
+        deadline of the calling thread.
+
+        :param orders: iterable of dicts with `subscriber_id` and `plan_id`,
+            and optionally `screen_name`, `email` and `credit_card` (see
+            :py:meth:`pyspreedly.api.Client.pay_invoice`)
+        :returns: iterator of :py:class:`InvoiceResult` in the order they
+            complete
+        """
+        # captured here, not when the caller starts iterating
+        return self._run(orders, (current_lane(), current_deadline()))
+
+    def _run(self, orders, context):
+        create_queue = Queue(self.concurrency * 2)
+        pay_queue = Queue(self.pay_concurrency * 2)
+        results = Queue(self.concurrency + self.pay_concurrency)
+        errors = []
+        creators = [self._thread(context, self._create, create_queue,
+            pay_queue, results) for i in range(self.concurrency)]
+        payers = [self._thread(context, self._pay, pay_queue, results)
+                for i in range(self.pay_concurrency)]
+
+        def feed():
+            try:
+                for order in orders:
+                    entry = self.checkpoint.get(self.key(order))
+                    state = entry and entry['state']
+                    if state == PAID:
+                        results.put(InvoiceResult(order, SKIPPED, None, None))
+                    elif state == INVOICED:
+                        pay_queue.put((order, entry['token']))
+                    else:
+                        create_queue.put(order)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                for creator in creators:
+                    create_queue.put(_done)
+                for creator in creators:
+                    creator.join()
+                for payer in payers:
+                    pay_queue.put(_done)
+                for payer in payers:
+                    payer.join()
+                results.put(_done)
+
+        self._thread(context, feed)
+        stats = self.stats = {PAID: 0, FAILED: 0, SKIPPED: 0}
+        start = time.time()
+        while True:
+            result = results.get()
+            if result is _done:
+                break
+            stats[result.state] += 1
+            yield result
+        stats['seconds'] = time.time() - start
+        stats['per_second'] = (stats[PAID] + stats[FAILED]) / \
+                stats['seconds'] if stats['seconds'] else 0.0
+        if errors:
+            raise errors[0]
+
+    def _thread(self, context, target, *args):
+        lane_name, call_deadline = context
+
+        def work():
+            with lane(lane_name), deadline(call_deadline):
+                target(*args)
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _create(self, create_queue, pay_queue, results):
+        while True:
+            order = create_queue.get()
+            if order is _done:
+                return
+            key = self.key(order)
+            try:
+                invoice = self.client.create_invoice(order['subscriber_id'],
+                        order['plan_id'], order.get('screen_name'),
+                        order.get('email'))
+            except Exception as e:
+                logger.warning("Creating invoice for %s failed: %s", key, e)
+                self.checkpoint.record(key, FAILED, stage='create',
+                        error=unicode(e))
+                results.put(InvoiceResult(order, FAILED, None, e))
+                continue
+            self.checkpoint.record(key, INVOICED, token=invoice['token'])
+            pay_queue.put((order, invoice['token']))
+
+    def _pay(self, pay_queue, results):
+        while True:
+            item = pay_queue.get()
+            if item is _done:
+                return
+            order, token = item
+            key = self.key(order)
+            try:
+                invoice = self.client.pay_invoice(token,
+                        order.get('credit_card'))
+            except Exception as e:
+                logger.warning("Paying invoice %s for %s failed: %s",
+                        token, key, e)
+                # keep the token so the retry pays this invoice instead of
+                # creating another one
+                self.checkpoint.record(key, INVOICED, token=token,
+                        error=unicode(e))
+                results.put(InvoiceResult(order, FAILED, None, e))
+                continue
+            self.checkpoint.record(key, PAID, token=token)
+            results.put(InvoiceResult(order, PAID, invoice, None))
@@ -0,0 +1,301 @@
+"""
+Load generator for sizing: how many calls per second one process can push
+through :py:class:`pyspreedly.api.Client`.  Installed as the
+`pyspreedly-loadgen` command::
+
+    pyspreedly-loadgen --mix get_info=70,subscribe=20,add_fee=10 \\
+            --concurrency 16 --rate 500 --duration 30
+
+By default it starts a :py:class:`pyspreedly.stub.StubServer` in a child
+process, so the stub's work doesn't count against the client's cpu; point
+it at another server with `--url`.  Prints one JSON report: throughput and
+latency percentiles overall and per operation, errors by status code or
+exception, and where the time went -
+process cpu (not on windows), time in the xml parser and the rest of each
+request (sending, waiting for and reading the response).  The parser time
+is wall clock time like the request time, so with many calls in flight it
+includes waits for other threads; `parse_share_of_request_time` is the
+share of the request time it makes up, not a share of the cpu.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import multiprocessing
+try:
+    import resource
+except ImportError:
+    resource = None  # windows
+import requests
+from requests.adapters import HTTPAdapter
+from api import Client
+from bulk import bulk_map
+from dispatch import TokenBucket
+from replay import latency_report
+from stub import StubServer
+
+
+__all__ = [
+        'LoadGenerator', 'parse_mix', 'main', ]
+
+OPERATIONS = ('get_info', 'subscribe', 'add_fee')
+DEFAULT_MIX = 'get_info=70,subscribe=20,add_fee=10'
+
+
+def parse_mix(text):
+    """
+    :param text: comma separated `operation=weight`, eg -
+        `get_info=70,subscribe=20,add_fee=10`
+    :returns: dict of operation to weight
+    :raises: :py:exc:`ValueError` for unknown operations or bad weights
+    """
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in OPERATIONS:
+            raise ValueError("Unknown operation {0!r}, not one of {1}".format(
+                name, ', '.join(OPERATIONS)))
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError("Negative weight for {0}".format(name))
+    if not sum(mix.values()):
+        raise ValueError("Empty mix")
+    return mix
+
+
+class _TimedClient(Client):
+    """Client adding up the (wall clock) time spent parsing responses"""
+
+    def __init__(self, *args, **kw):
+        super(_TimedClient, self).__init__(*args, **kw)
+        self.parse_times = []
+
+    def _objectify(self, response):
+        response.content  # read the body before starting the clock
+        started = time.time()
+        try:
+            return super(_TimedClient, self)._objectify(response)
+        finally:
+            self.parse_times.append(time.time() - started)
+
+
+class LoadGenerator(object):
+    """
+    .. py:class:: LoadGenerator(client, subscribers[, mix=None, concurrency=8, rate=None, plan_id=None])
+    Calls `client` with a random mix of operations.  `get_info` reads any
+    of the subscribers, `subscribe` moves even customer ids onto the free
+    trial plan and `add_fee` charges odd ones, which
+    :py:meth:`pyspreedly.stub.StubServer.add_subscribers` leaves on a paid
+    plan.
+
+    :param client: :py:class:`pyspreedly.api.Client` to drive
+    :param subscribers: customer ids `1..subscribers` exist on the server
+    :param mix: dict of operation to weight, see :py:func:`parse_mix`
+    :param concurrency: calls in flight at once
+    :param rate: target calls per second, `None` for as fast as possible
+    :param plan_id: free trial plan to `subscribe` to, by default the first
+        enabled one of the site
+    """
+
+    def __init__(self, client, subscribers, mix=None, concurrency=8,
+            rate=None, plan_id=None):
+        self.client = client
+        self.subscribers = subscribers
+        self.mix = mix or parse_mix(DEFAULT_MIX)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.plan_id = plan_id
+        self._bucket = TokenBucket(rate, burst=max(1, concurrency))
+
+    def _operations(self, count, seconds):
+        names = sorted(self.mix)
+        total = sum(self.mix.values())
+        weights = [self.mix[name] / total for name in names]
+        stop = time.time() + seconds if seconds else None
+        issued = 0
+        while (count is None or issued < count) and \
+                (stop is None or time.time() < stop):
+            pick = random.random()
+            for name, weight in zip(names, weights):
+                pick -= weight
+                if pick < 0:
+                    break
+            yield name
+            issued += 1
+
+    def _customer(self, parity=None):
+        customer_id = random.randint(1, self.subscribers)
+        if parity is not None and customer_id % 2 != parity:
+            customer_id += 1 if customer_id < self.subscribers else -1
+        return customer_id
+
+    def _call(self, name):
+        self._bucket.acquire()
+        client = self.client
+        started = time.time()
+        if name == 'get_info':
+            client.get_info(self._customer())
+        elif name == 'subscribe':
+            client.subscribe(self._customer(0), self.plan_id)
+        else:
+            response = client.add_fee(self._customer(1), 'Load test',
+                    'pyspreedly-loadgen', 'loadgen', '1.00')
+            if response.status_code != 201:
+                e = requests.HTTPError('status code: {0}'.format(
+                    response.status_code))
+                e.code = response.status_code
+                raise e
+        return time.time() - started
+
+    def run(self, count=None, seconds=10):
+        """ .. py:method:: run([count=None, seconds=10])
+        Make calls until `count` have been made or `seconds` have passed,
+        whichever is first.
+
+        :returns: report dictionary, see the module documentation
+        :raises: :py:exc:`ValueError` if the mix has `subscribe` and the
+            site has no enabled free trial plan
+        """
+        if self.plan_id is None and self.mix.get('subscribe'):
+            trials = [p for p in self.client.get_plan_catalog().for_plan_type(
+                'free_trial') if p.get('enabled')]
+            if not trials:
+                raise ValueError("No enabled free trial plan to subscribe to")
+            self.plan_id = trials[0]['id']
+        latencies = {}
+        errors = {}
+        kinds = {}
+        parse_times = getattr(self.client, 'parse_times', None)
+        parsed_before = len(parse_times) if parse_times is not None else 0
+        usage = resource and resource.getrusage(resource.RUSAGE_SELF)
+        started = time.time()
+        for name, latency, error in bulk_map(self._call,
+                self._operations(count, seconds), self.concurrency):
+            if error is not None:
+                errors[name] = errors.get(name, 0) + 1
+                kind = getattr(error, 'code', None) or type(error).__name__
+                kinds[str(kind)] = kinds.get(str(kind), 0) + 1
+            else:
+                latencies.setdefault(name, []).append(latency)
+        elapsed = time.time() - started
+        after = resource and resource.getrusage(resource.RUSAGE_SELF)
+
+        every = [l for name in latencies for l in latencies[name]]
+        report = latency_report(every, elapsed, sum(errors.values()))
+        report['concurrency'] = self.concurrency
+        report['rate'] = self.rate
+        report['mix'] = self.mix
+        report['error_kinds'] = kinds
+        report['operations'] = dict((name, latency_report(
+            latencies.get(name, []), elapsed, errors.get(name, 0)))
+            for name in self.mix)
+
+        request_seconds = sum(every)
+        parse_seconds = sum(parse_times[parsed_before:]) \
+                if parse_times is not None else None
+        time_report = {'request_seconds': round(request_seconds, 3)}
+        if usage is not None:
+            user = after.ru_utime - usage.ru_utime
+            system = after.ru_stime - usage.ru_stime
+            time_report['cpu_user_seconds'] = round(user, 3)
+            time_report['cpu_system_seconds'] = round(system, 3)
+            time_report['cpu_ms_per_request'] = round(
+                    (user + system) / len(every) * 1000, 3) if every else None
+        if parse_seconds is not None:
+            time_report['parse_seconds'] = round(parse_seconds, 3)
+            time_report['network_seconds'] = round(
+                    max(0.0, request_seconds - parse_seconds), 3)
+            # both are wall clock and parsing is part of the request
+            time_report['parse_share_of_request_time'] = round(
+                    parse_seconds / request_seconds, 3) \
+                            if request_seconds else None
+        report['time'] = time_report
+        return report
+
+
+def _serve_stub(connection, subscribers, latency_ms):
+    latency = None
+    if latency_ms:
+        rate = 1000.0 / latency_ms
+        latency = lambda: random.expovariate(rate)
+    server = StubServer(latency=latency).start()
+    server.add_subscribers(subscribers)
+    connection.send(server.url)
+    connection.recv()
+    server.stop()
+
+
+def _arguments(argv):
+    parser = argparse.ArgumentParser(prog='pyspreedly-loadgen',
+            description='Drive a mix of pyspreedly Client calls at a '
+            'spreedly stand-in and print a JSON report.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, type=parse_mix,
+            help='operation=weight pairs, from get_info, subscribe and '
+            'add_fee (default %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8,
+            help='calls in flight (default %(default)s)')
+    parser.add_argument('--rate', type=float, default=None,
+            help='target calls per second (default unlimited)')
+    parser.add_argument('--duration', type=float, default=10,
+            help='seconds to run for (default %(default)s)')
+    parser.add_argument('--requests', type=int, default=None,
+            help='stop after this many calls')
+    parser.add_argument('--subscribers', type=int, default=1000,
+            help='subscribers on the server (default %(default)s)')
+    parser.add_argument('--stub-latency', type=float, default=0,
+            help='mean extra latency of the stub in ms, exponentially '
+            'distributed (default %(default)s)')
+    parser.add_argument('--url', default=None,
+            help='base host of a running server with customer ids '
+            '1..subscribers, instead of starting the stub')
+    parser.add_argument('--plan-id', type=int, default=None,
+            help='free trial plan for subscribe (default the first enabled '
+            'one)')
+    parser.add_argument('--no-compress', dest='compress',
+            action='store_false', help="don't ask for gzipped responses")
+    parser.add_argument('--output', default=None,
+            help='append the report to this file instead of printing it')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entry point of the `pyspreedly-loadgen` command"""
+    args = _arguments(sys.argv[1:] if argv is None else argv)
+    stub = connection = None
+    url = args.url
+    if url is None:
+        connection, child = multiprocessing.Pipe()
+        stub = multiprocessing.Process(target=_serve_stub,
+                args=(child, args.subscribers, args.stub_latency))
+        stub.daemon = True
+        stub.start()
+        url = connection.recv()
+
+    session = requests.Session()
+    session.mount(url, HTTPAdapter(pool_connections=1,
+        pool_maxsize=args.concurrency))
+    client = _TimedClient('token', 'loadgen', session=session, base_host=url,
+            compress=args.compress)
+    try:
+        report = LoadGenerator(client, args.subscribers, args.mix,
+                args.concurrency, args.rate, args.plan_id).run(args.requests,
+                        args.duration)
+    finally:
+        session.close()
+        if stub is not None:
+            connection.send('stop')
+            stub.join()
+    report['started_at'] = int(time.time() - report['seconds'])
+    report['url'] = url if args.url else 'stub'
+    line = json.dumps(report, sort_keys=True)
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(line + '\n')
+    else:
+        print line
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from api import Client, BASE_HOST
+from dispatch import Dispatcher
+
+
+__all__ = [
+        'ClientManager', ]
+
+
+class ClientManager(object):
+    """
+    .. py:class:: ClientManager([token=None, max_connections=20, rate=None, concurrency=None, lanes=None])
+    Hands out :py:class:`pyspreedly.api.Client` objects for many sites.
+    All clients share one connection pool to spreedly.com and a
+    :py:class:`pyspreedly.dispatch.Dispatcher`, which gives every site its
+    own rate limit and concurrency budget and shares the pool between sites
+    round-robin.
+
+    :param token: default API token, for when one token has access to all
+        the sites.
+    :param max_connections: size of the shared connection pool, and the
+        number of requests in flight across all sites.
+    :param rate: default per-site requests per second, `None` for no limit.
+    :param concurrency: default per-site requests in flight, `None` for no
+        limit.
+    :param lanes: priority lanes, see :py:class:`pyspreedly.dispatch.Dispatcher`
+    """
+
+    def __init__(self, token=None, max_connections=20, rate=None,
+            concurrency=None, lanes=None):
+        self.token = token
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount(BASE_HOST, adapter)
+        self.dispatcher = Dispatcher(max_connections, rate=rate,
+                concurrency=concurrency, lanes=lanes)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def add_site(self, site_name, token=None, rate=None, concurrency=None):
+        """ .. py:method:: add_site(site_name[, token=None, rate=None, concurrency=None])
+        Register a site with its own token and budget.
+
+        :param token: the site's API token, defaults to the manager's
+        :param rate: the site's requests per second, defaults to the
+            manager's `rate`
+        :param concurrency: the site's requests in flight, defaults to the
+            manager's `concurrency`
+        :returns: the :py:class:`pyspreedly.api.Client` for the site
+        """
+        if rate is not None or concurrency is not None:
+            dispatcher = self.dispatcher
+            dispatcher.set_budget(site_name,
+                    dispatcher.rate if rate is None else rate,
+                    dispatcher.concurrency if concurrency is None
+                    else concurrency)
+        with self._lock:
+            client = self._clients[site_name] = self._make_client(
+                    site_name, token)
+        return client
+
+    def client(self, site_name, token=None):
+        """ .. py:method:: client(site_name[, token=None])
+        Get the client for `site_name`, creating it with the default budget
+        if the site was never added.
+        """
+        with self._lock:
+            try:
+                return self._clients[site_name]
+            except KeyError:
+                client = self._clients[site_name] = self._make_client(
+                        site_name, token)
+                return client
+
+    __getitem__ = client
+
+    def _make_client(self, site_name, token):
+        token = token or self.token
+        if token is None:
+            raise ValueError("No token for site {0}".format(site_name))
+        return Client(token, site_name, session=self.session,
+                dispatcher=self.dispatcher)
+
+    def sites(self):
+        """ .. py:method:: sites()
+        :returns: names of the sites with clients
+        """
+        with self._lock:
+            return self._clients.keys()
+
+    def stats(self):
+        """ .. py:method:: stats()
+        :returns: queue wait times per priority lane
+        """
+        return self.dispatcher.stats()
+
+    def close(self):
+        """ .. py:method:: close()
+        Close the pooled connections.
+        """
+        self.session.close()
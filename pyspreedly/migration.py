@@ -0,0 +1,200 @@
+import time
+import logging
+from collections import namedtuple
+from bulk import bulk_map
+from checkpoint import Checkpoint
+from dispatch import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+        'MigrationResult', 'PlanMigration', ]
+
+CHANGED = 'changed'
+VERIFIED = 'verified'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+def _plan_id(subscriber):
+    # plan names aren't unique, the id of the plan is in the plan version
+    version = subscriber.get('subscription_plan_version') or {}
+    return version.get('subscription_plan_id')
+
+
+class MigrationResult(namedtuple('MigrationResult',
+        'subscriber_id state stage error')):
+    """
+    Outcome of one subscriber of a :py:class:`PlanMigration` run.
+
+    `state` is one of `'verified'`, `'changed'` (when not verifying),
+    `'failed'` or `'skipped'` (on the plan already, or verified in an
+    earlier run).  For failed subscribers `stage` is `'change'` or
+    `'verify'` and `error` the exception.
+    """
+    __slots__ = ()
+
+
+class PlanMigration(object):
+    """
+    .. py:class:: PlanMigration(client, plan_id[, checkpoint=None, concurrency=8, rate=None, verify=True])
+    Moves many subscribers to the plan `plan_id` with
+    :py:meth:`pyspreedly.api.Client.change_plan`, `concurrency` at a time
+    and at most `rate` requests a second, then reads every changed
+    subscriber back with :py:meth:`pyspreedly.api.Client.get_info`, as
+    many at a time, to check they are on the plan.
+
+    Every step is written to the checkpoint.  Running the migration again
+    after it was killed skips the subscribers already verified, only
+    verifies the ones already changed and changes the rest::
+
+        migration = PlanMigration(client, 7, 'reprice-2013-01.log',
+                concurrency=16, rate=50)
+        for result in migration.run(ids):
+            if result.error:
+                log.error('%s failed: %s', result.subscriber_id, result.error)
+        print migration.stats
+
+    Share a connection pool (`session`) between the client's calls, or the
+    concurrency is spent opening connections.
+
+    :param client: :py:class:`pyspreedly.api.Client`
+    :param plan_id: id of the plan to move subscribers to
+    :param checkpoint: path of the checkpoint file, or a
+        :py:class:`pyspreedly.checkpoint.Checkpoint`.  `None` keeps no record.
+    :param concurrency: requests in flight at once
+    :param rate: most requests per second, changes and verification reads
+        together.  `None` for no limit.
+    :param verify: read the subscribers back after changing them
+    """
+
+    def __init__(self, client, plan_id, checkpoint=None, concurrency=8,
+            rate=None, verify=True):
+        self.client = client
+        self.plan_id = plan_id
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.verify = verify
+        self.plan_name = None
+        self.bucket = TokenBucket(rate, burst=max(1, concurrency))
+        self.stats = {}
+
+    def select(self, predicate):
+        """ .. py:method:: select(predicate)
+        The subscribers to migrate, from
+        :py:meth:`pyspreedly.api.Client.iter_subscribers`.
+
+        :param predicate: function of a subscriber dictionary, true for the
+            ones to move
+        :returns: iterator of subscriber dictionaries, for :py:meth:`run`
+        """
+        for subscriber in self.client.iter_subscribers():
+            if predicate(subscriber):
+                yield subscriber
+
+    def run(self, subscribers):
+        """ .. py:method:: run(subscribers)
+        Migrate every subscriber.  All changes are made before the
+        verification starts, so a killed run loses no change it made.
+
+        :param subscribers: iterable of subscriber ids, or of subscriber
+            dictionaries (eg - from :py:meth:`select`), which are skipped
+            without a request when already on the plan
+        :returns: iterator of :py:class:`MigrationResult` in the order they
+            complete
+        :raises: :py:exc:`ValueError` if the site has no plan `plan_id`,
+            before anything is changed
+        """
+        plan = self.client.get_plan_catalog().get(self.plan_id)
+        if plan is None:
+            raise ValueError("No subscription plan {0}".format(self.plan_id))
+        self.plan_name = plan['name']
+        stats = self.stats = {VERIFIED: 0, CHANGED: 0, FAILED: 0,
+                SKIPPED: 0}
+        start = time.time()
+        changed = []
+        for result in self._change_all(subscribers, changed):
+            stats[result.state] += 1
+            yield result
+        stats['change_seconds'] = time.time() - start
+        if self.verify:
+            for result in self._verify_all(changed):
+                stats[result.state] += 1
+                yield result
+        stats['seconds'] = time.time() - start
+        done = stats[VERIFIED] + stats[CHANGED] + stats[FAILED]
+        stats['per_second'] = done / stats['seconds'] \
+                if stats['seconds'] else 0.0
+
+    def _pending(self, subscribers, changed):
+        for subscriber in subscribers:
+            if isinstance(subscriber, dict):
+                subscriber_id = subscriber['customer_id']
+                on_plan = _plan_id(subscriber) == self.plan_id
+            else:
+                subscriber_id, on_plan = subscriber, False
+            entry = self.checkpoint.get(subscriber_id)
+            # entries of a migration to another plan don't count
+            if entry is not None and entry.get('plan_id') != self.plan_id:
+                entry = None
+            state = entry and entry['state']
+            if state == VERIFIED or on_plan:
+                yield MigrationResult(subscriber_id, SKIPPED, None, None)
+            elif state == CHANGED and self.verify:
+                changed.append(subscriber_id)
+            else:
+                yield subscriber_id
+
+    def _change(self, subscriber_id):
+        if isinstance(subscriber_id, MigrationResult):
+            return subscriber_id
+        try:
+            # the token is taken by the worker just before the request, as
+            # bulk_map reads items ahead of the workers
+            self.bucket.acquire()
+            self.client.change_plan(subscriber_id, self.plan_id)
+        except Exception as e:
+            logger.warning("Changing the plan of %s failed: %s",
+                    subscriber_id, e)
+            self.checkpoint.record(subscriber_id, FAILED,
+                    plan_id=self.plan_id, stage='change', error=unicode(e))
+            return MigrationResult(subscriber_id, FAILED, 'change', e)
+        self.checkpoint.record(subscriber_id, CHANGED, plan_id=self.plan_id)
+        return MigrationResult(subscriber_id, CHANGED, None, None)
+
+    def _change_all(self, subscribers, changed):
+        for item, result, error in bulk_map(self._change,
+                self._pending(subscribers, changed), self.concurrency):
+            if error is not None:
+                raise error  # the checkpoint couldn't be written
+            if result.state == CHANGED and self.verify:
+                changed.append(result.subscriber_id)
+            else:
+                yield result
+
+    def _read(self, subscriber_id):
+        self.bucket.acquire()
+        return self.client.get_info(subscriber_id)
+
+    def _verify_all(self, changed):
+        for subscriber_id, data, error in bulk_map(self._read, changed,
+                self.concurrency):
+            if error is None and _plan_id(data) != self.plan_id:
+                error = ValueError("On plan {0} ({1!r}) instead of {2} "
+                        "({3!r})".format(_plan_id(data),
+                            data.get('subscription_plan_name'), self.plan_id,
+                            self.plan_name))
+            if error is not None:
+                logger.warning("Verifying the plan of %s failed: %s",
+                        subscriber_id, error)
+                self.checkpoint.record(subscriber_id, FAILED,
+                        plan_id=self.plan_id, stage='verify',
+                        error=unicode(error))
+                yield MigrationResult(subscriber_id, FAILED, 'verify', error)
+            else:
+                self.checkpoint.record(subscriber_id, VERIFIED,
+                        plan_id=self.plan_id)
+                yield MigrationResult(subscriber_id, VERIFIED, None, None)
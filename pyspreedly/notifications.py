@@ -0,0 +1,204 @@
+import time
+import logging
+import threading
+from urlparse import parse_qs
+from dispatch import lane, current_lane
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+        'parse_notification', 'NotificationIngester', ]
+
+
+def parse_notification(payload):
+    """
+    Get the subscriber ids out of a spreedly subscriber change
+    notification, which is posted as `subscriber_ids=1,2,3`.
+
+    :param payload: the raw (form encoded) request body, or the already
+        parsed form as a dict (values may be lists, like django's
+        `QueryDict` or :py:func:`urlparse.parse_qs`)
+    :returns: list of subscriber ids as integers, in the order sent
+    """
+    if isinstance(payload, basestring):
+        payload = parse_qs(payload)
+    values = payload.get('subscriber_ids') or ''
+    if isinstance(values, basestring):
+        values = [values]
+    ids = []
+    for value in values:
+        for id in value.split(','):
+            id = id.strip()
+            if id:
+                ids.append(int(id))
+    return ids
+
+
+class NotificationIngester(object):
+    """
+    .. py:class:: NotificationIngester(client[, window=30, concurrency=8, batch_size=200, interval=0.5, retries=5, backoff=1])
+    Turns spreedly's change notifications into fresh subscriber records.
+    Ids from notifications are queued and fetched in the background with
+    :py:meth:`pyspreedly.api.Client.get_infos`, and each record is handed
+    to every consumer registered with :py:meth:`subscribe`.
+
+    Ids are deduplicated: an id that is already queued is not queued again,
+    and an id that was fetched less than `window` seconds ago is fetched
+    once more at the end of the window, however many notifications for it
+    arrive in between.  A change is never missed, but a burst of
+    notifications for one subscriber costs at most two fetches per window.
+
+    An id whose fetch fails is queued again, `backoff` seconds later and
+    twice as long after every further failure, and given up on after
+    `retries` retries.  Ids that don't exist (404) are not retried.
+
+    :param client: :py:class:`pyspreedly.api.Client`
+    :param window: seconds within which repeated ids are coalesced
+    :param concurrency: requests in flight at once
+    :param batch_size: most ids fetched per round
+    :param interval: seconds between rounds when nothing is due
+    :param retries: most times a failed fetch is retried
+    :param backoff: seconds before the first retry
+    """
+
+    def __init__(self, client, window=30, concurrency=8, batch_size=200,
+            interval=0.5, retries=5, backoff=1):
+        self.client = client
+        self.window = window
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {'received': 0, 'duplicates': 0, 'fetched': 0,
+                'failed': 0, 'dropped': 0}
+        self._consumers = []
+        self._pending = {}
+        self._fetched = {}
+        self._fetching = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def subscribe(self, consumer):
+        """ .. py:method:: subscribe(consumer)
+        Register `consumer(subscriber_id, data)` to be called with every
+        fetched record.  Consumers are called from the ingester's thread and
+        should not block for long.
+        """
+        self._consumers.append(consumer)
+
+    def ingest(self, payload):
+        """ .. py:method:: ingest(payload)
+        Queue the ids of a notification.  Returns straight away, so this can
+        be called from the notification view.
+
+        :param payload: see :py:func:`parse_notification`
+        :returns: number of ids queued that weren't already
+        """
+        ids = parse_notification(payload)
+        now = time.time()
+        queued = 0
+        with self._lock:
+            self.stats['received'] += len(ids)
+            for id in ids:
+                if id in self._pending:
+                    self.stats['duplicates'] += 1
+                    continue
+                # a fetch in flight may have read the record before this
+                # change, so it only holds the change back like a finished one
+                fetched = self._fetching.get(id, self._fetched.get(id))
+                if fetched is not None and now - fetched < self.window:
+                    self.stats['duplicates'] += 1
+                    self._pending[id] = fetched + self.window
+                else:
+                    self._pending[id] = now
+                queued += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        return queued
+
+    def flush(self, everything=False):
+        """ .. py:method:: flush([everything=False])
+        Fetch and publish the ids that are due now (or all queued ids when
+        `everything` is true), in the calling thread.  Ids that fail are
+        queued again (see :py:class:`NotificationIngester`).
+
+        :returns: number of ids fetched, or tried
+        """
+        now = time.time()
+        with self._lock:
+            due = [id for id, at in self._pending.iteritems()
+                    if everything or at <= now]
+            due = due[:self.batch_size] if not everything else due
+            for id in due:
+                del self._pending[id]
+                self._fetching[id] = now
+            for id, at in self._fetched.items():
+                if now - at >= self.window and id not in self._pending:
+                    del self._fetched[id]
+        for id, data, error in self.client.get_infos(due, self.concurrency):
+            if error is not None:
+                self._failed(id, error)
+                continue
+            with self._lock:
+                self._fetched[id] = self._fetching.pop(id)
+                self._failures.pop(id, None)
+            self.stats['fetched'] += 1
+            for consumer in self._consumers:
+                try:
+                    consumer(id, data)
+                except Exception:
+                    logger.exception("Consumer %r failed for subscriber %s",
+                            consumer, id)
+        return len(due)
+
+    def _failed(self, id, error):
+        with self._lock:
+            self.stats['failed'] += 1
+            del self._fetching[id]
+            failures = self._failures.get(id, 0) + 1
+            if getattr(error, 'code', None) == 404 or failures > self.retries:
+                logger.error("Fetching subscriber %s failed, giving up: %s",
+                        id, error)
+                self.stats['dropped'] += 1
+                self._failures.pop(id, None)
+                return
+            logger.warning("Fetching subscriber %s failed, retry %s of %s: "
+                    "%s", id, failures, self.retries, error)
+            self._failures[id] = failures
+            retry_at = time.time() + self.backoff * 2 ** (failures - 1)
+            self._pending[id] = min(retry_at,
+                    self._pending.get(id, retry_at))
+
+    def start(self):
+        """ .. py:method:: start()
+        Start fetching in a background thread, in the dispatch lane of the
+        calling thread.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run,
+                args=(current_lane(),))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ .. py:method:: stop()
+        Stop the background thread after fetching everything queued.
+        """
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush(everything=True)
+
+    def _run(self, lane_name):
+        with lane(lane_name):
+            while self._running:
+                if not self.flush():
+                    self._wakeup.wait(self.interval)
+                    self._wakeup.clear()
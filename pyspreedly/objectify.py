@@ -1,11 +1,20 @@
 import xml.etree.ElementTree
-from xml.etree import ElementTree as ET
+try:
+    from xml.etree import cElementTree as ET
+except ImportError:
+    from xml.etree import ElementTree as ET
+from xml.parsers import expat
 from StringIO import StringIO
+import os
+import time
 import codecs
 import pytz
 from decimal import Decimal
 import re
 import logging
+# strptime imports _strptime on first use, which fails in all but one of the
+# threads parsing their first datetime at the same time
+import _strptime
 
 
 logger = logging.getLogger(__name__)
@@ -24,9 +33,92 @@ _types = {
     'array'    :  lambda x: [],  ## Return an empty array
     }
 
+INTERN_SIZE = 1024
+INTERN_TYPES = frozenset(['string', 'decimal', 'datetime'])
 
 
-def parse_element(element):
+class ValueInterner(object):
+    """
+    .. py:class:: ValueInterner([size=INTERN_SIZE, types=INTERN_TYPES])
+    Hands out one shared object for each value seen again, so a list of
+    subscribers holds a single `'USD'`, `Decimal('24.0')` or plan name
+    instead of one per record.  Pass the same interner to every parse
+    (see :py:class:`pyspreedly.api.Client`) to share values between
+    responses.
+
+    Values are kept in a table per type and field.  A table stops taking
+    new values once it holds `size`, so fields that are different for
+    every record (tokens, emails) cost at most `size` entries and the
+    tables never grow without bound.  Tag names are interned too.  Only
+    immutable values are shared, so records can't see each other's
+    changes.
+
+    :param size: most values kept per field and type
+    :param types: the `type` attributes whose values are interned.  Other
+        values are converted as usual.
+    """
+
+    def __init__(self, size=INTERN_SIZE, types=INTERN_TYPES):
+        self.size = size
+        self.types = types
+        self._names = {}
+        self._tables = {}
+
+    def __len__(self):
+        return sum(len(table) for tables in self._tables.values()
+                for table in tables.values())
+
+    def name(self, tag):
+        """ .. py:method:: name(tag)
+        :returns: the dictionary key for xml tag `tag`
+        """
+        try:
+            return self._names[tag]
+        except KeyError:
+            name = _sub_dash.sub('_', tag)
+            if isinstance(name, str):
+                name = intern(name)
+            if len(self._names) < self.size:
+                self._names[tag] = name
+            return name
+
+    def value(self, name, data_type, text):
+        """ .. py:method:: value(name, data_type, text)
+        :param name: field name, from :py:meth:`name`
+        :param data_type: the element's `type` attribute
+        :param text: the element's text
+        :returns: `text` converted to `data_type`, the shared copy when the
+            value has been seen before
+        """
+        if text is None or data_type not in self.types:
+            try:
+                return _types[data_type](text)
+            except KeyError:
+                return text
+        try:
+            table = self._tables[data_type][name]
+        except KeyError:
+            table = self._tables.setdefault(data_type, {}).setdefault(
+                    name, {})
+        try:
+            return table[text]
+        except KeyError:
+            value = _types[data_type](text)
+            if len(table) < self.size:
+                table[text] = value
+            return value
+
+    def stats(self):
+        """ .. py:method:: stats()
+        :returns: dict of `(type, field)` to number of values kept
+        """
+        return dict(((data_type, name), len(table))
+                for data_type, tables in self._tables.items()
+                for name, table in tables.items())
+
+
+
+def parse_element(element, interner=None):
     """
     Recursivly parses an element of the xml node depth first.  Turns all xml tags to
     underscore instead of dashes.
@@ -37,17 +129,22 @@ def parse_element(element):
     stuff is not being added.
 
     :param element: :py:class:`ElementTree` element.
+    :param interner: :py:class:`ValueInterner` to share repeated values
+        through, or `None`
     :returns: dictionary of the data (unordered but with correct heirarchy).
     :raises: :py:exc:`MaximumRecursionDepthExceeded` if you do pass some crazy huge and deap XML tree
     """
     children = {}
     data_type = element.attrib.get('type','string')
     children = [] if data_type == 'array' else {}  # change how depth is handled
-    name = _sub_dash.sub('_',element.tag)
+    if interner is None:
+        name = _sub_dash.sub('_',element.tag)
+    else:
+        name = interner.name(element.tag)
     #  Depth First recursive population
     if len(element):
         for child in element:
-            child_data = parse_element(child)
+            child_data = parse_element(child, interner)
             if data_type == 'array':
                 children.append(child_data)
             else:
@@ -55,13 +152,305 @@ def parse_element(element):
         return { name : children}
     if _types['boolean'](element.attrib.get('nil',False)):
         return {name: None}
+    if interner is not None:
+        return {name: interner.value(name, data_type, element.text)}
     try:
         return {name: _types[data_type](element.text)}
     except KeyError:
         return {name: element.text} ## You are something strange and are now a string
 
 
-def objectify_spreedly(xml):
+class ElementTreeBackend(object):
+    """
+    Parses with :py:mod:`xml.etree.cElementTree` (the pure python
+    ElementTree where that isn't built) and turns the tree into
+    dictionaries with :py:func:`parse_element`.
+    """
+    name = 'etree'
+    # errors of the underlying parser to turn into ET.ParseError
+    ParseError = ()
+
+    def _parse(self, source):
+        return ET.parse(source).getroot()
+
+    def _iterparse(self, source):
+        return ET.iterparse(source, events=('start', 'end'))
+
+    def parse(self, xml, interner=None):
+        """ .. py:method:: parse(xml[, interner=None])
+        :param xml: xml string or file object
+        :param interner: :py:class:`ValueInterner` or `None`
+        :returns: data of the root element
+        """
+        try:
+            root = self._parse(_as_file(xml))
+        except self.ParseError as e:
+            raise ET.ParseError(str(e))
+        return parse_element(root, interner).popitem()[1]
+
+    def iterparse(self, xml, interner=None):
+        """ .. py:method:: iterparse(xml[, interner=None])
+        :param xml: xml string or file object
+        :param interner: :py:class:`ValueInterner` or `None`
+        :returns: iterator of the data of each child of the root element
+        """
+        depth = 0
+        root = None
+        events = self._iterparse(_as_file(xml))
+        while True:
+            try:
+                event, element = next(events)
+            except StopIteration:
+                return
+            except self.ParseError as e:
+                raise ET.ParseError(str(e))
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                data = parse_element(element, interner).popitem()[1]
+                root.clear()
+                yield data
+
+
+class LxmlBackend(ElementTreeBackend):
+    """
+    :py:class:`ElementTreeBackend` with the tree built by :py:mod:`lxml`,
+    when it is installed.
+    """
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import etree
+        self.etree = etree
+        self.ParseError = etree.XMLSyntaxError
+        self._parser = etree.XMLParser(remove_comments=True,
+                remove_pis=True, resolve_entities=False)
+
+    def _parse(self, source):
+        return self.etree.parse(source, self._parser).getroot()
+
+    def _iterparse(self, source):
+        return self.etree.iterparse(source, events=('start', 'end'),
+                remove_comments=True, remove_pis=True,
+                resolve_entities=False)
+
+
+_non_ascii = re.compile('[\x80-\xff]')
+
+
+def _text(text):
+    # expat hands back utf-8, ElementTree plain strings for ascii text and
+    # unicode for the rest
+    if _non_ascii.search(text):
+        return text.decode('utf-8')
+    return text
+
+
+class _Builder(object):
+    """
+    expat handlers building the same dictionaries as :py:func:`parse_element`,
+    straight from the parse events.  With `stream` set the children of the
+    root element are collected in `ready` instead of in the root.
+    """
+
+    def __init__(self, stream=False, interner=None):
+        self.stream = stream
+        self.interner = interner
+        self.stack = []
+        self.ready = []
+        self.result = None
+        self.names = {}
+
+    def start(self, tag, attrib):
+        stack = self.stack
+        if stack:
+            parent = stack[-1]
+            if parent[4] is None:
+                parent[4] = [] if parent[1] == 'array' else {}
+        name = self.names.get(tag)
+        if name is None:
+            name = _text(tag)
+            name = self.names[tag] = _sub_dash.sub('_', name) \
+                    if self.interner is None else self.interner.name(name)
+        # name, type, nil, text, children
+        stack.append([name, attrib.get('type', 'string'),
+            attrib.get('nil') == 'true', [], None])
+
+    def data(self, text):
+        self.stack[-1][3].append(text)
+
+    def end(self, tag):
+        stack = self.stack
+        name, data_type, nil, text, children = stack.pop()
+        if children is not None:
+            value = children
+        elif nil:
+            value = None
+        else:
+            text = _text(''.join(text)) if text else None
+            if self.interner is not None:
+                value = self.interner.value(name, data_type, text)
+            else:
+                try:
+                    value = _types[data_type](text)
+                except KeyError:
+                    value = text
+        if not stack:
+            self.result = value
+        elif self.stream and len(stack) == 1:
+            self.ready.append(value)
+        else:
+            parent = stack[-1]
+            if parent[1] == 'array':
+                parent[4].append({name: value})
+            else:
+                parent[4][name] = value
+
+
+class ExpatBackend(object):
+    """
+    Builds the dictionaries from :py:mod:`xml.parsers.expat` events without
+    ever making an element tree, which saves allocating and then walking an
+    element per tag.
+    """
+    name = 'expat'
+    chunk_size = 64 * 1024
+
+    def _parser(self, builder):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.returns_unicode = False
+        parser.StartElementHandler = builder.start
+        parser.EndElementHandler = builder.end
+        parser.CharacterDataHandler = builder.data
+        return parser
+
+    def _feed(self, parser, data, final=False):
+        try:
+            parser.Parse(data, final)
+        except expat.ExpatError as e:
+            raise ET.ParseError(str(e))
+
+    def parse(self, xml, interner=None):
+        """ .. py:method:: parse(xml[, interner=None])
+        :param xml: xml string or file object
+        :param interner: :py:class:`ValueInterner` or `None`
+        :returns: data of the root element
+        """
+        builder = _Builder(interner=interner)
+        parser = self._parser(builder)
+        if isinstance(xml, unicode):
+            xml = codecs.encode(xml, 'utf8')
+        if hasattr(xml, 'read'):
+            while True:
+                data = xml.read(self.chunk_size)
+                if not data:
+                    break
+                self._feed(parser, data)
+            self._feed(parser, '', True)
+        else:
+            self._feed(parser, xml, True)
+        return builder.result
+
+    def iterparse(self, xml, interner=None):
+        """ .. py:method:: iterparse(xml[, interner=None])
+        :param xml: xml string or file object
+        :param interner: :py:class:`ValueInterner` or `None`
+        :returns: iterator of the data of each child of the root element
+        """
+        builder = _Builder(stream=True, interner=interner)
+        parser = self._parser(builder)
+        source = _as_file(xml)
+        while True:
+            data = source.read(self.chunk_size)
+            self._feed(parser, data, not data)
+            ready, builder.ready = builder.ready, []
+            for value in ready:
+                yield value
+            if not data:
+                return
+
+
+_backends = {}
+_backend_order = []
+_default = [None]
+
+
+def register_backend(backend):
+    """
+    Make `backend` available by its `name`.  A backend has a `name`,
+    `parse(xml, interner=None)` returning the data of the root element, and
+    `iterparse(xml, interner=None)` yielding the data of each child of the
+    root element.
+    """
+    if backend.name not in _backends:
+        _backend_order.append(backend.name)
+    _backends[backend.name] = backend
+
+
+register_backend(ElementTreeBackend())
+register_backend(ExpatBackend())
+try:
+    register_backend(LxmlBackend())
+except ImportError:
+    pass
+
+
+def available_backends():
+    """:returns: names of the registered backends"""
+    return list(_backend_order)
+
+
+def get_backend(name=None):
+    """
+    :param name: backend name, default the one set by :py:func:`set_backend`
+    :returns: the backend
+    :raises: :py:exc:`KeyError` for an unknown backend
+    """
+    return _backends[name or _default[0]]
+
+
+def set_backend(name):
+    """
+    Parse with the backend called `name` from now on.  The
+    `PYSPREEDLY_XML_BACKEND` environment variable sets the backend used
+    at import.
+    """
+    get_backend(name)
+    _default[0] = name
+
+
+def fastest_backend(xml, repeat=3):
+    """
+    Time every backend parsing `xml`, the best of `repeat` runs.
+
+    :param xml: a representative response body, as a string
+    :returns: list of `(seconds, name)`, fastest first.  Pass the first
+        name to :py:func:`set_backend` to use it.
+    """
+    timings = []
+    for name in _backend_order:
+        backend = _backends[name]
+        best = None
+        for i in xrange(repeat):
+            started = time.time()
+            backend.parse(xml)
+            elapsed = time.time() - started
+            if best is None or elapsed < best:
+                best = elapsed
+        timings.append((best, name))
+    timings.sort()
+    return timings
+
+
+set_backend(os.environ.get('PYSPREEDLY_XML_BACKEND') or 'etree')
+
+
+def objectify_spreedly(xml, backend=None, interner=None):
     """
     Does some high level stuff to the XML tree, and then passes it off to
     :py:func:`parse_element` to get the data back as a dictionary.  Truth
@@ -69,21 +458,41 @@ def objectify_spreedly(xml):
     dictionary.
 
     :param xml: xml string or file object.  If it is a string, it is turned into :py:class:`StringIO`.
+    :param backend: name of the parser backend, default the one set with
+        :py:func:`set_backend`
+    :param interner: :py:class:`ValueInterner` sharing repeated values
+        between records and parses, or `None`
     """
-    if not hasattr(xml, 'read'):
-        _xml = xml
-        buffer = StringIO()
-        utf8_codec = codecs.lookup("utf8")
-        xml = codecs.StreamReaderWriter(buffer,
-                                        utf8_codec.streamreader,
-                                        utf8_codec.streamwriter)
-        xml.write(_xml)
-        xml.seek(0)
-    try:
-        tree = ET.parse(xml)
-    except ET.ParseError as e:
-        raise e
-    data = parse_element(tree.getroot())[_sub_dash.sub('_',tree.getroot().tag)]
+    return _fix_ids(get_backend(backend).parse(xml, interner))
+
+
+def iterparse_spreedly(xml, backend=None, interner=None):
+    """
+    Streaming version of :py:func:`objectify_spreedly` for list responses
+    (subscribers, plans, transactions).  Yields the dictionary for each
+    child of the root element as soon as it has been read, and throws the
+    element away afterwards, so memory use does not grow with the size of
+    the response.
+
+    :param xml: xml string or file object.
+    :param backend: name of the parser backend
+    :param interner: :py:class:`ValueInterner` or `None`
+    :returns: iterator of dictionaries
+    """
+    for data in get_backend(backend).iterparse(xml, interner):
+        yield _fix_ids(data)
+
+
+def _as_file(xml):
+    if hasattr(xml, 'read'):
+        return xml
+    # cElementTree only reads bytes, so hand it the utf-8 encoded text
+    if isinstance(xml, unicode):
+        xml = codecs.encode(xml, 'utf8')
+    return StringIO(xml)
+
+
+def _fix_ids(data):
     for key in ['customer_id', 'pagination_id',]:
         try:
             data[key] = int(data[key])
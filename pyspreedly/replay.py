@@ -0,0 +1,284 @@
+"""
+Record the api traffic of a :py:class:`pyspreedly.api.Client` and play it
+back without spreedly, for load tests with a real day's mix of calls::
+
+    client.start_recording('monday.jsonl.gz')
+    ...  # a day of production traffic
+    client.stop_recording()
+
+    recording = load_recording('monday.jsonl.gz')
+    client = Client('token', 'site', session=ReplayTransport(recording))
+    print ReplayDriver(client, recording, concurrency=16).run()
+
+Recordings are gzipped json lines.  The api token is never written: auth
+headers aren't recorded and the token is replaced by `REDACTED` wherever it
+shows up in urls and bodies.  Neither are card details: every field of a
+`<credit-card>` element in a body (number, verification value, expiry,
+name) is replaced by `REDACTED` too.
+"""
+import re
+import gzip
+import json
+import time
+import zlib
+import threading
+from collections import deque
+from StringIO import StringIO
+from bulk import bulk_map
+
+
+__all__ = [
+        'RecordingSession', 'ReplayResponse', 'ReplayTransport',
+        'ReplayDriver', 'load_recording', 'latency_report', ]
+
+REDACTED = 'REDACTED'
+
+_CREDIT_CARD = re.compile(r'<credit-card(?:\s[^>]*)?>.*?</credit-card>', re.S)
+_TEXT = re.compile(r'>[^<]+<')
+
+
+def _redact_card(match):
+    return _TEXT.sub('>' + REDACTED + '<', match.group(0))
+
+
+def _request_body(kw):
+    data = kw.get('data') or None
+    if data and (kw.get('headers') or {}).get('Content-Encoding') == 'gzip':
+        data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return data
+
+
+class ReplayResponse(object):
+    """
+    A stand-in for :py:class:`requests.Response` with the parts
+    :py:class:`pyspreedly.api.Client` uses.
+    """
+
+    def __init__(self, status_code, content, headers=None, url=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+        self.raw = StringIO(content)
+        self.raw.decode_content = True
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def close(self):
+        pass
+
+
+class RecordingSession(object):
+    """
+    .. py:class:: RecordingSession(session, client, path)
+    Wraps the session of `client`, writing every request and response to
+    `path`.  Usually set up through
+    :py:meth:`pyspreedly.api.Client.start_recording`.
+    """
+
+    def __init__(self, session, client, path):
+        self.session = session
+        self.base_url = client.base_url
+        self.token = client.auth
+        self._file = gzip.open(path, 'wb')
+        self._lock = threading.Lock()
+        self._start = time.time()
+
+    def _redact(self, text):
+        if not text:
+            return text
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        text = text.replace(self.token, REDACTED)
+        if '<credit-card' in text:
+            text = _CREDIT_CARD.sub(_redact_card, text)
+        return text
+
+    def _request(self, action, url, **kw):
+        started = time.time()
+        response = getattr(self.session, action)(url, **kw)
+        content = response.content
+        elapsed = time.time() - started
+        if url.startswith(self.base_url):
+            url = url[len(self.base_url):]
+        entry = {
+            'offset': round(started - self._start, 6),
+            'elapsed': round(elapsed, 6),
+            'action': action,
+            'url': self._redact(url),
+            'data': self._redact(_request_body(kw)),
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type'),
+            'body': self._redact(content),
+            }
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+        return ReplayResponse(response.status_code, content,
+                {'Content-Type': entry['content_type']}, response.url)
+
+    def get(self, url, **kw):
+        return self._request('get', url, **kw)
+
+    def post(self, url, **kw):
+        return self._request('post', url, **kw)
+
+    def put(self, url, **kw):
+        return self._request('put', url, **kw)
+
+    def delete(self, url, **kw):
+        return self._request('delete', url, **kw)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_recording(path):
+    """
+    :param path: file written by :py:class:`RecordingSession`
+    :returns: list of the recorded entries, oldest first
+    """
+    with gzip.open(path, 'rb') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayTransport(object):
+    """
+    .. py:class:: ReplayTransport(recording[, speed=1.0])
+    Answers requests from a recording instead of the network.  Pass it to
+    :py:class:`pyspreedly.api.Client` as the `session`.
+
+    Each request is answered with the next recorded response for the same
+    method, url and body, after the recorded response time divided by
+    `speed` (`speed=0` answers straight away).  Requests that weren't
+    recorded get a 404 and are counted in `misses`.
+
+    :param recording: entries from :py:func:`load_recording`
+    :param speed: how many times faster than recorded to answer
+    """
+
+    def __init__(self, recording, speed=1.0):
+        self.speed = speed
+        self.misses = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        for entry in recording:
+            data = entry['data'] and entry['data'].encode('utf-8')
+            key = (entry['action'], entry['url'], data)
+            self._responses.setdefault(key, deque()).append(entry)
+
+    def _request(self, action, url, **kw):
+        path = url.split('/api/', 1)[-1].split('/', 2)[-1]
+        data = _request_body(kw)
+        with self._lock:
+            queue = self._responses.get((action, path, data))
+            if not queue:
+                self.misses += 1
+                return ReplayResponse(404, '', url=url)
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.speed:
+            time.sleep(entry['elapsed'] / self.speed)
+        body = entry['body'] or ''
+        return ReplayResponse(entry['status'], body.encode('utf-8'),
+                {'Content-Type': entry['content_type']}, url)
+
+    def get(self, url, **kw):
+        return self._request('get', url, **kw)
+
+    def post(self, url, **kw):
+        return self._request('post', url, **kw)
+
+    def put(self, url, **kw):
+        return self._request('put', url, **kw)
+
+    def delete(self, url, **kw):
+        return self._request('delete', url, **kw)
+
+
+def latency_report(latencies, seconds, errors=0):
+    """
+    :param latencies: request latencies in seconds
+    :param seconds: wall clock time the requests took
+    :param errors: number of failed requests
+    :returns: dict of requests, errors, throughput (requests/s) and the
+        mean, p50, p95, p99 and max latency in milliseconds
+    """
+    latencies = sorted(latencies)
+    count = len(latencies)
+    report = {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'throughput': round(count / seconds, 1) if seconds else 0.0,
+        }
+    if latencies:
+        report['mean_ms'] = round(sum(latencies) / count * 1000, 3)
+        report['max_ms'] = round(latencies[-1] * 1000, 3)
+        for name, pct in (('p50_ms', 50), ('p95_ms', 95), ('p99_ms', 99)):
+            report[name] = round(latencies[min(count - 1,
+                count * pct // 100)] * 1000, 3)
+    return report
+
+
+class ReplayDriver(object):
+    """
+    .. py:class:: ReplayDriver(client, recording[, concurrency=8, speed=0])
+    Issues the recorded calls again through `client`, with up to
+    `concurrency` in flight, and measures them.
+
+    :param client: :py:class:`pyspreedly.api.Client` to drive, talking to a
+        :py:class:`ReplayTransport`, the stub or a staging site
+    :param recording: entries from :py:func:`load_recording`
+    :param concurrency: requests in flight at once
+    :param speed: keep the recorded gaps between calls, divided by `speed`.
+        Default `0` sends every call as soon as a worker is free, to find
+        the maximum throughput.
+    """
+
+    def __init__(self, client, recording, concurrency=8, speed=0):
+        self.client = client
+        self.recording = recording
+        self.concurrency = concurrency
+        self.speed = speed
+
+    def _call(self, entry):
+        if self.speed:
+            delay = self._start + entry['offset'] / self.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        url = entry['url']
+        if REDACTED in url:
+            url = url.replace(REDACTED, self.client.auth)
+        started = time.time()
+        response = self.client.query(url, entry['data'], entry['action'])
+        response.content
+        return time.time() - started, response.status_code
+
+    def run(self):
+        """ .. py:method:: run()
+        :returns: :py:func:`latency_report` of the replayed calls, plus a
+            count of responses per status code
+        """
+        latencies = []
+        statuses = {}
+        errors = 0
+        self._start = time.time()
+        for entry, result, error in bulk_map(self._call, self.recording,
+                self.concurrency):
+            if error is not None:
+                errors += 1
+                continue
+            latency, status = result
+            latencies.append(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+        report = latency_report(latencies, time.time() - self._start, errors)
+        report['status'] = statuses
+        return report
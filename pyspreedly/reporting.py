@@ -0,0 +1,105 @@
+import os
+from decimal import Decimal
+
+
+__all__ = [
+        'TransactionCursor', 'RevenueAggregator', 'by_currency', 'by_plan',
+        'aggregate', ]
+
+
+class TransactionCursor(object):
+    """
+    .. py:class:: TransactionCursor(path)
+    Remembers the last transaction id read by
+    :py:meth:`pyspreedly.api.Client.iter_transactions` in a file, so the
+    next report only fetches the new transactions.
+
+    :param path: file the id is kept in
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.since_id = None
+        if os.path.exists(path):
+            with open(path) as f:
+                value = f.read().strip()
+            if value:
+                self.since_id = int(value)
+
+    def save(self, since_id):
+        """ .. py:method:: save(since_id)
+        Store `since_id`.  The file is replaced in one step, so a killed
+        report never leaves a half written id behind.
+        """
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(str(since_id))
+        os.rename(tmp, self.path)
+        self.since_id = since_id
+
+
+def by_currency(transaction):
+    """Aggregation key: the transaction's currency"""
+    return transaction.get('currency_code')
+
+
+def by_plan(transaction):
+    """Aggregation key: the subscription plan (or feature level) the
+    transaction paid for"""
+    detail = transaction.get('detail') or {}
+    return (detail.get('subscription_plan_name')
+            or detail.get('feature_level'))
+
+
+class RevenueAggregator(object):
+    """
+    .. py:class:: RevenueAggregator([key=by_currency, succeeded_only=True])
+    Running totals of transaction amounts per key.  Memory grows with the
+    number of distinct keys, not the number of transactions.
+
+    :param key: function giving the group of a transaction, like
+        :py:func:`by_currency` or :py:func:`by_plan`.  Functions returning a
+        tuple give nested groups (eg - plan and currency).
+    :param succeeded_only: skip transactions with `succeeded` false
+    """
+
+    def __init__(self, key=by_currency, succeeded_only=True):
+        self.key = key
+        self.succeeded_only = succeeded_only
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, transaction):
+        if self.succeeded_only and transaction.get('succeeded') is False:
+            return
+        key = self.key(transaction)
+        amount = transaction.get('amount') or Decimal(0)
+        self.totals[key] = self.totals.get(key, Decimal(0)) + amount
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def report(self):
+        """ .. py:method:: report()
+        :returns: dict of key to `{'amount': Decimal, 'count': int}`
+        """
+        return dict((key, {'amount': total, 'count': self.counts[key]})
+                for key, total in self.totals.iteritems())
+
+
+def aggregate(transactions, *aggregators):
+    """
+    Feed each transaction to every aggregator on its way through, so
+    reports can be built while the transactions are exported or processed::
+
+        revenue = RevenueAggregator(by_currency)
+        for tx in aggregate(client.iter_transactions(), revenue):
+            writer.write(tx)
+        print revenue.report()
+
+    :param transactions: iterable of transaction dictionaries
+    :returns: iterator of the same transactions
+    """
+    adders = [a.add for a in aggregators]
+    for transaction in transactions:
+        for add in adders:
+            add(transaction)
+        yield transaction
@@ -0,0 +1,262 @@
+"""
+Test subscribers for staging and integration tests, created in parallel
+and removed again without touching anyone else's::
+
+    with Seeder(client, concurrency=16) as seeder:
+        for result in seeder.seed(50000):
+            ...
+        run_load_test()
+    # only the subscribers of this run are deleted here
+
+Every run gets a block of customer ids of its own, `run * 1000000` up, and
+screen names tagged `seed-<run>-<n>` (the n-th subscriber of the run), so concurrent runs on one site don't
+collide and :py:meth:`Seeder.teardown` deletes only what its run made,
+unlike :py:meth:`pyspreedly.api.Client.cleanup`.
+"""
+import time
+import random
+import logging
+import threading
+from collections import namedtuple
+import requests
+from bulk import bulk_map
+from dispatch import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+        'SeedResult', 'Seeder', ]
+
+BLOCK = 1000000
+KINDS = ('plain', 'trial', 'plan', 'fee', 'comp')
+DEFAULT_MIX = {'plain': 10, 'trial': 20, 'plan': 40, 'fee': 20, 'comp': 10}
+
+
+class SeedResult(namedtuple('SeedResult', 'customer_id kind data error')):
+    """
+    Outcome of one subscriber of :py:meth:`Seeder.seed`.
+
+    `kind` is what the subscriber was given (see :py:class:`Seeder`),
+    `data` the subscriber dictionary as created and `error` the exception
+    of the first request that failed, or `None`.
+    """
+    __slots__ = ()
+
+
+class Seeder(object):
+    """
+    .. py:class:: Seeder(client[, run=None, mix=None, concurrency=16, rate=None])
+    Creates subscribers tagged with a run, `concurrency` at a time.  Each
+    subscriber is one of these kinds, picked at random by weight:
+
+    - `plain`: just created
+    - `trial`: subscribed to a free trial plan
+    - `plan`: on a regular plan, picked at random.  Plans can only be
+      changed for active subscribers, so these are activated with a
+      complimentary subscription first.
+    - `fee`: on a regular plan like `plan`, with a fee added
+    - `comp`: given a complimentary subscription to a plan's feature level
+
+    Give the client a session with at least `concurrency` pooled
+    connections, or the requests queue up for connections instead of
+    running in parallel.
+
+    :param client: :py:class:`pyspreedly.api.Client`
+    :param run: number of the run, random by default.  Pass the number of
+        an earlier run to tear it down.
+    :param mix: dict of kind to weight, defaults to :py:data:`DEFAULT_MIX`
+    :param concurrency: requests in flight at once
+    :param rate: most requests per second, `None` for no limit
+    """
+
+    def __init__(self, client, run=None, mix=None, concurrency=16,
+            rate=None):
+        self.client = client
+        self.run = run if run is not None else random.getrandbits(32)
+        self.tag = 'seed-{0}'.format(self.run)
+        self.first_id = self.run * BLOCK
+        self.mix = mix or DEFAULT_MIX
+        for kind in self.mix:
+            if kind not in KINDS:
+                raise ValueError("Unknown kind {0!r}, not one of {1}".format(
+                    kind, ', '.join(KINDS)))
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst=max(1, concurrency))
+        self.created = set()
+        self.stats = {}
+        self._next = 0
+        self._random = random.Random(self.run)
+        self._lock = threading.Lock()
+        if client.session is None:
+            logger.warning("Seeding without a session: every request opens "
+                    "a new connection")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.teardown()
+
+    def owns(self, subscriber):
+        """ .. py:method:: owns(subscriber)
+        :returns: whether the subscriber dictionary belongs to this run
+        """
+        customer_id = subscriber.get('customer_id')
+        if isinstance(customer_id, (int, long)) and \
+                self.first_id <= customer_id < self.first_id + BLOCK:
+            return True
+        return (subscriber.get('screen_name') or '').startswith(
+                self.tag + '-')
+
+    def reserve(self, count=1):
+        """ .. py:method:: reserve([count=1])
+        Customer ids of this run for subscribers made some other way, eg -
+        by a test calling :py:meth:`pyspreedly.api.Client.create_subscriber`
+        itself.  They are deleted by :py:meth:`teardown` like the seeded
+        ones.
+
+        :returns: list of `count` unused customer ids
+        """
+        with self._lock:
+            if self._next + count > BLOCK:
+                raise ValueError("A run has at most {0} subscribers".format(
+                    BLOCK))
+            ids = range(self.first_id + self._next,
+                    self.first_id + self._next + count)
+            self._next += count
+            self.created.update(ids)
+        return ids
+
+    def _plans(self):
+        catalog = self.client.get_plan_catalog()
+        regular = [p for p in catalog.for_plan_type('regular')
+                if p.get('enabled')]
+        trial = [p for p in catalog.for_plan_type('free_trial')
+                if p.get('enabled')]
+        needed = [('regular', regular, ('plan', 'fee', 'comp')),
+                ('free_trial', trial, ('trial',))]
+        for plan_type, plans, kinds in needed:
+            if not plans and any(self.mix.get(kind) for kind in kinds):
+                raise ValueError("No enabled {0} plan to seed {1}".format(
+                    plan_type, ' or '.join(kinds)))
+        return regular, trial
+
+    def _orders(self, count, regular, trial):
+        kinds = sorted(k for k in self.mix if self.mix[k])
+        total = float(sum(self.mix[k] for k in kinds))
+        pick = self._random
+        for i in xrange(count):
+            # one at a time, so a run stopped early has nothing reserved
+            # that teardown would try to delete for nothing
+            customer_id, = self.reserve()
+            choice = pick.random() * total
+            for kind in kinds:
+                choice -= self.mix[kind]
+                if choice < 0:
+                    break
+            if kind == 'trial':
+                plan = pick.choice(trial)
+            else:
+                plan = pick.choice(regular) if regular else None
+            # fee amount and months of complimentary subscription
+            yield (customer_id, kind, plan,
+                    '{0:.2f}'.format(pick.uniform(1, 50)), pick.randint(1, 3))
+
+    def _request(self, method, *args):
+        self.bucket.acquire()
+        return method(*args)
+
+    def _seed_one(self, order):
+        customer_id, kind, plan, amount, months = order
+        client = self.client
+        screen_name = '{0}-{1}'.format(self.tag, customer_id - self.first_id)
+        try:
+            data = self._request(client.create_subscriber, customer_id,
+                    screen_name)
+            if kind == 'trial':
+                data = self._request(client.subscribe, customer_id,
+                        plan['id'])
+            elif kind in ('plan', 'fee'):
+                self._request(client.create_complimentary_subscription,
+                        customer_id, months, 'months', plan['feature_level'])
+                self._request(client.change_plan, customer_id, plan['id'])
+            elif kind == 'comp':
+                self._request(client.create_complimentary_subscription,
+                        customer_id, months, 'months',
+                        plan['feature_level'])
+            if kind == 'fee':
+                response = self._request(client.add_fee, customer_id,
+                        'Seed fee', 'Seeded by {0}'.format(self.tag),
+                        'seed', amount)
+                if response.status_code != 201:
+                    e = requests.HTTPError('status code: {0}'.format(
+                        response.status_code))
+                    e.code = response.status_code
+                    raise e
+        except Exception as e:
+            logger.warning("Seeding %s subscriber %s failed: %s", kind,
+                    customer_id, e)
+            return SeedResult(customer_id, kind, None, e)
+        return SeedResult(customer_id, kind, data, None)
+
+    def seed(self, count):
+        """ .. py:method:: seed(count)
+        Create `count` subscribers.  Their ids are recorded for
+        :py:meth:`teardown` before they are created, so a request that
+        timed out but went through is cleaned up too.
+
+        :returns: iterator of :py:class:`SeedResult` in the order they
+            complete
+        :raises: :py:exc:`ValueError` if the mix needs a kind of plan the
+            site doesn't have, before anything is created
+        """
+        regular, trial = self._plans()
+        stats = self.stats = dict((kind, 0) for kind in self.mix)
+        stats['failed'] = 0
+        start = time.time()
+        for order, result, error in bulk_map(self._seed_one,
+                self._orders(count, regular, trial), self.concurrency):
+            stats['failed' if result.error else result.kind] += 1
+            yield result
+        stats['seconds'] = time.time() - start
+        stats['per_second'] = count / stats['seconds'] \
+                if stats['seconds'] else 0.0
+
+    def _delete(self, customer_id):
+        status = self._request(self.client.delete_subscriber, customer_id)
+        if status not in (200, 404):
+            e = requests.HTTPError('status code: {0}'.format(status))
+            e.code = status
+            raise e
+        with self._lock:
+            self.created.discard(customer_id)
+
+    def teardown(self, scan=False):
+        """ .. py:method:: teardown([scan=False])
+        Delete the subscribers of this run with
+        :py:meth:`pyspreedly.api.Client.delete_subscriber`, `concurrency` at
+        a time.  Ids that fail to delete are kept, so calling this again
+        retries them.
+
+        :param scan: also look through
+            :py:meth:`pyspreedly.api.Client.iter_subscribers` for the run's
+            subscribers, eg - to clean up after a run that crashed
+        :returns: dict with the number `deleted`, the `failed` ids and
+            `seconds` taken
+        """
+        start = time.time()
+        with self._lock:
+            ids = set(self.created)
+        if scan:
+            ids.update(s['customer_id'] for s in
+                    self.client.iter_subscribers() if self.owns(s))
+        failed = []
+        for customer_id, result, error in bulk_map(self._delete,
+                sorted(ids), self.concurrency):
+            if error is not None:
+                logger.warning("Deleting subscriber %s failed: %s",
+                        customer_id, error)
+                failed.append(customer_id)
+        return {'deleted': len(ids) - len(failed), 'failed': sorted(failed),
+                'seconds': time.time() - start}
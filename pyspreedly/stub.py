@@ -0,0 +1,361 @@
+"""
+A local stand-in for the spreedly api, for benchmarks and load tests.  It
+keeps subscribers in memory and answers the calls
+:py:class:`pyspreedly.api.Client` makes with responses shaped like
+spreedly's::
+
+    server = StubServer(latency=lambda: 0.02)
+    server.start()
+    client = Client('token', 'site', base_host=server.url)
+    ...
+    server.stop()
+"""
+import re
+import time
+import zlib
+import random
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from urlparse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from xml.etree import ElementTree as ET
+
+
+__all__ = [
+        'StubServer', ]
+
+_route_re = re.compile(r'^/api/v4/[^/]+/(?P<path>.*?)\.xml$')
+_date_format = '%Y-%m-%dT%H:%M:%SZ'
+
+PLANS = [
+    {'id': 1, 'name': 'Basic', 'feature_level': 'basic',
+        'price': Decimal('10.0'), 'plan_type': 'regular'},
+    {'id': 2, 'name': 'Pro', 'feature_level': 'pro',
+        'price': Decimal('25.0'), 'plan_type': 'regular'},
+    {'id': 3, 'name': 'Trial', 'feature_level': 'pro',
+        'price': Decimal('0.0'), 'plan_type': 'free_trial'},
+    ]
+
+
+def _typed(name, value):
+    tag = name.replace('_', '-')
+    if value is None:
+        return '<{0} nil="true"></{0}>'.format(tag)
+    if isinstance(value, bool):
+        return '<{0} type="boolean">{1}</{0}>'.format(tag,
+                'true' if value else 'false')
+    if isinstance(value, (int, long)):
+        return '<{0} type="integer">{1}</{0}>'.format(tag, value)
+    if isinstance(value, Decimal):
+        return '<{0} type="decimal">{1}</{0}>'.format(tag, value)
+    if isinstance(value, datetime):
+        return '<{0} type="datetime">{1}</{0}>'.format(tag,
+                value.strftime(_date_format))
+    if isinstance(value, dict):
+        return '<{0}>{1}</{0}>'.format(tag,
+                ''.join(_typed(k, v) for k, v in sorted(value.iteritems())))
+    return '<{0}>{1}</{0}>'.format(tag, escape(unicode(value).encode('utf-8')))
+
+
+def _render(name, record):
+    return '<{0}>{1}</{0}>'.format(name.replace('_', '-'),
+            ''.join(_typed(k, v) for k, v in sorted(record.iteritems())))
+
+
+def _render_list(name, item_name, records):
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<{0} type="array">{1}</{0}>'.format(
+            name, ''.join(_render(item_name, r) for r in records))
+
+
+class SiteState(object):
+    """In memory subscribers, invoices and transactions of the stub"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.invoices = {}
+        self.transactions = []
+        self.plans = dict((p['id'], dict(p, enabled=True)) for p in PLANS)
+
+    def subscriber(self, customer_id, screen_name=None):
+        now = datetime.utcnow().replace(microsecond=0)
+        return {
+            'customer_id': customer_id,
+            'screen_name': screen_name or 'subscriber-{0}'.format(customer_id),
+            'email': None,
+            'active': False,
+            'active_until': None,
+            'feature_level': '',
+            'subscription_plan_name': None,
+            'on_trial': False,
+            'recurring': False,
+            'store_credit': Decimal('0.0'),
+            'store_credit_currency_code': 'USD',
+            'token': '{0:040x}'.format(random.getrandbits(160)),
+            'created_at': now,
+            'updated_at': now,
+            }
+
+    def change_plan(self, subscriber, plan_id, trial=False):
+        plan = self.plans[plan_id]
+        now = datetime.utcnow().replace(microsecond=0)
+        subscriber.update(active=True, on_trial=trial,
+                feature_level=plan['feature_level'],
+                subscription_plan_name=plan['name'],
+                subscription_plan_version={'subscription_plan_id': plan_id,
+                    'name': plan['name'], 'amount': plan['price'],
+                    'feature_level': plan['feature_level']},
+                active_until=now + timedelta(days=30), updated_at=now)
+
+    def add_transaction(self, subscriber, amount):
+        transaction = {
+            'id': len(self.transactions) + 1,
+            'amount': amount,
+            'currency_code': 'USD',
+            'succeeded': True,
+            'subscriber_customer_id': subscriber['customer_id'],
+            'created_at': datetime.utcnow().replace(microsecond=0),
+            }
+        self.transactions.append(transaction)
+        return transaction
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+        server.bytes_received += len(body)
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        url = urlparse(self.path)
+        match = _route_re.match(url.path)
+        if server.latency is not None:
+            time.sleep(server.latency())
+        if match is None:
+            return self._respond(404, '')
+        path = match.group('path').split('/')
+        query = parse_qs(url.query)
+        with server.state.lock:
+            server.requests += 1
+            status, xml = self._route(server.state, method, path, body, query)
+        self._respond(status, xml)
+
+    def _respond(self, status, xml):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml; charset=utf-8')
+        if self.server.compress and len(xml) > 256 and \
+                'gzip' in self.headers.get('Accept-Encoding', ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED,
+                    16 + zlib.MAX_WBITS)
+            xml = compressor.compress(xml) + compressor.flush()
+            self.send_header('Content-Encoding', 'gzip')
+        self.server.bytes_sent += len(xml)
+        self.send_header('Content-Length', str(len(xml)))
+        self.end_headers()
+        self.wfile.write(xml)
+
+    def _route(self, state, method, path, body, query):
+        subscribers = state.subscribers
+        if path == ['subscription_plans'] and method == 'GET':
+            return 200, _render_list('subscription-plans',
+                    'subscription_plan', state.plans.values())
+        if path == ['subscribers']:
+            if method == 'GET':
+                return 200, _render_list('subscribers', 'subscriber',
+                        (subscribers[k] for k in sorted(subscribers)))
+            if method == 'DELETE':
+                subscribers.clear()
+                return 200, ''
+            if method == 'POST':
+                root = ET.fromstring(body)
+                customer_id = int(root.findtext('customer-id'))
+                if customer_id in subscribers:
+                    return 403, ('A subscriber with a customer-id of {0} '
+                            'already exists.'.format(customer_id))
+                subscriber = subscribers[customer_id] = state.subscriber(
+                        customer_id, root.findtext('screen-name'))
+                return 201, _render('subscriber', subscriber)
+        if path == ['transactions'] and method == 'GET':
+            since_id = int(query.get('since_id', ['0'])[0])
+            page = [t for t in state.transactions if t['id'] > since_id][:50]
+            return 200, _render_list('transactions', 'transaction', page)
+        if path == ['invoices'] and method == 'POST':
+            root = ET.fromstring(body)
+            customer_id = int(root.findtext('subscriber/customer-id'))
+            plan_id = int(root.findtext('subscription-plan-id'))
+            if plan_id not in state.plans:
+                return 422, 'Unknown plan'
+            if customer_id not in subscribers:
+                subscribers[customer_id] = state.subscriber(customer_id,
+                        root.findtext('subscriber/screen-name'))
+            token = '{0:040x}'.format(random.getrandbits(160))
+            invoice = state.invoices[token] = {'token': token,
+                    'closed': False, 'customer_id': customer_id,
+                    'plan_id': plan_id,
+                    'amount': state.plans[plan_id]['price']}
+            return 201, _render('invoice', invoice)
+        if path[0] == 'invoices' and path[2:] == ['pay'] and method == 'PUT':
+            invoice = state.invoices.get(path[1])
+            if invoice is None:
+                return 404, ''
+            if invoice['closed']:
+                return 403, 'Invoice already paid'
+            subscriber = subscribers[invoice['customer_id']]
+            state.change_plan(subscriber, invoice['plan_id'])
+            state.add_transaction(subscriber, invoice['amount'])
+            invoice['closed'] = True
+            return 200, _render('invoice', invoice)
+        if path[0] == 'subscribers' and len(path) >= 2:
+            try:
+                subscriber = subscribers[int(path[1])]
+            except (ValueError, KeyError):
+                return 404, ''
+            action = path[2:]
+            if not action:
+                if method == 'GET':
+                    return 200, _render('subscriber', subscriber)
+                if method == 'PUT':
+                    for element in ET.fromstring(body):
+                        subscriber[element.tag.replace('-', '_')] = \
+                                element.text
+                    return 200, ''
+                if method == 'DELETE':
+                    del subscribers[subscriber['customer_id']]
+                    return 200, ''
+            if action == ['subscribe_to_free_trial'] and method == 'POST':
+                plan_id = int(ET.fromstring(body).findtext('id'))
+                if plan_id not in state.plans:
+                    return 404, ''
+                state.change_plan(subscriber, plan_id, trial=True)
+                return 200, _render('subscriber', subscriber)
+            if action == ['change_subscription_plan'] and method == 'PUT':
+                plan_id = int(ET.fromstring(body).findtext('id'))
+                if plan_id not in state.plans:
+                    return 404, ''
+                if not subscriber['active']:
+                    return 422, 'Subscriber must be active to change plans'
+                state.change_plan(subscriber, plan_id)
+                return 200, _render('subscriber', subscriber)
+            if action == ['allow_free_trial'] and method == 'POST':
+                return 200, _render('subscriber', subscriber)
+            if action == ['fees'] and method == 'POST':
+                if subscriber['on_trial'] or not subscriber['active']:
+                    return 422, 'Subscriber cannot be charged fees'
+                return 201, ''
+            if action in (['complimentary_subscriptions'],
+                    ['complimentary_time_extensions']) and method == 'POST':
+                subscriber['active'] = True
+                return 201, _render('subscriber', subscriber)
+        return 404, ''
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StubServer(object):
+    """
+    .. py:class:: StubServer([port=0, latency=None, compress=True])
+    Serve the stand-in api on localhost in a background thread.
+
+    :param port: port to listen on, default any free port
+    :param latency: function returning the seconds to wait before
+        answering each request, eg - `lambda: random.expovariate(50)`
+    :param compress: gzip responses for clients accepting it.  gzip request
+        bodies are always accepted.
+    """
+
+    def __init__(self, port=0, latency=None, compress=True):
+        self.server = _Server(('127.0.0.1', port), _Handler)
+        self.server.state = SiteState()
+        self.server.latency = latency
+        self.server.compress = compress
+        self.server.requests = 0
+        self.server.bytes_sent = 0
+        self.server.bytes_received = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        """base host to pass to :py:class:`pyspreedly.api.Client`"""
+        return 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def requests(self):
+        """number of api requests answered"""
+        return self.server.requests
+
+    @property
+    def bytes_sent(self):
+        """response body bytes sent, after compression"""
+        return self.server.bytes_sent
+
+    @property
+    def bytes_received(self):
+        """request body bytes received, before decompression"""
+        return self.server.bytes_received
+
+    def add_subscribers(self, count, start=1, active=False):
+        """ .. py:method:: add_subscribers(count[, start=1, active=False])
+        Create `count` subscribers with consecutive customer ids, half of
+        them (the odd ids) subscribed to a plan.
+
+        :param active: make the other half active too, as with a
+            complimentary subscription, so they can change plans
+        """
+        state = self.state
+        with state.lock:
+            for customer_id in xrange(start, start + count):
+                subscriber = state.subscriber(customer_id)
+                if customer_id % 2:
+                    state.change_plan(subscriber, 1 + customer_id % 2)
+                elif active:
+                    subscriber['active'] = True
+                state.subscribers[customer_id] = subscriber
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -4,6 +4,7 @@ import unittest
 import requests
 from urlparse import urljoin
 from pyspreedly.api import Client
+from pyspreedly.seeding import Seeder
 from . site_conf import SPREEDLY_AUTH_TOKEN, SPREEDLY_SITE_NAME
 from pprint import pprint
 
@@ -14,14 +15,19 @@ from pprint import pprint
 
 class  SpreedlyTests(unittest.TestCase):
     def setUp(self):
-        self.sclient = Client(SPREEDLY_AUTH_TOKEN, SPREEDLY_SITE_NAME)
+        self.session = requests.Session()
+        self.sclient = Client(SPREEDLY_AUTH_TOKEN, SPREEDLY_SITE_NAME,
+                session=self.session)
 
-        # Remove all subscribers
-        self.sclient.cleanup()
+        # Customer ids of this run only, so concurrent runs don't delete
+        # each other's subscribers
+        self.seeder = Seeder(self.sclient)
+        self.customer_id, self.customer_id2 = self.seeder.reserve(2)
 
     def tearDown(self):
-        # Remove all subscribers
-        self.sclient.cleanup()
+        # Remove this run's subscribers
+        self.seeder.teardown()
+        self.session.close()
 
     def test_get_plans(self):
         #TODO add standard set of plans to ensure you get them all.
@@ -101,27 +107,28 @@ class  SpreedlyTests(unittest.TestCase):
             'payment_account_display',
             ])
 
-        subscriber = self.sclient.create_subscriber(1, 'test')
+        subscriber = self.sclient.create_subscriber(self.customer_id, 'test')
         print 'create_subscriber'
         pprint(subscriber)
         self.assertEquals(set(subscriber.keys()), keys)
-        self.assertEquals(subscriber['customer_id'], 1)
+        self.assertEquals(subscriber['customer_id'], self.customer_id)
 
-    def test_cleanup(self):
-        """make sure that cleanup works, or all of this will be off"""
-        subscriber = self.sclient.create_subscriber(1, 'test')
-        subscriber2 = self.sclient.create_subscriber(2, 'test2')
-        self.assertEquals(subscriber['customer_id'], 1)
-        self.assertEquals(subscriber2['customer_id'], 2)
-        self.sclient.cleanup()
+    def test_teardown(self):
+        """make sure that teardown works, or all of this will be off"""
+        subscriber = self.sclient.create_subscriber(self.customer_id, 'test')
+        subscriber2 = self.sclient.create_subscriber(self.customer_id2,
+                'test2')
+        self.assertEquals(subscriber['customer_id'], self.customer_id)
+        self.assertEquals(subscriber2['customer_id'], self.customer_id2)
+        self.seeder.teardown()
         try:
-            subscriber = self.sclient.get_info(1)
+            subscriber = self.sclient.get_info(self.customer_id)
             raise AssertionError("Subscriber 1 should not exist")
         except requests.HTTPError as e:
             self.assertEquals(e.code, 404)
         try:
-            subscriber2 = self.sclient.get_info(2)
-            raise AssertionError("Subscriber 1 should not exist")
+            subscriber2 = self.sclient.get_info(self.customer_id2)
+            raise AssertionError("Subscriber 2 should not exist")
         except requests.HTTPError as e:
             self.assertEquals(e.code, 404)
 
@@ -165,20 +172,21 @@ class  SpreedlyTests(unittest.TestCase):
             ])
 
         # Create a subscriber first
-        subscriber = self.sclient.create_subscriber(1, 'test')
+        subscriber = self.sclient.create_subscriber(self.customer_id, 'test')
         print 'subscribe'
         pprint(subscriber)
 
         # Subscribe to a free trial
-        subscription = self.sclient.subscribe(1, 21431)
+        subscription = self.sclient.subscribe(self.customer_id, 21431)
         self.assertEquals(set(subscriber.keys()), keys)
         self.assertTrue(subscription['on_trial'])
 
     def test_delete_subscriber(self):
-        subscriber = self.sclient.create_subscriber(1, 'test')
-        self.failUnlessEqual(self.sclient.delete_subscriber(1), 200)
+        subscriber = self.sclient.create_subscriber(self.customer_id, 'test')
+        self.failUnlessEqual(
+                self.sclient.delete_subscriber(self.customer_id), 200)
         try:
-            self.sclient.get_info(1)
+            self.sclient.get_info(self.customer_id)
             raise AssertionError("Subscriber should have been deleted")
         except requests.HTTPError as e:
             self.assertEquals(e.code, 404)
@@ -223,15 +231,16 @@ class  SpreedlyTests(unittest.TestCase):
             'payment_account_display',
             ])
 
-        self.sclient.create_subscriber(1, 'test')
-        subscriber = self.sclient.get_info(1)
+        self.sclient.create_subscriber(self.customer_id, 'test')
+        subscriber = self.sclient.get_info(self.customer_id)
         self.assertEquals(set(subscriber.keys()), keys)
         self.assertEquals(subscriber['email'], None)
         self.assertEquals(subscriber['screen_name'], 'test')
 
 
-        self.sclient.set_info(1, email='jack@bauer.com', screen_name='jb')
-        subscriber = self.sclient.get_info(1)
+        self.sclient.set_info(self.customer_id, email='jack@bauer.com',
+                screen_name='jb')
+        subscriber = self.sclient.get_info(self.customer_id)
         self.assertEquals(subscriber['email'], 'jack@bauer.com')
         self.assertEquals(subscriber['screen_name'], 'jb')
 
@@ -288,27 +297,32 @@ class  SpreedlyTests(unittest.TestCase):
             'payment_account_display',
             ])
         #test non existent subscriber
-        result = self.sclient.get_or_create_subscriber(123, 'tester')
+        result = self.sclient.get_or_create_subscriber(self.customer_id,
+                'tester')
         self.assertTrue(set(result.keys()) == keys)
 
         self.maxDiff =None
         #assure that we won't overwrite existing subscriber
-        result2 = self.sclient.get_or_create_subscriber(123, 'tester2')
+        result2 = self.sclient.get_or_create_subscriber(self.customer_id,
+                'tester2')
         diffset = [k for k in result if result2[k] != result[k]]
         self.assertFalse(diffset)
 
 
     def test_comp_subscription(self):
-        result = self.sclient.get_or_create_subscriber(123, 'tester')
+        result = self.sclient.get_or_create_subscriber(self.customer_id,
+                'tester')
 
-        self.sclient.create_complimentary_subscription(123, 2, 'months', 'Pro')
+        self.sclient.create_complimentary_subscription(self.customer_id, 2,
+                'months', 'Pro')
         # Probelm with asserting comp details here - the assigned time
         # seems kinda fuzzy
 
     def test_add_fee(self):
         # trial user cannot have fees.
-        subscriber = self.sclient.get_or_create_subscriber(123, 'tester')
-        result = self.sclient.add_fee(subscriber_id=123,name='Test Fee', description='A Test Levy',
+        subscriber = self.sclient.get_or_create_subscriber(self.customer_id,
+                'tester')
+        result = self.sclient.add_fee(subscriber_id=self.customer_id,name='Test Fee', description='A Test Levy',
                 group='test fees', amount=24.0)
         self.assertEquals(result, 422)
 
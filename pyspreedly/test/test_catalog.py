@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import unittest
+from decimal import Decimal
+from pyspreedly.catalog import PlanCatalog
+
+
+def plan(id, feature_level, price, plan_type='regular', enabled=True):
+    return {'subscription_plan': {'id': id, 'feature_level': feature_level,
+        'price': price, 'plan_type': plan_type, 'enabled': enabled}}
+
+
+class PlanCatalogTests(unittest.TestCase):
+    def setUp(self):
+        self.catalog = PlanCatalog([
+            plan(1, 'pro', Decimal('20.0')),
+            plan(2, 'pro', Decimal('10.0')),
+            plan(3, 'basic', Decimal('0.0'), 'free_trial'),
+            plan(4, 'basic', None, enabled=False),
+            ])
+
+    def test_lookup(self):
+        self.assertEquals(len(self.catalog), 4)
+        self.assertEquals(self.catalog[2]['price'], Decimal('10.0'))
+        self.assertTrue(3 in self.catalog)
+        self.assertEquals(self.catalog.get(99), None)
+
+    def test_indexes(self):
+        self.assertEquals([p['id'] for p in
+            self.catalog.for_feature_level('pro')], [2, 1])
+        self.assertEquals([p['id'] for p in
+            self.catalog.for_plan_type('free_trial')], [3])
+        self.assertEquals([p['id'] for p in self.catalog.enabled(False)], [4])
+        self.assertEquals(self.catalog.for_feature_level('team'), ())
+
+    def test_price_order(self):
+        self.assertEquals([p['id'] for p in self.catalog.by_price],
+                [3, 2, 1, 4])
+        self.assertEquals(self.catalog.cheapest('pro')['id'], 2)
+        self.assertEquals(self.catalog.cheapest('basic')['id'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Client against the local stub server, without a spreedly account"""
+from __future__ import absolute_import
+import time
+import unittest
+from urllib import unquote
+from urlparse import urljoin
+from xml.etree import ElementTree as ET
+import requests
+from pyspreedly.api import Client
+from pyspreedly.dispatch import Dispatcher, lane, INTERACTIVE, BATCH
+from pyspreedly.deadline import deadline, DeadlineExceeded
+from pyspreedly.stub import StubServer
+
+
+class StubClientTests(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer().start()
+        self.server.add_subscribers(100)
+        self.session = requests.Session()
+        self.sclient = Client('token', 'site', session=self.session,
+                base_host=self.server.url)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def test_request_bodies(self):
+        sent = []
+        post = self.session.post
+
+        def capture(url, data=None, **kw):
+            sent.append(data)
+            return post(url, data=data, **kw)
+        self.session.post = capture
+        self.sclient.create_subscriber(177, ' ')
+        self.assertEquals(sent[-1], '<subscriber><customer-id>177'
+                '</customer-id><screen-name> </screen-name></subscriber>')
+        # bodies built by the caller reach the server unchanged
+        self.sclient.query('subscribers.xml', '<subscriber>\n <customer-id>'
+                '178</customer-id>\n <screen-name>  </screen-name>\n'
+                '</subscriber>', action='post')
+        subscribers = self.server.state.subscribers
+        self.assertEquals(subscribers[177]['screen_name'], ' ')
+        self.assertEquals(subscribers[178]['screen_name'], '  ')
+
+    def test_compressed_list(self):
+        subscribers = list(self.sclient.iter_subscribers())
+        self.assertEquals(len(subscribers), 100)
+        self.assertEquals(subscribers[0]['customer_id'], 1)
+        compressed = self.server.bytes_sent
+
+        self.sclient.compress = False
+        self.assertEquals(len(list(self.sclient.iter_subscribers())), 100)
+        self.assertTrue(self.server.bytes_sent - compressed > 5 * compressed)
+
+    def test_compressed_request(self):
+        self.sclient.compress_requests = True
+        name = 'x' * 2000
+        self.sclient.create_subscriber(1000, name)
+        self.assertTrue(self.server.bytes_received < 500)
+        self.assertEquals(self.sclient.get_info(1000)['screen_name'], name)
+
+    def test_get_plans(self):
+        plans = self.sclient.get_plans()
+        self.assertEquals(len(plans), 3)
+        catalog = self.sclient.get_plan_catalog()
+        self.assertEquals(catalog.cheapest('pro')['name'], 'Trial')
+
+    def test_pay_invoice_non_ascii(self):
+        sent = []
+        put = self.session.put
+
+        def capture(url, data=None, **kw):
+            sent.append(data)
+            return put(url, data=data, **kw)
+        self.session.put = capture
+        invoice = self.sclient.create_invoice(5, 1)
+        paid = self.sclient.pay_invoice(invoice['token'], {
+            'number': 4222222222222, 'card_type': 'visa',
+            'verification_value': 123, 'month': 1, 'year': 2030,
+            'first_name': u'Jos\xe9',
+            'last_name': u'M\xfcller'.encode('utf-8')})
+        self.assertTrue(paid['closed'])
+        card = ET.fromstring(sent[-1]).find('credit-card')
+        self.assertEquals(card.findtext('first-name'), u'Jos\xe9')
+        self.assertEquals(card.findtext('last-name'), u'M\xfcller')
+        self.assertEquals(card.findtext('year'), '2030')
+
+
+    def test_prefetch_keeps_lane(self):
+        state = self.server.state
+        for i in range(120):
+            state.add_transaction(state.subscribers[1 + i % 100], 1)
+        self.sclient.dispatcher = Dispatcher()
+        with lane(BATCH):
+            self.assertEquals(len(list(self.sclient.iter_transactions())),
+                    120)
+        stats = self.sclient.dispatcher.stats()
+        self.assertEquals(stats[INTERACTIVE]['count'], 0)
+        self.assertTrue(stats[BATCH]['count'] >= 3)
+
+
+    def test_get_infos_keeps_lane_and_deadline(self):
+        self.sclient.dispatcher = Dispatcher()
+        with lane(BATCH):
+            results = self.sclient.get_infos(range(1, 21), concurrency=4)
+        # the lane is the one get_infos was called in
+        self.assertEquals(len([r for r in results if r[2] is None]), 20)
+        stats = self.sclient.dispatcher.stats()
+        self.assertEquals(stats[INTERACTIVE]['count'], 0)
+        self.assertEquals(stats[BATCH]['count'], 20)
+
+        with deadline(0.001):
+            time.sleep(0.01)
+            results = list(self.sclient.get_infos(range(1, 5), concurrency=4))
+        self.assertEquals(len([r for r in results
+            if isinstance(r[2], DeadlineExceeded)]), 4)
+
+
+
+def baseline_signup_url(client, subscriber_id, plan_id, screen_name,
+        token=None):
+    """get_signup_url as it was before the url templates, for comparison"""
+    subscriber_id = str(subscriber_id)
+    plan_id = str(plan_id)
+    if token:
+        url = '/'.join((client.site_name, 'subscribers', subscriber_id, token,
+            'subscribe', plan_id))
+    else:
+        url = '/'.join((client.site_name, 'subscribers', subscriber_id,
+            'subscribe', plan_id, screen_name))
+    return urljoin(client.base_host, url)
+
+
+class SignupUrlTests(unittest.TestCase):
+    TOKEN = 'd21de2b33ed811c1a040a507988241f550c45aee'
+
+    def setUp(self):
+        self.sclient = Client('token', 'site')
+
+    def test_same_as_before(self):
+        """Urls without characters to quote are unchanged"""
+        for row in [(44763, 41, 'screen-name-for-44763'),
+                (44763, 41, 'screen_name.1~'), (1, 2, 'x', self.TOKEN)]:
+            self.assertEquals(self.sclient.get_signup_url(*row),
+                    baseline_signup_url(self.sclient, *row))
+
+    def test_quoted(self):
+        """Reserved and non-ascii characters stay inside their segment"""
+        names = [u'a b/c?d#e&f=g', u'Jos\xe9 M\xfcller', u'50%+;,@:',
+                u'\u6771\u4eac']
+        for name in names:
+            url = self.sclient.get_signup_url(7, 41, name)
+            segments = url.split('/')
+            self.assertEquals(segments[-4:-1], ['7', 'subscribe', '41'])
+            self.assertEquals(unquote(segments[-1]).decode('utf-8'), name)
+            self.assertEquals(url[:-len(segments[-1])],
+                    baseline_signup_url(self.sclient, 7, 41, u''))
+        url = self.sclient.get_signup_url(7, 41, None, u'to ken/\xe9')
+        self.assertEquals(unquote(url.split('/')[-3]).decode('utf-8'),
+                u'to ken/\xe9')
+
+    def test_batch(self):
+        rows = [(1, 41, u'a b'), (2, 41, u'Jos\xe9', self.TOKEN),
+                (3, 42, 'plain')]
+        expected = [self.sclient.get_signup_url(*row) for row in rows]
+        self.assertEquals(list(self.sclient.get_signup_urls(iter(rows))),
+                expected)
+        columns = {'subscriber_id': [1, 2, 3], 'plan_id': [41, 41, 42],
+                'screen_name': [u'a b', u'Jos\xe9', 'plain'],
+                'token': [None, self.TOKEN, None]}
+        self.assertEquals(list(self.sclient.get_signup_urls(columns)),
+                expected)
+        columns.pop('token')
+        self.assertEquals(list(self.sclient.get_signup_urls(columns))[1],
+                self.sclient.get_signup_url(2, 41, u'Jos\xe9'))
+
+
+if __name__ == '__main__':
+    unittest.main()
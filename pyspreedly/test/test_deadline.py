@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import time
+import threading
+import unittest
+import requests
+from pyspreedly.api import Client
+from pyspreedly.deadline import (Deadline, DeadlineExceeded, deadline,
+        current_deadline, as_deadline)
+from pyspreedly.dispatch import Dispatcher, FairScheduler, TokenBucket
+from pyspreedly.stub import StubServer
+
+
+class DeadlineTests(unittest.TestCase):
+    def test_nesting(self):
+        self.assertEquals(current_deadline(), None)
+        self.assertEquals(as_deadline(None), None)
+        with deadline(10) as outer:
+            with deadline(60):
+                self.assertTrue(current_deadline() is outer)
+                self.assertTrue(as_deadline(30) is outer)
+            with deadline(1) as inner:
+                self.assertTrue(current_deadline() is inner)
+            self.assertTrue(as_deadline(0.5).remaining() < 1)
+        self.assertEquals(current_deadline(), None)
+
+    def test_expired(self):
+        expired = Deadline(-1)
+        self.assertRaises(DeadlineExceeded, expired.check)
+        self.assertTrue(isinstance(DeadlineExceeded(), requests.Timeout))
+        self.assertEquals(Deadline(10).timeout(2), 2)
+
+    def test_token_bucket_fails_fast(self):
+        bucket = TokenBucket(1, burst=1)
+        bucket.acquire()
+        start = time.time()
+        self.assertRaises(DeadlineExceeded, bucket.acquire, Deadline(0.5))
+        self.assertTrue(time.time() - start < 0.1)
+
+    def test_scheduler_withdraws(self):
+        scheduler = FairScheduler(1)
+        scheduler.acquire('a')
+        self.assertRaises(DeadlineExceeded, scheduler.acquire, 'b',
+                deadline=Deadline(0.05))
+        granted = []
+        waiter = threading.Thread(target=lambda: granted.append(
+            scheduler.acquire('c')))
+        waiter.start()
+        time.sleep(0.02)
+        scheduler.release('a')
+        waiter.join(1)
+        self.assertEquals(len(granted), 1)
+
+
+class StubDeadlineTests(unittest.TestCase):
+    def setUp(self):
+        self.delay = 0
+        self.server = StubServer(latency=lambda: self.delay).start()
+        self.server.add_subscribers(5)
+        self.session = requests.Session()
+        self.sclient = Client('token', 'site', session=self.session,
+                base_host=self.server.url)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def test_timeout(self):
+        self.delay = 0.5
+        start = time.time()
+        self.assertRaises(DeadlineExceeded, self.sclient.get_info, 1,
+                deadline=0.1)
+        self.assertTrue(time.time() - start < 0.3)
+
+    def test_fallback_shares_budget(self):
+        """create_subscriber only gets what get_info left over"""
+        self.delay = 0.15
+        start = time.time()
+        with deadline(0.25):
+            self.assertRaises(DeadlineExceeded,
+                    self.sclient.get_or_create_subscriber, 99, 'new')
+        self.assertTrue(time.time() - start < 0.35)
+
+        self.delay = 0
+        self.assertEquals(self.sclient.get_or_create_subscriber(
+            98, 'new', deadline=5)['customer_id'], 98)
+
+    def test_spent_budget_sends_nothing(self):
+        self.assertRaises(DeadlineExceeded, self.sclient.get_info, 1,
+                deadline=Deadline(-1))
+        self.assertEquals(self.server.requests, 0)
+
+    def test_dispatcher(self):
+        self.sclient.dispatcher = Dispatcher(slots=1)
+        self.sclient.dispatcher.set_budget('site', rate=1)
+        self.sclient.get_info(1, deadline=1)
+        start = time.time()
+        self.assertRaises(DeadlineExceeded, self.sclient.get_info, 2,
+                deadline=0.5)
+        self.assertTrue(time.time() - start < 0.1)
+        self.assertEquals(self.server.requests, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import time
+import threading
+import unittest
+from pyspreedly.dispatch import (TokenBucket, FairScheduler, Dispatcher,
+        lane, INTERACTIVE, BATCH)
+from pyspreedly.deadline import Deadline, DeadlineExceeded
+
+
+class DispatchTests(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(100, burst=1)
+        start = time.time()
+        for i in range(6):
+            bucket.acquire()
+        self.assertTrue(time.time() - start >= 0.04)
+
+    def test_token_bucket_fractional_rate(self):
+        """Rates below one per second still hand out a whole token"""
+        bucket = TokenBucket(0.5)
+        self.assertEquals(bucket.acquire(), 0.0)
+        # the next token is two seconds away
+        self.assertRaises(DeadlineExceeded, bucket.acquire, Deadline(0.1))
+
+    def test_fair_scheduler_round_robin(self):
+        """A site with a long queue shouldn't starve the other sites"""
+        scheduler = FairScheduler(1)
+        scheduler.acquire('noisy')
+        granted = []
+
+        def wait(key):
+            scheduler.acquire(key)
+            granted.append(key)
+
+        threads = []
+        for key in ['noisy'] * 5 + ['quiet']:
+            t = threading.Thread(target=wait, args=(key,))
+            t.start()
+            threads.append(t)
+            time.sleep(0.01)
+        for key in ['noisy'] * 6:
+            scheduler.release(key)
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+        self.assertEquals(granted[:2], ['noisy', 'quiet'])
+
+    def test_site_concurrency(self):
+        dispatcher = Dispatcher(slots=10)
+        dispatcher.set_budget('site', concurrency=2)
+        state = {'running': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def send():
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.01)
+            with lock:
+                state['running'] -= 1
+
+        threads = [threading.Thread(target=dispatcher.dispatch,
+            args=('site', send)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals(state['peak'], 2)
+
+    def test_interactive_first(self):
+        """Queued interactive calls are served before queued batch calls"""
+        dispatcher = Dispatcher(slots=1)
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def hold():
+            started.set()
+            release.wait()
+
+        def call(name):
+            with lane(name):
+                dispatcher.dispatch('site', lambda: order.append(name))
+
+        holder = threading.Thread(target=dispatcher.dispatch,
+                args=('site', hold))
+        holder.start()
+        started.wait()
+        threads = []
+        for name in [BATCH, BATCH, INTERACTIVE]:
+            t = threading.Thread(target=call, args=(name,))
+            t.start()
+            threads.append(t)
+            time.sleep(0.01)
+        release.set()
+        for t in [holder] + threads:
+            t.join()
+        self.assertEquals(order, [INTERACTIVE, BATCH, BATCH])
+        stats = dispatcher.stats()
+        self.assertEquals(stats[BATCH]['count'], 2)
+        self.assertTrue(stats[BATCH]['max'] > 0)
+
+
+    def test_interactive_rate_first(self):
+        """An interactive call gets the site's next token, ahead of batch"""
+        dispatcher = Dispatcher(slots=50)
+        dispatcher.set_budget('site', rate=10)
+
+        def call(name):
+            with lane(name):
+                dispatcher.dispatch('site', lambda: None)
+
+        # ten go on the burst, the other ten queue for a second
+        threads = [threading.Thread(target=call, args=(BATCH,))
+                for i in range(20)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        start = time.time()
+        call(INTERACTIVE)
+        self.assertTrue(time.time() - start < 0.3)
+        for t in threads:
+            t.join()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+import pytz
+from pyspreedly.entitlements import build_entitlements, EntitlementTable
+
+
+def subscriber(customer_id, active=True, level='pro', until=None):
+    return {'customer_id': customer_id, 'active': active,
+            'feature_level': level, 'active_until': until}
+
+
+class EntitlementTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'entitlements')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_lookup(self):
+        past = datetime(2012, 1, 1, tzinfo=pytz.utc)
+        future = datetime(2100, 1, 1, tzinfo=pytz.utc)
+        count = build_entitlements([
+            subscriber(30, level=u'basic'),
+            subscriber(10, until=future),
+            subscriber(20, until=past),
+            subscriber(40, active=False, level=None),
+            ], self.path)
+        self.assertEquals(count, 4)
+        table = EntitlementTable(self.path)
+        self.assertEquals(len(table), 4)
+        self.assertEquals(table.get(10), (True, 'pro', 4102444800))
+        self.assertEquals(table.get(40), (False, '', 0))
+        self.assertEquals(table.get(15), None)
+        self.assertEquals(table.feature_level(30), 'basic')
+        self.assertTrue(table.is_active(10))
+        self.assertTrue(table.is_active(30))
+        self.assertFalse(table.is_active(20))
+        self.assertFalse(table.is_active(40))
+        self.assertFalse(table.is_active(99))
+
+    def test_swap(self):
+        build_entitlements([subscriber(1)], self.path)
+        table = EntitlementTable(self.path, check_interval=None)
+        build_entitlements([subscriber(1, level='team'), subscriber(2)],
+                self.path)
+        self.assertEquals(table.feature_level(1), 'pro')
+        self.assertTrue(table.reload())
+        self.assertEquals(table.feature_level(1), 'team')
+        self.assertEquals(len(table), 2)
+        self.assertFalse(table.reload())
+        self.assertEquals(os.listdir(self.dir), ['entitlements'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import unittest
+from pyspreedly.objectify import objectify_spreedly, ET
+from pyspreedly.executor import ParseExecutor
+from pyspreedly.test.test_export import TRANSACTIONS
+
+
+class ParseExecutorTests(unittest.TestCase):
+    def test_same_result(self):
+        executor = ParseExecutor(processes=1, threshold=len(TRANSACTIONS))
+        try:
+            self.assertEquals(executor.parse(TRANSACTIONS + ' '),
+                    objectify_spreedly(TRANSACTIONS))
+            self.assertTrue(executor._pool is not None)
+            self.assertRaises(ET.ParseError, executor.parse,
+                    TRANSACTIONS[:-1] + ' ')
+        finally:
+            executor.close()
+
+    def test_small_inline(self):
+        executor = ParseExecutor()
+        self.assertEquals(len(executor.parse(TRANSACTIONS)), 2)
+        self.assertTrue(executor._pool is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+from pyspreedly.objectify import iterparse_spreedly
+from pyspreedly.export import (export, flatten, JSONLWriter, CSVWriter,
+        ColumnarWriter)
+
+
+TRANSACTIONS = """<transactions type="array">
+<transaction>
+    <amount type="decimal">24.0</amount>
+    <created-at type="datetime">2009-09-26T03:06:30Z</created-at>
+    <currency-code>USD</currency-code>
+    <id type="integer">20</id>
+    <subscriber-customer-id>39053</subscriber-customer-id>
+    <detail>
+        <payment-method>visa</payment-method>
+        <recurring type="boolean">false</recurring>
+    </detail>
+</transaction>
+<transaction>
+    <amount type="decimal">12.5</amount>
+    <created-at type="datetime">2009-09-27T03:06:30Z</created-at>
+    <currency-code>EUR</currency-code>
+    <id type="integer">21</id>
+    <subscriber-customer-id>39054</subscriber-customer-id>
+    <detail>
+        <payment-method>mastercard</payment-method>
+        <recurring type="boolean">true</recurring>
+    </detail>
+</transaction>
+</transactions>"""
+
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_flatten(self):
+        record = next(iterparse_spreedly(TRANSACTIONS))
+        self.assertEquals(flatten(record), {
+            'amount': '24.0',
+            'created_at': '2009-09-26T03:06:30Z',
+            'currency_code': 'USD',
+            'id': 20,
+            'subscriber_customer_id': '39053',
+            'detail_payment_method': 'visa',
+            'detail_recurring': False,
+            })
+
+    def test_jsonl_chunks(self):
+        path = os.path.join(self.dir, 'tx-{chunk}.jsonl')
+        with JSONLWriter(path, chunk_size=1) as writer:
+            self.assertEquals(export(iterparse_spreedly(TRANSACTIONS),
+                writer), 2)
+        self.assertEquals(len(writer.paths), 2)
+        with open(writer.paths[1]) as f:
+            record = json.loads(f.readline())
+        self.assertEquals(record['amount'], '12.5')
+        self.assertEquals(record['detail']['payment_method'], 'mastercard')
+
+    def test_csv(self):
+        path = os.path.join(self.dir, 'tx.csv')
+        with CSVWriter(path) as writer:
+            export(iterparse_spreedly(TRANSACTIONS), writer)
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEquals([r['currency_code'] for r in rows], ['USD', 'EUR'])
+        self.assertEquals(rows[1]['detail_recurring'], 'True')
+
+    def test_csv_new_columns(self):
+        """Columns first seen after the header are an error, not lost"""
+        path = os.path.join(self.dir, 'mixed.csv')
+        records = [{'id': 1}, {'id': 2, 'detail': {'gateway': 'test'}}]
+        with CSVWriter(path) as writer:
+            self.assertRaises(ValueError, export, records, writer)
+        with CSVWriter(path, fields=['id', 'detail_gateway']) as writer:
+            export(records, writer)
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEquals([r['detail_gateway'] for r in rows], ['', 'test'])
+        with CSVWriter(path, extrasaction='ignore') as writer:
+            export(records, writer)
+        with open(path) as f:
+            self.assertEquals(f.readline().strip(), 'id')
+
+    def test_columnar(self):
+        path = os.path.join(self.dir, 'tx.json')
+        with ColumnarWriter(path) as writer:
+            export(iterparse_spreedly(TRANSACTIONS), writer)
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEquals(data['count'], 2)
+        self.assertEquals(data['columns']['id'], [20, 21])
+
+
+if __name__ == '__main__':
+    unittest.main()
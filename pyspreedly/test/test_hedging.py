@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import time
+import itertools
+import threading
+import unittest
+import requests
+from requests.adapters import HTTPAdapter
+from pyspreedly.api import Client
+from pyspreedly.dispatch import lane, current_lane, BATCH
+from pyspreedly.hedging import HedgePolicy
+from pyspreedly.stub import StubServer
+
+
+class HedgePolicyTests(unittest.TestCase):
+    def test_delay(self):
+        policy = HedgePolicy(percentile=90, warmup=10, min_delay=0.002)
+        self.assertEquals(policy.delay(), None)
+        for i in range(100):
+            policy.record(i / 1000.0)
+        self.assertEquals(policy.delay(), 0.09)
+        self.assertEquals(HedgePolicy(delay=0.5).delay(), 0.5)
+
+    def test_budget(self):
+        policy = HedgePolicy(delay=0.01, budget=0.5, burst=1)
+        slow = lambda: time.sleep(0.05) or 'slow'
+        results = [policy.run(slow) for i in range(4)]
+        self.assertEquals(results, ['slow'] * 4)
+        stats = policy.stats()
+        # one saved up hedge, then one for every second call
+        self.assertEquals(stats['hedges_sent'], 2)
+        self.assertEquals(stats['hedges_denied'], 2)
+
+    def test_errors(self):
+        policy = HedgePolicy(delay=1)
+
+        def fail():
+            raise ValueError()
+        start = time.time()
+        self.assertRaises(ValueError, policy.run, fail)
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEquals(policy.stats()['hedges_sent'], 0)
+
+        # a failed first attempt is covered by a successful hedge
+        attempts = itertools.count()
+        def flaky():
+            if next(attempts) == 0:
+                time.sleep(0.05)
+                raise ValueError()
+            return 'ok'
+        policy = HedgePolicy(delay=0.01)
+        self.assertEquals(policy.run(flaky), 'ok')
+
+    def test_keeps_lane(self):
+        lanes = []
+        policy = HedgePolicy(delay=0.01)
+        with lane(BATCH):
+            policy.run(lambda: lanes.append(current_lane())
+                    or time.sleep(0.05))
+        time.sleep(0.1)
+        self.assertEquals(lanes, [BATCH, BATCH])
+
+
+class StubHedgingTests(unittest.TestCase):
+    def test_slow_response(self):
+        """The hedge answers while the first request is stuck"""
+        delays = itertools.chain([0.5], itertools.repeat(0))
+        lock = threading.Lock()
+
+        def latency():
+            with lock:
+                return next(delays)
+        with StubServer(latency=latency) as server:
+            server.add_subscribers(3)
+            session = requests.Session()
+            session.mount(server.url, HTTPAdapter(pool_maxsize=4))
+            policy = HedgePolicy(delay=0.05)
+            client = Client('token', 'site', session=session,
+                    base_host=server.url, hedge=policy)
+            start = time.time()
+            self.assertEquals(client.get_info(2)['customer_id'], 2)
+            self.assertTrue(time.time() - start < 0.3)
+            self.assertEquals(len(client.get_plans()), 3)
+            stats = policy.stats()
+            self.assertEquals((stats['hedges_sent'], stats['hedges_won']),
+                    (1, 1))
+            session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import requests
+from pyspreedly.api import Client
+from pyspreedly.dispatch import Dispatcher, lane, INTERACTIVE, BATCH
+from pyspreedly.invoicing import InvoicePipeline
+from pyspreedly.stub import StubServer
+
+
+class FakeClient(object):
+    """Stands in for Client, failing to pay the subscribers in `declined`"""
+
+    def __init__(self, declined=()):
+        self.declined = set(declined)
+        self.created = []
+        self._lock = threading.Lock()
+
+    def create_invoice(self, subscriber_id, plan_id, screen_name=None,
+            email=None):
+        with self._lock:
+            self.created.append(subscriber_id)
+        return {'token': 'invoice-{0}'.format(subscriber_id)}
+
+    def pay_invoice(self, token, credit_card=None):
+        if int(token.split('-')[1]) in self.declined:
+            raise requests.HTTPError('status code: 403')
+        return {'token': token, 'closed': True}
+
+
+class InvoicePipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'checkpoint')
+        self.orders = [{'subscriber_id': i, 'plan_id': 1} for i in range(20)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_resume(self):
+        client = FakeClient(declined=[3, 7])
+        pipeline = InvoicePipeline(client, self.path, concurrency=4)
+        results = dict((r.order['subscriber_id'], r)
+                for r in pipeline.run(self.orders))
+        pipeline.checkpoint.close()
+        self.assertEquals(len(results), 20)
+        self.assertEquals(results[3].state, 'failed')
+        self.assertEquals(results[4].invoice['token'], 'invoice-4')
+        self.assertEquals(pipeline.stats['paid'], 18)
+
+        client = FakeClient()
+        pipeline = InvoicePipeline(client, self.path, concurrency=4)
+        states = dict((r.order['subscriber_id'], r.state)
+                for r in pipeline.run(self.orders))
+        pipeline.checkpoint.close()
+        self.assertEquals(states[3], 'paid')
+        self.assertEquals(states[4], 'skipped')
+        # declined invoices are paid again rather than created again
+        self.assertEquals(client.created, [])
+
+    def test_lane(self):
+        with StubServer() as server:
+            server.add_subscribers(4)
+            session = requests.Session()
+            client = Client('token', 'site', session=session,
+                    base_host=server.url, dispatcher=Dispatcher())
+            pipeline = InvoicePipeline(client, concurrency=2)
+            with lane(BATCH):
+                results = pipeline.run(self.orders[1:5])
+            self.assertEquals([r.error for r in results], [None] * 4)
+            session.close()
+        stats = client.dispatcher.stats()
+        self.assertEquals(stats[INTERACTIVE]['count'], 0)
+        self.assertEquals(stats[BATCH]['count'], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import requests
+from pyspreedly.loadgen import LoadGenerator, _TimedClient, parse_mix, main
+from pyspreedly.stub import StubServer
+
+
+class LoadGeneratorTests(unittest.TestCase):
+    def test_parse_mix(self):
+        self.assertEquals(parse_mix('get_info=3, add_fee'),
+                {'get_info': 3.0, 'add_fee': 1.0})
+        self.assertRaises(ValueError, parse_mix, 'get_plans=1')
+        self.assertRaises(ValueError, parse_mix, 'get_info=0')
+
+    def test_run(self):
+        with StubServer() as server:
+            server.add_subscribers(20)
+            session = requests.Session()
+            client = _TimedClient('token', 'site', session=session,
+                    base_host=server.url)
+            generator = LoadGenerator(client, 20, parse_mix(
+                'get_info=2,subscribe=1,add_fee=1'), concurrency=4)
+            report = generator.run(60)
+            session.close()
+        self.assertEquals(generator.plan_id, 3)
+        self.assertEquals(report['requests'], 60)
+        self.assertEquals(report['errors'], 0)
+        self.assertEquals(sum(op['requests']
+            for op in report['operations'].values()), 60)
+        self.assertTrue(report['time']['parse_seconds'] > 0)
+        self.assertTrue(0 < report['time']['parse_share_of_request_time']
+                <= 1)
+        self.assertTrue(report['p50_ms'] <= report['p99_ms'])
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'runs.jsonl')
+            for i in range(2):
+                self.assertEquals(main(['--requests', '20', '--subscribers',
+                    '10', '--rate', '200', '--plan-id', '3', '--output',
+                    path]), 0)
+            with open(path) as f:
+                reports = [json.loads(line) for line in f]
+            self.assertEquals([r['requests'] for r in reports], [20, 20])
+            self.assertEquals(reports[0]['url'], 'stub')
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import unittest
+from pyspreedly.manager import ClientManager
+
+
+class ClientManagerTests(unittest.TestCase):
+    def test_shared(self):
+        manager = ClientManager('token', max_connections=4)
+        first = manager.add_site('first')
+        second = manager['second']
+        self.assertTrue(manager.client('first') is first)
+        self.assertTrue(first.session is second.session)
+        self.assertTrue(first.session is manager.session)
+        self.assertTrue(first.dispatcher is second.dispatcher)
+        self.assertTrue(first.dispatcher is manager.dispatcher)
+        self.assertEquals(sorted(manager.sites()), ['first', 'second'])
+        manager.close()
+
+    def test_tokens(self):
+        manager = ClientManager()
+        self.assertRaises(ValueError, manager.add_site, 'site')
+        self.assertRaises(ValueError, manager.client, 'site')
+        self.assertEquals(manager.sites(), [])
+        self.assertEquals(manager.add_site('site', 'secret').auth, 'secret')
+        self.assertEquals(ClientManager('default')['other'].auth, 'default')
+
+    def test_partial_budget(self):
+        manager = ClientManager('token', rate=10, concurrency=2)
+        manager.add_site('fast', rate=50)
+        manager.add_site('narrow', concurrency=1)
+        fast = manager.dispatcher.budget('fast')
+        self.assertEquals(fast.bucket.rate, 50)
+        self.assertEquals(fast.concurrency, 2)
+        narrow = manager.dispatcher.budget('narrow')
+        self.assertEquals(narrow.bucket.rate, 10)
+        self.assertEquals(narrow.concurrency, 1)
+        default = manager.dispatcher.budget(manager.add_site('other').site_name)
+        self.assertEquals(default.bucket.rate, 10)
+        self.assertEquals(default.concurrency, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
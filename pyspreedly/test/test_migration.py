@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+import requests
+from pyspreedly.api import Client
+from pyspreedly.checkpoint import Checkpoint
+from pyspreedly.migration import PlanMigration
+from pyspreedly.stub import StubServer
+
+
+class FailingClient(Client):
+    """Client whose plan changes fail for the ids in `failing`"""
+
+    def __init__(self, failing=(), *args, **kw):
+        super(FailingClient, self).__init__(*args, **kw)
+        self.failing = set(failing)
+        self.changed = []
+
+    def change_plan(self, subscriber_id, plan_id, deadline=None):
+        if subscriber_id in self.failing:
+            raise requests.HTTPError('status code: 422')
+        self.changed.append(subscriber_id)
+        return super(FailingClient, self).change_plan(subscriber_id, plan_id,
+                deadline)
+
+
+class PlanMigrationTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'checkpoint')
+        self.server = StubServer().start()
+        self.server.add_subscribers(30, active=True)
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+        shutil.rmtree(self.dir)
+
+    def client(self, failing=()):
+        return FailingClient(failing, 'token', 'site', session=self.session,
+                base_host=self.server.url)
+
+    def migrate(self, client, subscribers, **kw):
+        migration = PlanMigration(client, 2, self.path, concurrency=4, **kw)
+        results = dict((r.subscriber_id, r)
+                for r in migration.run(subscribers))
+        migration.checkpoint.close()
+        return migration, results
+
+    def test_resume(self):
+        ids = range(1, 31)
+        migration, results = self.migrate(self.client(failing=[3, 7]), ids,
+                rate=500)
+        self.assertEquals(len(results), 30)
+        self.assertEquals(results[3].state, 'failed')
+        self.assertEquals(results[3].stage, 'change')
+        self.assertEquals(results[4].state, 'verified')
+        self.assertEquals(migration.stats['verified'], 28)
+        self.assertEquals(migration.stats['failed'], 2)
+        self.assertEquals(self.server.state.subscribers[4][
+            'subscription_plan_name'], 'Pro')
+
+        client = self.client()
+        migration, results = self.migrate(client, ids)
+        self.assertEquals(sorted(client.changed), [3, 7])
+        self.assertEquals(results[4].state, 'skipped')
+        self.assertEquals(migration.stats['verified'], 2)
+
+    def test_verify_changed(self):
+        # killed after changing, before verifying
+        with Checkpoint(self.path) as checkpoint:
+            for id in (2, 4):
+                checkpoint.record(id, 'changed', plan_id=2)
+        client = self.client()
+        migration, results = self.migrate(client, [2, 4])
+        self.assertEquals(client.changed, [])
+        self.assertEquals(results[2].state, 'failed')
+        self.assertEquals(results[2].stage, 'verify')
+        self.assertEquals(migration.stats['failed'], 2)
+
+    def test_select(self):
+        client = self.client()
+        migration = PlanMigration(client, 2)
+        results = list(migration.run(migration.select(
+            lambda s: s['customer_id'] > 10)))
+        # even ids have no plan, odd ones are on Pro already
+        self.assertEquals(sorted(client.changed), range(12, 31, 2))
+        self.assertEquals(migration.stats['skipped'], 10)
+        self.assertEquals(len(results), 20)
+
+    def test_same_name(self):
+        # another plan called Pro, which the odd ids aren't on
+        self.server.state.plans[4] = dict(self.server.state.plans[2], id=4)
+        client = self.client()
+        migration = PlanMigration(client, 4)
+        results = list(migration.run(migration.select(
+            lambda s: s['customer_id'] <= 10)))
+        self.assertEquals(sorted(client.changed), range(1, 11))
+        self.assertEquals(migration.stats['verified'], 10)
+        self.assertEquals(self.server.state.subscribers[3][
+            'subscription_plan_version']['subscription_plan_id'], 4)
+
+        # killed after changing, and moved back to the other Pro since
+        self.server.state.change_plan(self.server.state.subscribers[1], 2)
+        with Checkpoint(self.path) as checkpoint:
+            checkpoint.record(1, 'changed', plan_id=4)
+        migration = PlanMigration(client, 4, self.path)
+        results = list(migration.run([1]))
+        migration.checkpoint.close()
+        self.assertEquals(results[0].state, 'failed')
+        self.assertEquals(results[0].stage, 'verify')
+
+    def test_unknown_plan(self):
+        client = self.client()
+        migration = PlanMigration(client, 99)
+        self.assertRaises(ValueError, list, migration.run([1, 2]))
+        self.assertEquals(client.changed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
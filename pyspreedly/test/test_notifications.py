@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import time
+import unittest
+import requests
+from pyspreedly.api import Client
+from pyspreedly.notifications import parse_notification, NotificationIngester
+
+
+class CountingClient(Client):
+    def __init__(self):
+        super(CountingClient, self).__init__('token', 'site')
+        self.fetched = []
+
+    def get_info(self, subscriber_id):
+        self.fetched.append(subscriber_id)
+        if subscriber_id in (404, 500) or \
+                subscriber_id == 503 and self.fetched.count(503) == 1:
+            e = requests.HTTPError()
+            e.code = min(subscriber_id, 500)
+            raise e
+        return {'customer_id': subscriber_id}
+
+
+class NotificationTests(unittest.TestCase):
+    def test_parse(self):
+        self.assertEquals(parse_notification('subscriber_ids=1,2,%203'),
+                [1, 2, 3])
+        self.assertEquals(parse_notification({'subscriber_ids': ['4,5']}),
+                [4, 5])
+        self.assertEquals(parse_notification(''), [])
+
+    def test_dedupe(self):
+        client = CountingClient()
+        ingester = NotificationIngester(client, window=60)
+        published = []
+        ingester.subscribe(lambda id, data: published.append(id))
+        self.assertEquals(ingester.ingest('subscriber_ids=1,2,1,404'), 3)
+        self.assertEquals(ingester.ingest('subscriber_ids=2,3'), 1)
+        self.assertEquals(ingester.flush(), 4)
+        self.assertEquals(sorted(client.fetched), [1, 2, 3, 404])
+        self.assertEquals(sorted(published), [1, 2, 3])
+        self.assertEquals(ingester.stats['failed'], 1)
+
+        # changes inside the window are held back, once
+        ingester.ingest('subscriber_ids=1,1,1')
+        self.assertEquals(ingester.flush(), 0)
+        self.assertEquals(ingester.flush(everything=True), 1)
+        self.assertEquals(ingester.stats['duplicates'], 5)
+
+    def test_retry(self):
+        client = CountingClient()
+        ingester = NotificationIngester(client, retries=2, backoff=0.01)
+        published = []
+        ingester.subscribe(lambda id, data: published.append(id))
+        ingester.ingest('subscriber_ids=503,500,404')
+        self.assertEquals(ingester.flush(), 3)
+        self.assertEquals(published, [])
+        # the failed ones wait for the backoff, the missing one is dropped
+        self.assertEquals(ingester.flush(), 0)
+        time.sleep(0.02)
+        self.assertEquals(ingester.flush(), 2)
+        self.assertEquals(published, [503])
+        time.sleep(0.04)
+        self.assertEquals(ingester.flush(), 1)
+        self.assertEquals(ingester.flush(everything=True), 0)
+        self.assertEquals(client.fetched.count(500), 3)
+        self.assertEquals(ingester.stats['failed'], 5)
+        self.assertEquals(ingester.stats['dropped'], 2)
+
+        # fetched after the retry, so the window starts then
+        ingester.ingest('subscriber_ids=503')
+        self.assertEquals(ingester.flush(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Every parser backend has to give the same data for the same xml"""
+from __future__ import absolute_import
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from StringIO import StringIO
+import pytz
+from pyspreedly.objectify import (objectify_spreedly, iterparse_spreedly,
+        available_backends, get_backend, set_backend, fastest_backend,
+        ValueInterner, ET)
+
+
+SUBSCRIBER = u'''<?xml version="1.0" encoding="UTF-8"?>
+<subscriber>
+  <active type="boolean">true</active>
+  <on-trial type="boolean">false</on-trial>
+  <active-until type="datetime">2009-12-26T04:06:30Z</active-until>
+  <card-expires-before-next-auto-renew type="boolean" nil="true"></card-expires-before-next-auto-renew>
+  <customer-id>39053</customer-id>
+  <email nil="true"></email>
+  <grace-until type="datetime" nil="true"></grace-until>
+  <lifetime-subscription type="boolean">false</lifetime-subscription>
+  <screen-name>Zoë &amp; co</screen-name>
+  <store-credit type="decimal">12.50</store-credit>
+  <store-credit-currency-code>USD</store-credit-currency-code>
+  <token>6af9994a57e420345897b1abb4c27a9db27fa4d0</token>
+  <notes type="text">  leading and trailing  </notes>
+  <empty></empty>
+  <subscription-plan-version>
+    <id type="integer">9</id>
+    <amount type="decimal">24.0</amount>
+    <feature-level type="string">pro</feature-level>
+  </subscription-plan-version>
+  <invoices type="array">
+    <invoice>
+      <id type="integer">64</id>
+      <line-items type="array">
+        <line-item>
+          <amount type="decimal">24.00</amount>
+        </line-item>
+      </line-items>
+    </invoice>
+    <invoice>
+      <id type="integer">65</id>
+      <line-items type="array"/>
+    </invoice>
+  </invoices>
+  <features type="array">
+  </features>
+</subscriber>'''
+
+EXPECTED = {
+    'active': True,
+    'on_trial': False,
+    'active_until': datetime(2009, 12, 26, 4, 6, 30, tzinfo=pytz.utc),
+    'card_expires_before_next_auto_renew': None,
+    'customer_id': 39053,
+    'email': None,
+    'grace_until': None,
+    'lifetime_subscription': False,
+    'screen_name': u'Zoë & co',
+    'store_credit': Decimal('12.50'),
+    'store_credit_currency_code': 'USD',
+    'token': '6af9994a57e420345897b1abb4c27a9db27fa4d0',
+    'notes': '  leading and trailing  ',
+    'empty': None,
+    'subscription_plan_version': {
+        'id': 9, 'amount': Decimal('24.0'), 'feature_level': 'pro'},
+    'invoices': [
+        {'invoice': {'id': 64, 'line_items': [
+            {'line_item': {'amount': Decimal('24.00')}}]}},
+        {'invoice': {'id': 65, 'line_items': []}},
+        ],
+    'features': [],
+    }
+
+LIST = '''<subscribers type="array">
+  <subscriber><customer-id>1</customer-id><active type="boolean">true</active></subscriber>
+  <subscriber><customer-id>2</customer-id><active type="boolean">false</active></subscriber>
+  <subscriber><customer-id>3</customer-id><active type="boolean" nil="true"/></subscriber>
+</subscribers>'''
+
+
+class BackendConformanceTests(unittest.TestCase):
+    def backends(self):
+        names = available_backends()
+        self.assertTrue('etree' in names and 'expat' in names)
+        return names
+
+    def test_types(self):
+        for name in self.backends():
+            data = objectify_spreedly(SUBSCRIBER, backend=name)
+            self.assertEquals(data, EXPECTED, name)
+            self.assertEquals(type(data['screen_name']), unicode)
+            self.assertEquals(type(data['store_credit_currency_code']), str)
+
+    def test_sources(self):
+        encoded = SUBSCRIBER.encode('utf-8')
+        for name in self.backends():
+            self.assertEquals(objectify_spreedly(encoded, name), EXPECTED)
+            self.assertEquals(objectify_spreedly(StringIO(encoded), name),
+                    EXPECTED)
+
+    def test_root_only(self):
+        for name in self.backends():
+            self.assertEquals(objectify_spreedly(
+                '<subscribers type="array"></subscribers>', name), [])
+            self.assertEquals(objectify_spreedly(
+                '<count type="integer">3</count>', name), 3)
+
+    def test_iterparse(self):
+        expected = [
+            {'customer_id': 1, 'active': True},
+            {'customer_id': 2, 'active': False},
+            {'customer_id': 3, 'active': None},
+            ]
+        for name in self.backends():
+            self.assertEquals(list(iterparse_spreedly(LIST, name)), expected)
+            self.assertEquals(list(iterparse_spreedly(StringIO(LIST), name)),
+                    expected)
+
+    def test_iterparse_chunks(self):
+        expat = get_backend('expat')
+        expat.chunk_size = 7
+        try:
+            self.assertEquals(list(expat.iterparse(SUBSCRIBER)),
+                    list(get_backend('etree').iterparse(SUBSCRIBER)))
+        finally:
+            del expat.chunk_size
+
+    def test_parse_error(self):
+        for name in self.backends():
+            self.assertRaises(ET.ParseError, objectify_spreedly,
+                    '<subscriber><id>1</subscriber>', name)
+            self.assertRaises(ET.ParseError, list,
+                    iterparse_spreedly('<subscribers><a></subscribers>', name))
+
+    def test_default(self):
+        self.assertRaises(KeyError, set_backend, 'nope')
+        set_backend('expat')
+        try:
+            self.assertEquals(objectify_spreedly(SUBSCRIBER), EXPECTED)
+            self.assertTrue(get_backend() is get_backend('expat'))
+        finally:
+            set_backend('etree')
+
+    def test_fastest(self):
+        timings = fastest_backend(SUBSCRIBER, repeat=1)
+        self.assertEquals(sorted(name for seconds, name in timings),
+                sorted(self.backends()))
+        self.assertEquals(timings, sorted(timings))
+
+
+class InternerTests(unittest.TestCase):
+    def test_same_data(self):
+        for name in available_backends():
+            interner = ValueInterner()
+            self.assertEquals(objectify_spreedly(SUBSCRIBER, name,
+                interner), EXPECTED)
+            self.assertEquals(list(iterparse_spreedly(LIST, name, interner)),
+                    list(iterparse_spreedly(LIST, name)))
+
+    def test_shared_between_parses(self):
+        for name in available_backends():
+            interner = ValueInterner()
+            first = objectify_spreedly(SUBSCRIBER, name, interner)
+            second = objectify_spreedly(SUBSCRIBER.encode('utf-8'), name,
+                    interner)
+            for key in ('store_credit_currency_code', 'store_credit',
+                    'active_until', 'screen_name'):
+                self.assertTrue(first[key] is second[key], (name, key))
+            plain = objectify_spreedly(SUBSCRIBER, name)
+            self.assertFalse(plain['store_credit'] is first['store_credit'])
+
+    def test_bounded(self):
+        interner = ValueInterner(size=2)
+        xml = '<s type="array">{0}</s>'.format(''.join(
+            '<a><token>t{0}</token><code>USD</code></a>'.format(i)
+            for i in range(10)))
+        records = objectify_spreedly(xml, interner=interner)
+        self.assertEquals([r['a']['token'] for r in records],
+                ['t{0}'.format(i) for i in range(10)])
+        self.assertEquals(interner.stats(), {('string', 'token'): 2,
+            ('string', 'code'): 1})
+        self.assertTrue(records[0]['a']['code'] is records[9]['a']['code'])
+
+
+if __name__ == '__main__':
+    unittest.main()
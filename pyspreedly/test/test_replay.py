@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree import ElementTree as ET
+import requests
+from pyspreedly.api import Client
+from pyspreedly.stub import StubServer
+from pyspreedly.replay import (load_recording, ReplayTransport, ReplayDriver,
+        REDACTED)
+
+
+class ReplayTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'trace.jsonl.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_record_and_replay(self):
+        with StubServer() as server:
+            server.add_subscribers(10)
+            session = requests.Session()
+            client = Client('secret-token', 'site', session=session,
+                    base_host=server.url, compress_requests=True)
+            client.start_recording(self.path)
+            info = client.get_info(3)
+            client.create_subscriber(50, 'cafe ' * 300)
+            plans = client.get_plans()
+            client.stop_recording()
+            self.assertTrue(client.session is session)
+            session.close()
+
+        with open(self.path, 'rb') as f:
+            self.assertFalse('secret-token' in f.read())
+        recording = load_recording(self.path)
+        self.assertEquals([e['url'] for e in recording], ['subscribers/3.xml',
+            'subscribers.xml', 'subscription_plans.xml'])
+
+        transport = ReplayTransport(recording, speed=0)
+        client = Client(REDACTED, 'other-site', session=transport,
+                compress_requests=True)
+        self.assertEquals(client.get_info(3), info)
+        self.assertEquals(client.get_plans(), plans)
+        self.assertEquals(client.create_subscriber(50,
+            'cafe ' * 300)['customer_id'], 50)
+        self.assertEquals(transport.misses, 0)
+
+        report = ReplayDriver(client, recording, concurrency=2).run()
+        self.assertEquals(report['requests'], 3)
+        self.assertEquals(report['status'], {200: 2, 201: 1})
+        self.assertTrue('p99_ms' in report)
+
+    def test_card_details_not_recorded(self):
+        with StubServer() as server:
+            server.add_subscribers(10)
+            client = Client('secret-token', 'site', session=requests.Session(),
+                    base_host=server.url)
+            invoice = client.create_invoice(5, 1)
+            client.start_recording(self.path)
+            client.pay_invoice(invoice['token'], {
+                'number': '4222222222222', 'card_type': 'visa',
+                'verification_value': '987', 'month': 11, 'year': 2031,
+                'first_name': 'Joe', 'last_name': u'M\xfcller'})
+            client.stop_recording()
+
+        entry, = load_recording(self.path)
+        self.assertEquals(entry['url'], 'invoices/{0}/pay.xml'.format(
+            invoice['token']))
+        for secret in ('4222222222222', '987', '2031', u'M\xfcller'):
+            self.assertFalse(secret in entry['data'], secret)
+        card = ET.fromstring(entry['data'].encode('utf-8')).find(
+                'credit-card')
+        self.assertEquals(card.findtext('number'), REDACTED)
+        self.assertEquals(card.findtext('verification-value'), REDACTED)
+        self.assertEquals(card.findtext('year'), REDACTED)
+        self.assertEquals(entry['status'], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
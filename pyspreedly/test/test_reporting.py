@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from pyspreedly.api import Client
+from pyspreedly.reporting import (TransactionCursor, RevenueAggregator,
+        by_currency, by_plan, aggregate)
+
+
+def transaction(id, amount, currency='USD', plan='Pro', succeeded=True):
+    return {'id': id, 'amount': Decimal(amount), 'currency_code': currency,
+            'succeeded': succeeded,
+            'detail': {'subscription_plan_name': plan}}
+
+
+class PagedClient(Client):
+    """Serves transactions 50 per page, like spreedly"""
+
+    def __init__(self, transactions):
+        super(PagedClient, self).__init__('token', 'site')
+        self.transactions = transactions
+        self.requested = []
+
+    def _transactions_page(self, since_id=None, deadline=None):
+        self.requested.append(since_id)
+        return [t for t in self.transactions
+                if since_id is None or t['id'] > since_id][:50]
+
+
+class ReportingTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_iter_transactions_cursor(self):
+        client = PagedClient([transaction(i, '1.0') for i in range(1, 121)])
+        cursor = TransactionCursor(os.path.join(self.dir, 'cursor'))
+        ids = [t['id'] for t in client.iter_transactions(cursor=cursor)]
+        self.assertEquals(ids, range(1, 121))
+        self.assertEquals(client.requested, [None, 50, 100, 120])
+
+        client.transactions.append(transaction(121, '1.0'))
+        cursor = TransactionCursor(os.path.join(self.dir, 'cursor'))
+        self.assertEquals(cursor.since_id, 120)
+        ids = [t['id'] for t in client.iter_transactions(cursor=cursor,
+            prefetch=False)]
+        self.assertEquals(ids, [121])
+
+    def test_aggregate(self):
+        transactions = [
+            transaction(1, '10.0'),
+            transaction(2, '5.5', 'EUR', 'Basic'),
+            transaction(3, '10.0'),
+            transaction(4, '99.0', succeeded=False),
+            ]
+        currency = RevenueAggregator(by_currency)
+        plan = RevenueAggregator(by_plan)
+        self.assertEquals(len(list(aggregate(transactions, currency, plan))),
+                4)
+        self.assertEquals(currency.report(), {
+            'USD': {'amount': Decimal('20.0'), 'count': 2},
+            'EUR': {'amount': Decimal('5.5'), 'count': 1},
+            })
+        self.assertEquals(plan.report()['Pro']['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
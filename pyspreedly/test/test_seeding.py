@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import unittest
+import requests
+from pyspreedly.api import Client
+from pyspreedly.seeding import Seeder
+from pyspreedly.stub import StubServer
+
+
+class SeederTests(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer().start()
+        self.server.add_subscribers(10)
+        self.session = requests.Session()
+        self.client = Client('token', 'site', session=self.session,
+                base_host=self.server.url)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def test_seed(self):
+        seeder = Seeder(self.client, concurrency=4)
+        results = list(seeder.seed(50))
+        self.assertEquals(len(results), 50)
+        self.assertEquals([r for r in results if r.error], [])
+        self.assertEquals(sum(seeder.stats[kind] for kind in seeder.mix), 50)
+        subscribers = self.server.state.subscribers
+        self.assertEquals(len(subscribers), 60)
+        for result in results:
+            subscriber = subscribers[result.customer_id]
+            self.assertTrue(seeder.owns(subscriber))
+            self.assertEquals(subscriber['on_trial'], result.kind == 'trial')
+            self.assertEquals(subscriber['active'], result.kind != 'plain')
+            self.assertEquals(subscriber['screen_name'], 'seed-{0}-{1}'.format(
+                seeder.run, result.customer_id - seeder.run * 1000000))
+            if result.kind in ('plan', 'fee'):
+                self.assertTrue(subscriber['subscription_plan_name'])
+        self.assertEquals(seeder.teardown()['deleted'], 50)
+        self.assertEquals(sorted(subscribers), range(1, 11))
+
+    def test_inactive_change_plan(self):
+        # the stub, like spreedly, only changes plans of active subscribers
+        self.client.create_subscriber(50, 'new')
+        self.assertRaises(requests.HTTPError, self.client.change_plan, 50, 1)
+        self.assertEquals(self.client.change_plan(1, 1), 200)
+
+    def test_runs_apart(self):
+        first = Seeder(self.client, concurrency=4)
+        second = Seeder(self.client, run=first.run + 1, concurrency=4)
+        ids = first.reserve(2)
+        for id in ids:
+            self.client.create_subscriber(id, 'test')
+        list(first.seed(10))
+        list(second.seed(10))
+        first.teardown()
+        subscribers = self.server.state.subscribers
+        self.assertEquals(len(subscribers), 20)
+        self.assertFalse([id for id in subscribers
+            if first.owns(subscribers[id])])
+
+        # a run that crashed, found by scanning the site
+        report = Seeder(self.client, run=second.run).teardown(scan=True)
+        self.assertEquals(report['deleted'], 10)
+        self.assertEquals(sorted(subscribers), range(1, 11))
+
+    def test_mix(self):
+        self.assertRaises(ValueError, Seeder, self.client, mix={'gift': 1})
+        with Seeder(self.client, mix={'fee': 1}) as seeder:
+            results = list(seeder.seed(5))
+            self.assertEquals(seeder.stats['fee'], 5)
+        self.assertEquals(len(self.server.state.subscribers), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
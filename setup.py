@@ -20,7 +20,7 @@ setup(
     packages=find_packages(exclude=("tests",)),
     zip_safe=False,
     install_requires=[
-        'requests>=0.14.0',
+        'requests>=1.0.0',
         'pytz>=2012f',
     ],
     test_requires=[
@@ -28,7 +28,11 @@ setup(
         ],
     #test_suite='python_spreedly.test.runtests.get_tests',
     include_package_data=True,
-    entry_points={},
+    entry_points={
+        'console_scripts': [
+            'pyspreedly-loadgen = pyspreedly.loadgen:main',
+            ],
+        },
     classifiers=[
         'Intended Audience :: Developers',
         'Intended Audience :: System Administrators',